@@ -0,0 +1,50 @@
+# agents/cancellation.py
+"""
+Cooperative cancellation for pipeline runs.
+
+A CancelToken is shared by everything working on one run. Agents check it
+between streamed chunks (and close the stream), the jury loop between
+steps, and the stage scheduler before starting a stage. A blocking LLM call
+that is already in flight cannot be interrupted; its result is discarded.
+"""
+
+import threading
+from typing import Optional
+
+
+class Cancelled(Exception):
+    pass
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+    def sleep(self, seconds: float):
+        """
+        time.sleep that wakes up (and raises) as soon as the token is cancelled.
+        """
+        if self._event.wait(seconds):
+            raise Cancelled(self.reason)
+
+
+def check(cancel_token: Optional[CancelToken]):
+    """
+    raise_if_cancelled for callers whose token is optional.
+    """
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
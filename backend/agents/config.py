@@ -14,8 +14,16 @@ from .tools import naiverag_retrieve_tool
 # groq   -> public production (Render)
 AI_PROVIDER = os.getenv("AI_PROVIDER", "groq")
 
+# Token budget for multi-turn agent sessions (jury/critic refinement rounds).
+# Older exchanges are truncated once a session prompt grows past this size.
+AGENT_HISTORY_MAX_TOKENS = int(os.getenv("AGENT_HISTORY_MAX_TOKENS", "6000"))
 
-def _build_model(role: str) -> LiteLlm:
+# Output budget of the fused risk + autofix call, which returns both halves
+# in one JSON object (single-purpose calls keep the 512 default)
+FUSED_MAX_TOKENS = int(os.getenv("FUSED_MAX_TOKENS", "2048"))
+
+
+def _build_model(role: str, max_tokens: int = 512) -> LiteLlm:
     """
     Internal helper to build a LiteLlm model
     without breaking existing variable names.
@@ -33,7 +41,7 @@ def _build_model(role: str) -> LiteLlm:
     return LiteLlm(
         model=model_map[role],
         api_key=os.getenv("GROQ_API_KEY"),
-        max_tokens=512,
+        max_tokens=max_tokens,
         temperature=0.2,
     )
 
@@ -50,6 +58,7 @@ def _build_model(role: str) -> LiteLlm:
 llama_model = _build_model("jury")
 mistral_model = _build_model("critic")
 standard_model = _build_model("standard")
+fused_model = _build_model("critic", max_tokens=FUSED_MAX_TOKENS)
 
 
 # =========================================================
@@ -62,6 +71,7 @@ def create_jury_agent(name, model=llama_model):
         instruction=jury_prompt.PROMPT,
         model=model,
         tools=[naiverag_retrieve_tool],
+        history_max_tokens=AGENT_HISTORY_MAX_TOKENS,
     )
 
 
@@ -70,6 +80,7 @@ def create_critic_agent(name, model=mistral_model):
         name=name,
         instruction=jury_report_critic_prompt.PROMPT,
         model=model,
+        history_max_tokens=AGENT_HISTORY_MAX_TOKENS,
     )
 
 
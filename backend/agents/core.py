@@ -1,7 +1,8 @@
 import os
 import json
 import re
-from litellm import completion
+from litellm import completion, token_counter
+from .cancellation import Cancelled, check
 
 class LiteLlm:
     def __init__(self, model, api_key=None, **config):
@@ -9,6 +10,16 @@ class LiteLlm:
         self.api_key = api_key
         self.config = config # Store extra config like temperature, max_tokens
 
+    def count_tokens(self, messages) -> int:
+        """
+        Counts prompt tokens for the given messages, falling back to a
+        character heuristic when no tokenizer is available for the model.
+        """
+        try:
+            return token_counter(model=self.model, messages=messages)
+        except Exception:
+            return sum(len(str(m.get("content") or "")) for m in messages) // 4
+
     def complete(self, messages, tools=None, stream=False):
         kwargs = {
             "model": self.model,
@@ -40,33 +51,135 @@ class LiteLlm:
                  
         return response
 
+def _close_stream(stream_response):
+    """
+    Closes a streaming response so the provider connection is released.
+    """
+    for target in (stream_response, getattr(stream_response, "completion_stream", None)):
+        close = getattr(target, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
 class Agent:
-    def __init__(self, name, instruction, model, tools=None):
+    def __init__(self, name, instruction, model, tools=None, history_max_tokens=None):
         self.name = name
         self.instruction = instruction
         self.model = model
         self.tools = tools or []
         self.history = []
+        # Token budget for the session prompt (system + history + new turn).
+        # None disables truncation.
+        self.history_max_tokens = history_max_tokens
+        self.session_stats = {
+            "calls": 0,
+            "prompt_tokens": 0,
+            "prefix_tokens_reused": 0,
+            "turns_truncated": 0,
+        }
+        self._last_prompt = []
+        self._token_cache = {}
+        # Set when the last run() ended in a provider/runtime failure, so
+        # callers can avoid treating the fallback message as a real answer.
+        self.last_error = None
 
-    def run(self, message: str, context: dict = None, on_log=None):
+    def reset_session(self):
         """
-        Runs the agent with the given message. 
-        Handles basic tool calling loop if necessary.
-        Supports streaming logs if on_log is provided.
+        Clears the conversation history and session accounting.
         """
-        current_messages = [{"role": "system", "content": self.instruction}]
-        
+        self.history = []
+        self._last_prompt = []
+        self.session_stats = {k: 0 for k in self.session_stats}
+
+    def _format_user_content(self, message: str, context: dict = None) -> str:
         user_content = message
         if context:
             user_content += f"\n\nContext:\n{json.dumps(context, indent=2)}"
-            
-        current_messages.append({"role": "user", "content": user_content})
+        return user_content
+
+    def _message_tokens(self, msg: dict) -> int:
+        key = (msg.get("role"), msg.get("content"))
+        if key not in self._token_cache:
+            self._token_cache[key] = self.model.count_tokens([msg])
+        return self._token_cache[key]
+
+    def _truncate_history(self, system_msg: dict, user_msg: dict):
+        """
+        Drops the oldest exchanges until the session prompt fits the budget.
+        The first exchange (original task + first answer) is pinned so the
+        cacheable prefix stays stable, and the latest exchange is always kept.
+        """
+        if not self.history_max_tokens:
+            return
+
+        def total():
+            return sum(self._message_tokens(m) for m in [system_msg, *self.history, user_msg])
+
+        while total() > self.history_max_tokens and len(self.history) > 4:
+            del self.history[2:4]
+            self.session_stats["turns_truncated"] += 1
 
+    def _record_prompt(self, messages: list):
+        """
+        Tracks prompt size and how many leading tokens are identical to the
+        previous call, i.e. what a prefix-caching provider can reuse.
+        """
+        reused = 0
+        for prev, curr in zip(self._last_prompt, messages):
+            if prev != curr:
+                break
+            reused += self._message_tokens(curr)
+
+        self.session_stats["calls"] += 1
+        self.session_stats["prompt_tokens"] += sum(self._message_tokens(m) for m in messages)
+        self.session_stats["prefix_tokens_reused"] += reused
+        self._last_prompt = list(messages)
+
+    def remember(self, message: str, reply: str, context: dict = None):
+        """
+        Appends a completed exchange to the session without calling the model.
+        """
+        self.history.append({"role": "user", "content": self._format_user_content(message, context)})
+        self.history.append({"role": "assistant", "content": reply})
+
+    def run(self, message: str, context: dict = None, on_log=None, stateful: bool = False, cancel_token=None):
+        """
+        Runs the agent with the given message. 
+        Handles basic tool calling loop if necessary.
+        Supports streaming logs if on_log is provided.
+        With stateful=True the call is appended to the agent's session so the
+        system prompt and earlier turns form a stable, cacheable prefix.
+        A cancelled `cancel_token` closes the stream and raises Cancelled.
+        """
+        system_msg = {"role": "system", "content": self.instruction}
+        user_msg = {"role": "user", "content": self._format_user_content(message, context)}
+
+        if stateful:
+            self._truncate_history(system_msg, user_msg)
+            current_messages = [system_msg, *self.history, user_msg]
+        else:
+            current_messages = [system_msg, user_msg]
+
+        self._record_prompt(current_messages)
+
+        self.last_error = None
+        reply = self._execute(current_messages, on_log, cancel_token)
+
+        if stateful:
+            self.history.append(user_msg)
+            self.history.append({"role": "assistant", "content": reply})
+
+        return reply
+
+    def _execute(self, current_messages: list, on_log=None, cancel_token=None):
         print(f"--- {self.name} Running ---")
         
         tools_map = {t.name: t for t in self.tools}
         
         try:
+            check(cancel_token)
             stream_response = self.model.complete(current_messages, tools=self.tools, stream=True)
             
             full_content = ""
@@ -82,6 +195,11 @@ class Agent:
                         and len(c.choices) > 0)
 
             for chunk in stream_response:
+                if cancel_token is not None and cancel_token.cancelled:
+                    _close_stream(stream_response)
+                    print(f"  [Streaming] {self.name} cancelled, stream closed.")
+                    cancel_token.raise_if_cancelled()
+
                 collected_chunks.append(chunk)
                 
                 if not is_valid_chunk(chunk):
@@ -125,12 +243,14 @@ class Agent:
                 print(f"  [Streaming] Tool calls detected. Re-running non-streamed for safe execution...")
                 if on_log: on_log("Preparing to use tools...")
                 
+                check(cancel_token)
                 response = self.model.complete(current_messages, tools=self.tools, stream=False)
                 
                 # FIX 2: Handle case where re-run returns None or empty choices
                 if not hasattr(response, 'choices') or response.choices is None or len(response.choices) == 0:
                     error_msg = "Error: Tool execution failed (Empty AI response)."
                     print(f"  [Error] {error_msg}")
+                    self.last_error = error_msg
                     return error_msg
                 
                 choice = response.choices[0]
@@ -162,6 +282,7 @@ class Agent:
                                 on_log(f"Tool Result: {result_preview}...")
                             
                             # Final response
+                            check(cancel_token)
                             final_response = self.model.complete(current_messages)
                             
                             # FIX 3: Safety check on final response
@@ -173,15 +294,22 @@ class Agent:
                             else:
                                 return "Action completed (No final summary)."
                                 
+                        except Cancelled:
+                            raise
                         except Exception as e:
-                            return f"Error executing tool {function_name}: {e}"
+                            self.last_error = f"Error executing tool {function_name}: {e}"
+                            return self.last_error
                     else:
-                        return f"Error: Tool {function_name} not found."
+                        self.last_error = f"Error: Tool {function_name} not found."
+                        return self.last_error
             
             return full_content if full_content else "Action completed."
             
+        except Cancelled:
+            raise
         except Exception as e:
             print(f"  [Fatal Error] Agent run failed: {e}")
+            self.last_error = str(e)
             # Do NOT emit the raw error to the UI if it's just a NoneType issue, handle it gracefully
             if "NoneType" in str(e):
                 return "Agent encountered a temporary processing error. Please retry."
@@ -2,6 +2,7 @@ import json
 import time
 from datetime import datetime
 
+from .cancellation import check
 from .config import (
     create_jury_agent,
     create_critic_agent,
@@ -19,6 +20,81 @@ EVENT_JUDGE_THINKING = "judge_thinking"
 EVENT_JUDGE_VERDICT = "judge_verdict"
 
 
+# =========================================================
+# Checkpointing
+# =========================================================
+def _index_checkpoints(checkpoints):
+    """
+    Accepts checkpoints as a list of trace items (as stored on the run
+    document) or a dict keyed by step name.
+    """
+    if not checkpoints:
+        return {}
+    if isinstance(checkpoints, dict):
+        return checkpoints
+    return {c["step"]: c for c in checkpoints if c.get("step")}
+
+
+class _Checkpoints:
+    """
+    The checkpoints of one run. Steps are replayed only while every earlier
+    step was replayed too: a step that runs again invalidates the stored
+    steps built on its old output. Once a step has failed (and returned
+    its fallback text) nothing after it is checkpointed either.
+    """
+
+    def __init__(self, checkpoints, on_checkpoint=None):
+        self.items = _index_checkpoints(checkpoints)
+        self.on_checkpoint = on_checkpoint
+        self.replaying = True
+        self.degraded = False
+
+    @classmethod
+    def of(cls, checkpoints, on_checkpoint=None):
+        if isinstance(checkpoints, cls):
+            return checkpoints
+        return cls(checkpoints, on_checkpoint)
+
+    def cached(self, step):
+        cached = self.items.get(step) if self.replaying else None
+        if cached is None:
+            self.replaying = False
+        return cached
+
+    def save(self, agent, item):
+        # Failed calls return a fallback message; never checkpoint those,
+        # nor the steps that build on them
+        if agent.last_error:
+            self.degraded = True
+        if self.on_checkpoint and not self.degraded:
+            self.on_checkpoint(item)
+
+
+def _run_step(agent, step, message, context, on_log, checkpoints, stateful=True, cancel_token=None):
+    """
+    Runs one agent step, or replays it from a checkpoint without calling
+    the model. Replayed steps are still appended to the agent session so
+    later turns see the same conversation.
+    Returns (content, resumed).
+    """
+    cached = checkpoints.cached(step)
+    if cached is not None:
+        if stateful:
+            agent.remember(message, cached["content"], context=context)
+        return cached["content"], True
+
+    check(cancel_token)
+    content = agent.run(message, context=context, on_log=on_log, stateful=stateful, cancel_token=cancel_token)
+    return content, False
+
+
+def _pause(seconds, cancel_token=None):
+    if cancel_token is not None:
+        cancel_token.sleep(seconds)
+    else:
+        time.sleep(seconds)
+
+
 # =========================================================
 # Jury ↔ Critic Loop
 # =========================================================
@@ -27,10 +103,16 @@ def run_jury_loop(
     critic_agent,
     task_context,
     max_iterations: int = 2,
-    on_event=None
+    on_event=None,
+    checkpoints=None,
+    on_checkpoint=None,
+    cancel_token=None
 ):
     """
     Runs a loop between Jury and Critic until valid or max iterations.
+    Steps found in `checkpoints` are replayed instead of re-run; every newly
+    completed step is passed to `on_checkpoint`.
+    Raises Cancelled as soon as `cancel_token` is cancelled.
     Returns:
         (final_report: str, trace: list)
     """
@@ -39,8 +121,23 @@ def run_jury_loop(
         if on_event:
             on_event(event_type, data)
 
+    checkpoints = _Checkpoints.of(checkpoints, on_checkpoint)
     trace = []
 
+    def record(agent, step, content, logs, resumed):
+        if resumed:
+            trace.append(checkpoints.items[step])
+            return
+        item = {
+            "agent": agent.name,
+            "step": step,
+            "content": content,
+            "logs": logs,
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+        trace.append(item)
+        checkpoints.save(agent, item)
+
     # ------------------ Initial Jury Report ------------------
     emit(EVENT_JURY_THINKING, {"msg": f"{jury_agent.name} is analyzing context..."})
 
@@ -51,25 +148,23 @@ def run_jury_loop(
         if not msg.startswith("Calling Tool") and not msg.startswith("Tool Result"):
             emit(EVENT_JURY_THINKING, {"msg": msg, "is_log": True})
 
-    current_report = jury_agent.run(
+    current_report, resumed = _run_step(
+        jury_agent,
+        "Initial Report",
         "Generate a compliance report based on the provided context.",
-        context=task_context,
-        on_log=jury_log_collector,
+        task_context,
+        jury_log_collector,
+        checkpoints,
+        cancel_token=cancel_token,
     )
 
     emit(EVENT_JURY_REPORT, {"report": current_report})
 
-    trace.append({
-        "agent": jury_agent.name,
-        "step": "Initial Report",
-        "content": current_report,
-        "logs": step_logs,
-        "timestamp": datetime.utcnow().isoformat(),
-    })
+    record(jury_agent, "Initial Report", current_report, step_logs, resumed)
 
     # ------------------ Iterative Critique Loop ------------------
     for i in range(max_iterations):
-        time.sleep(0.5)
+        _pause(0.5, cancel_token)
 
         emit(EVENT_CRITIC_THINKING, {"msg": f"Critic reviewing iteration {i + 1}..."})
 
@@ -80,30 +175,41 @@ def run_jury_loop(
             if not msg.startswith("Calling Tool") and not msg.startswith("Tool Result"):
                 emit(EVENT_CRITIC_THINKING, {"msg": msg, "is_log": True})
 
-        critique = critic_agent.run(
-            "Review this jury report against the original requirements.",
-            context={
-                "original_task": task_context,
-                "jury_report": current_report,
-            },
-            on_log=critic_log_collector,
-        )
+        # The critic keeps one session across iterations: the original task is
+        # sent once and later rounds only append the refined report.
+        if i == 0:
+            critique, resumed = _run_step(
+                critic_agent,
+                "Critique 1",
+                "Review this jury report against the original requirements.",
+                {
+                    "original_task": task_context,
+                    "jury_report": current_report,
+                },
+                critic_log_collector,
+                checkpoints,
+                cancel_token=cancel_token,
+            )
+        else:
+            critique, resumed = _run_step(
+                critic_agent,
+                f"Critique {i + 1}",
+                "Review the refined jury report against the original requirements.",
+                {"jury_report": current_report},
+                critic_log_collector,
+                checkpoints,
+                cancel_token=cancel_token,
+            )
 
         emit(EVENT_CRITIC_FEEDBACK, {"critique": critique})
 
-        trace.append({
-            "agent": critic_agent.name,
-            "step": f"Critique {i + 1}",
-            "content": critique,
-            "logs": step_logs,
-            "timestamp": datetime.utcnow().isoformat(),
-        })
+        record(critic_agent, f"Critique {i + 1}", critique, step_logs, resumed)
 
         # Exit early if critique passes
         if "No major issues found" in critique:
             break
 
-        time.sleep(0.5)
+        _pause(0.5, cancel_token)
 
         # ------------------ Jury Refinement ------------------
         emit(EVENT_JURY_THINKING, {"msg": "Jury refining report based on critique..."})
@@ -115,40 +221,58 @@ def run_jury_loop(
             if not msg.startswith("Calling Tool") and not msg.startswith("Tool Result"):
                 emit(EVENT_JURY_THINKING, {"msg": msg, "is_log": True})
 
-        current_report = jury_agent.run(
+        # The previous report is already the last assistant turn of the
+        # jury session, so only the critique is appended.
+        current_report, resumed = _run_step(
+            jury_agent,
+            f"Refinement {i + 1}",
             "Refine the report based on this critique.",
-            context={
-                "previous_report": current_report,
-                "critique": critique,
-            },
-            on_log=jury_refine_log_collector,
+            {"critique": critique},
+            jury_refine_log_collector,
+            checkpoints,
+            cancel_token=cancel_token,
         )
 
         emit(EVENT_JURY_REPORT, {"report": current_report})
 
-        trace.append({
-            "agent": jury_agent.name,
-            "step": f"Refinement {i + 1}",
-            "content": current_report,
-            "logs": step_logs,
-            "timestamp": datetime.utcnow().isoformat(),
-        })
+        record(jury_agent, f"Refinement {i + 1}", current_report, step_logs, resumed)
 
     return current_report, trace
 
 
+def _session_stats(agents):
+    """
+    Summarises per-agent prompt accounting for a run.
+    `prompt_tokens_saved` counts prompt-prefix tokens identical to the
+    agent's previous call, which prefix-caching providers do not recompute.
+    """
+    per_agent = {a.name: dict(a.session_stats) for a in agents}
+    return {
+        "agents": per_agent,
+        "prompt_tokens": sum(s["prompt_tokens"] for s in per_agent.values()),
+        "prompt_tokens_saved": sum(s["prefix_tokens_reused"] for s in per_agent.values()),
+    }
+
+
 # =========================================================
 # Full Pipeline Orchestration
 # =========================================================
-def run_pipeline(context_data, on_event=None):
+def run_pipeline(context_data, on_event=None, checkpoints=None, on_checkpoint=None, cancel_token=None):
     """
     Orchestrates:
         Jury → Critic loop → Judge
 
+    `checkpoints` (trace items from an earlier attempt) let a failed run
+    resume from its last completed step; `on_checkpoint` receives each
+    newly completed step. A cancelled `cancel_token` aborts the run with
+    Cancelled (completed steps stay checkpointed).
+
     Returns:
         {
             "verdict_json": str,
-            "execution_trace": list
+            "execution_trace": list,
+            "session_stats": dict,
+            "degraded": bool  # some step returned its fallback text
         }
     """
 
@@ -157,6 +281,7 @@ def run_pipeline(context_data, on_event=None):
             on_event(event_type, data)
 
     execution_trace = []
+    checkpoints = _Checkpoints(checkpoints, on_checkpoint)
 
     # ------------------ Jury + Critic ------------------
     jury = create_jury_agent("Jury_Primary")
@@ -167,6 +292,9 @@ def run_pipeline(context_data, on_event=None):
         critic,
         context_data,
         on_event=on_event,
+        checkpoints=checkpoints,
+        on_checkpoint=on_checkpoint,
+        cancel_token=cancel_token,
     )
 
     execution_trace.extend(trace)
@@ -183,26 +311,38 @@ def run_pipeline(context_data, on_event=None):
         if not msg.startswith("Calling Tool") and not msg.startswith("Tool Result"):
             emit(EVENT_JUDGE_THINKING, {"msg": msg, "is_log": True})
 
-    final_verdict = judge.run(
+    final_verdict, resumed = _run_step(
+        judge,
+        "Final Verdict",
         "Review the jury report and produce a final consolidated verdict.",
-        context={
+        {
             "task": context_data,
             "jury_report": report,
         },
-        on_log=judge_log_collector,
+        judge_log_collector,
+        checkpoints,
+        stateful=False,
+        cancel_token=cancel_token,
     )
 
     emit(EVENT_JUDGE_VERDICT, {"verdict": final_verdict})
 
-    execution_trace.append({
-        "agent": judge.name,
-        "step": "Final Verdict",
-        "content": final_verdict,
-        "logs": step_logs,
-        "timestamp": datetime.utcnow().isoformat(),
-    })
+    if resumed:
+        execution_trace.append(checkpoints.items["Final Verdict"])
+    else:
+        judge_item = {
+            "agent": judge.name,
+            "step": "Final Verdict",
+            "content": final_verdict,
+            "logs": step_logs,
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+        execution_trace.append(judge_item)
+        checkpoints.save(judge, judge_item)
 
     return {
         "verdict_json": final_verdict,
         "execution_trace": execution_trace,
+        "session_stats": _session_stats([jury, critic, judge]),
+        "degraded": checkpoints.degraded,
     }
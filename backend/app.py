@@ -1,6 +1,8 @@
 import logging
 import json
 import uuid
+import hashlib
+import time
 import datetime
 import os
 from typing import Dict, Any, Optional, List
@@ -12,27 +14,63 @@ load_dotenv(dotenv_path="backend/.env")
 from fastapi import FastAPI, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo.database import Database
-from pydantic import BaseModel, EmailStr
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from pydantic import BaseModel, EmailStr, Field
 
 import asyncio
+from contextlib import asynccontextmanager
 from sse_starlette.sse import EventSourceResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
 
 # --- Project Imports (RENDER SAFE) ---
 from backend.database.database import get_database
+from backend.database.async_database import get_async_database, connect_async_database, close_async_database
+from backend.database.indexes import bootstrap_indexes
 from backend.features import auth
 from backend.features.auth import get_current_user
+from backend.features.compliance_history.history_manager import page_verdict_history, iter_verdict_history, valid_feature_id
 
 # --- Pipeline Imports ---
-from backend.pipeline.core_pipeline import run_core_pipeline
-from backend.pipeline.risk_pipeline import run_risk_pipeline
-from backend.pipeline.autofix_pipeline import run_autofix_pipeline
-from backend.features.compliance_diff.diff_engine import generate_compliance_diff
-from backend.features.compliance_history.history_manager import get_previous_verdict
+from backend.pipeline.stages import run_stages, run_stages_sync, fused_savings
+from backend.pipeline.scheduler import STAGE_COMPLETED, STAGE_FAILED
+from backend.pipeline.verdict_cache import cache_stats
+from backend.pipeline.risk_pipeline import fast_path_stats
+from backend.pipeline.job_queue import JobQueue, AsyncJobQueue, WorkerPool, QueueFull, JOB_DONE, JOB_FAILED
+from backend.pipeline.admission import admission, AdmissionRejected, JOB_USER_MAX_PENDING
+from backend.pipeline import metrics
+from backend.agents.cancellation import CancelToken
+from backend.pipeline.event_bus import event_bus, MongoBusBackend, EVENT_END, EVENT_BUS_DROP_POLICY
+from backend.pipeline.stream_buffer import (
+    MongoEventStore, RunStream, open_stream, get_stream, close_stream, replay_stored, framed, encode_batch
+)
+from backend.pipeline.event_bridge import EventBridge
+from backend.pipeline.trace_buffer import TraceBuffer
+from backend.pipeline.trace_store import TraceStore, TRACE_COLLECTION, page_query
 
 
 # --- App Configuration ---
-app = FastAPI(title="JurAI Compliance System")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Owns the async MongoDB pool and the job workers for the app's lifetime.
+    """
+    global _worker_pool
+    await connect_async_database()
+    await asyncio.to_thread(bootstrap_database)
+    await asyncio.to_thread(attach_event_bus_backend)
+    if SSE_REPLAY_MONGO:
+        await asyncio.to_thread(get_sse_event_store)
+    if JOB_WORKERS_IN_PROCESS:
+        _worker_pool = await asyncio.to_thread(start_worker_pool)
+    try:
+        yield
+    finally:
+        if _worker_pool:
+            await asyncio.to_thread(_worker_pool.stop, 5)
+        close_async_database()
+
+app = FastAPI(title="JurAI Compliance System", lifespan=lifespan)
 
 # Logger
 logging.basicConfig(level=logging.INFO)
@@ -59,9 +97,17 @@ app.add_middleware(
 
 # --- Pydantic Request Models ---
 
+JOB_MAX_PRIORITY = int(os.getenv("JOB_MAX_PRIORITY", "10"))
+# Principals whose /run/core priority is honoured, comma separated
+# (e.g. "user:ops@example.com"); everyone else is queued at priority 0
+JOB_PRIORITY_PRINCIPALS = {p.strip() for p in os.getenv("JOB_PRIORITY_PRINCIPALS", "").split(",") if p.strip()}
+
 class PipelineRequest(BaseModel):
     feature_id: Optional[str] = None
     context_data: Dict[str, Any]
+    bypass_cache: bool = False  # Force a fresh run even if an identical verdict is cached
+    # Higher priorities are picked up by workers first (trusted principals only)
+    priority: int = Field(0, ge=0, le=JOB_MAX_PRIORITY)
 
 class RiskRequest(BaseModel):
     feature_id: str
@@ -81,9 +127,9 @@ class UserCreate(BaseModel):
 # --- Auth Routes ---
 
 @app.post("/auth/register", status_code=201)
-def register(user: UserCreate, db: Database = Depends(get_database)):
+async def register(user: UserCreate, db: AsyncIOMotorDatabase = Depends(get_async_database)):
     # Check if user exists
-    existing_user = db.users.find_one({"$or": [{"email": user.email}, {"username": user.username}]})
+    existing_user = await db.users.find_one({"$or": [{"email": user.email}, {"username": user.username}]})
     if existing_user:
         raise HTTPException(
             status_code=400,
@@ -91,7 +137,7 @@ def register(user: UserCreate, db: Database = Depends(get_database)):
         )
     
     # Hash password
-    hashed_password = auth.get_password_hash(user.password)
+    hashed_password = await auth.hash_password(user.password)
     
     # Create User
     user_doc = {
@@ -102,25 +148,33 @@ def register(user: UserCreate, db: Database = Depends(get_database)):
         "created_at": datetime.datetime.utcnow().isoformat()
     }
     
-    db.users.insert_one(user_doc)
+    await db.users.insert_one(user_doc)
+    auth.invalidate_user(user_doc)
     
     return {"message": "User registered successfully"}
 
 @app.post("/auth/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Database = Depends(get_database)):
-    # Original Logic
-    user = db.users.find_one({"username": form_data.username})
-    if not user:
-        # Try email
-        user = db.users.find_one({"email": form_data.username})
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncIOMotorDatabase = Depends(get_async_database)):
+    # One indexed lookup by username or email; a username match wins
+    candidates = await db.users.find(
+        {"$or": [{"username": form_data.username}, {"email": form_data.username}]},
+        {"username": 1, "email": 1, "password_hash": 1}
+    ).to_list(2)
+    user = next((u for u in candidates if u.get("username") == form_data.username), None) or (candidates[0] if candidates else None)
     
-    if not user or not auth.verify_password(form_data.password, user.get("password_hash")):
+    valid, new_hash = await auth.verify_password_async(form_data.password, user.get("password_hash") if user else None)
+    if not user or not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    if new_hash:
+        # Transparent upgrade to the configured bcrypt cost
+        await db.users.update_one({"_id": user["_id"]}, {"$set": {"password_hash": new_hash}})
+        auth.invalidate_user(user)
+
     access_token_expires = datetime.timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth.create_access_token(
         data={"sub": user["email"] or user["username"]}, # Use unique identifier
@@ -133,9 +187,9 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Database = Depen
 # --- Admin/Test Routes ---
 
 @app.post("/admin/import_verdict")
-def import_verdict(
+async def import_verdict(
     payload: Dict[str, Any],
-    db: Database = Depends(get_database)
+    db: AsyncIOMotorDatabase = Depends(get_async_database)
 ):
     run_id = str(uuid.uuid4())
     feature_id = payload.get("feature_id", "unknown_feature")
@@ -146,34 +200,184 @@ def import_verdict(
         "feature_id": feature_id,
         "timestamp": payload.get("timestamp") or datetime.datetime.utcnow().isoformat(),
         "verdict_json": payload.get("verdict"), 
-        "agent_trace": None,
         "risk_json": None,
         "autofix_json": None,
         "status": "IMPORTED_VERDICT"
     }
     
-    db.compliance_runs.insert_one(run_doc)
+    await db.compliance_runs.insert_one(run_doc)
     
     return {"run_id": run_id, "feature_id": feature_id}
 
 # --- Pipeline Routes ---
 
-from fastapi import BackgroundTasks
+# Run the job workers inside the API process (set false when using backend.worker)
+JOB_WORKERS_IN_PROCESS = os.getenv("JOB_WORKERS_IN_PROCESS", "true").lower() == "true"
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+
+# "mongo" shares run events between API and worker processes
+EVENT_BUS_BACKEND = os.getenv("EVENT_BUS_BACKEND", "memory").lower()
+
+_job_queue: Optional[JobQueue] = None
+_worker_pool: Optional[WorkerPool] = None
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue(get_database().compliance_runs)
+    return _job_queue
+
+async def get_async_job_queue() -> AsyncJobQueue:
+    """
+    Enqueueing side of the job queue for route handlers.
+    """
+    return AsyncJobQueue((await get_async_database()).compliance_runs)
+
+# Use the first X-Forwarded-For hop as the client address (behind a proxy)
+ADMISSION_TRUST_FORWARDED = os.getenv("ADMISSION_TRUST_FORWARDED", "false").lower() == "true"
+
+def request_principal(request: Request) -> str:
+    """
+    Who admission control charges for a request: the token subject when a
+    valid bearer token is sent, otherwise the client address.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        subject = auth.token_subject(token)
+        if subject:
+            return f"user:{subject}"
+    forwarded = request.headers.get("x-forwarded-for") if ADMISSION_TRUST_FORWARDED else None
+    if forwarded:
+        return f"ip:{forwarded.split(',')[0].strip()}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": exc.reason, "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+async def admit_job(principal: str, jobs: AsyncJobQueue):
+    """
+    Rate limit plus a cap on the principal's queued-or-running jobs; the
+    worker pool itself is shared through the job queue.
+    """
+    admission.take_token(principal)
+    if JOB_USER_MAX_PENDING and await jobs.pending_for(principal) >= JOB_USER_MAX_PENDING:
+        metrics.incr("admission.rejected_pending_jobs")
+        raise AdmissionRejected(
+            f"Too many pending jobs ({JOB_USER_MAX_PENDING})",
+            metrics.average("jobs.queue_wait_s") or 30
+        )
 
-def background_core_task(run_id: str, feature_id: str, context_data: Dict[str, Any]):
+# Run document field and status written when each stage completes
+STAGE_FIELDS = {
+    "diff": ("compliance_diff", None),
+    "risk": ("risk_json", "risk_assessment"),
+    "autofix": ("autofix_json", "auto_fix"),
+    "governance": ("governance", None),
+}
+STAGE_STATUS = {
+    "core": "CORE_COMPLETED",
+    "risk": "RISK_COMPLETED",
+    "autofix": "AUTOFIX_COMPLETED",
+}
+
+def stage_persister(run_id: Optional[str] = None):
+    """
+    Returns an on_stage hook that writes each completed stage to its run
+    document. Runs in the stage worker thread, so blocking I/O is fine.
+    Without a run_id (SSE runs) the document is upserted under the run_id
+    produced by the core stage.
+    """
+    target = {"run_id": run_id}
+
+    def on_stage(name, stage_status, payload):
+        if stage_status != STAGE_COMPLETED:
+            return
+        try:
+            db = get_database()
+            now = datetime.datetime.utcnow().isoformat()
+
+            if name == "core":
+                target["run_id"] = target["run_id"] or payload.get("run_id")
+                db.compliance_runs.update_one(
+                    {"run_id": target["run_id"]},
+                    {
+                        "$set": {
+                            "verdict_json": payload.get("verdict"),
+                            "compliance_diff": payload.get("compliance_diff"),
+                            "status": STAGE_STATUS["core"],
+                            "completed_at": now
+                        },
+                        "$setOnInsert": {
+                            "feature_id": payload.get("feature_id"),
+                            "timestamp": now
+                        }
+                    },
+                    upsert=True
+                )
+                # Overwrite the realtime trace with the full clean trace
+                TraceStore(db).replace(target["run_id"], payload.get("agent_trace"))
+                return
+
+            field, key = STAGE_FIELDS[name]
+            updates = {field: payload.get(key) if key else payload}
+            if name in STAGE_STATUS:
+                updates["status"] = STAGE_STATUS[name]
+            if name == "risk" and payload.get("auto_fix") is not None:
+                # Fused mode: the risk call produced the fixes as well
+                updates["autofix_json"] = payload["auto_fix"]
+                updates["fused_stats"] = payload.get("fused_stats")
+            db.compliance_runs.update_one({"run_id": target["run_id"]}, {"$set": updates})
+        except Exception as e:
+            logger.error(f"Failed to persist {name} stage: {e}")
+
+    return on_stage
+
+def _core_seed(run_record: Dict[str, Any], feature_id: str) -> Dict[str, Any]:
+    """Core stage result rebuilt from a stored run, so it is not re-run."""
+    return {
+        "feature_id": feature_id,
+        "run_id": run_record.get("run_id"),
+        "verdict": run_record.get("verdict_json"),
+    }
+
+def background_core_task(
+    run_id: str,
+    feature_id: str,
+    context_data: Dict[str, Any],
+    checkpoints: Optional[List[Dict[str, Any]]] = None,
+    use_cache: bool = True,
+    cancel_token: Optional[CancelToken] = None
+):
     """
     Executes the pipeline in the background and updates storage incrementally.
+    Each completed agent step is checkpointed on the run document so a
+    failed run can be resumed from its last good step.
+    Once `cancel_token` is cancelled (the job's lease went to another
+    worker) the run stops and writes nothing more to the run document.
     """
+    def lease_lost() -> bool:
+        return cancel_token is not None and cancel_token.cancelled
+
     # NOTE: Helper function requires valid database connection context, 
     # but we can't easily pass Depends() here. 
     # We will get a fresh connection inside.
+    trace = None
     try:
         db = get_database() 
+        # Trace items and agent log lines are written behind, in batches
+        trace = TraceBuffer(db[TRACE_COLLECTION], run_id, runs=db.compliance_runs)
         
         def save_progress(event_type, event_data):
+            if lease_lost():
+                return
+            # Live viewers (GET /runs/{run_id}/events) get every event, logs included
+            event_bus.publish(run_id, event_type, json.dumps(event_data))
             try:
-                # Initialize trace if needed (conceptually) - MongoDB handles field creation on update
-                
                 # Determine Agent Name
                 agent_name = "System"
                 if "jury" in event_type:
@@ -186,76 +390,156 @@ def background_core_task(run_id: str, feature_id: str, context_data: Dict[str, A
                 # Check if this is a streaming log (insight)
                 is_log = event_data.get("is_log", False)
                 message = event_data.get("msg", "") or event_data.get("report") or event_data.get("critique") or event_data.get("verdict")
+                timestamp = datetime.datetime.utcnow().isoformat()
                 
                 if is_log:
-                    # Append log to the specific agent's last trace item
-                    # This is tricky in Mongo with arrays. We need to find the specific element.
-                    # Simplified: We just push a log entry. 
-                    # Complex: We want to associate logs with the "active" step.
-                    # For now, let's just push a log event for simplicity and robustness.
-                    pass # Skipping complex log nesting for now to ensure stability
+                    # Goes into the `logs` of the agent's current step
+                    trace.add_log(agent_name, event_type, str(message), timestamp)
+                    return
                 
                 # Standard Event - Create New Trace Item
-                timestamp = datetime.datetime.utcnow().isoformat()
-                
-                trace_item = {
+                trace.add_item({
                     "agent": agent_name,
                     "step": event_type,
                     "content": str(message)[:200] if message else "", # Preview
                     "timestamp": timestamp,
                     "logs": [],
                     "is_realtime": True
-                }
+                })
                 
-                # Append to agent_trace array
+            except Exception as e:
+                logger.error(f"Error saving progress: {e}")
+
+        persist_stage = stage_persister(run_id)
+
+        def on_stage(name, stage_status, payload):
+            if lease_lost():
+                trace.discard()
+                return
+            # Pending realtime items must land before the clean trace replaces them
+            trace.close()
+            persist_stage(name, stage_status, payload)
+
+        def save_checkpoint(step_item):
+            if lease_lost():
+                return
+            try:
                 db.compliance_runs.update_one(
                     {"run_id": run_id},
-                    {"$push": {"agent_trace": trace_item}}
+                    {"$push": {"checkpoints": step_item}}
                 )
-                
             except Exception as e:
-                logger.error(f"Error saving progress: {e}")
+                logger.error(f"Error saving checkpoint: {e}")
 
-        # Run Pipeline
+        # Run Pipeline (the core stage persists its own result)
         logger.info(f"Starting Background Pipeline for {run_id}")
-        result = run_core_pipeline(context_data, on_event=save_progress)
-        
-        # Final Save with Complete Result
-        db.compliance_runs.update_one(
-            {"run_id": run_id},
-            {
-                "$set": {
-                    "verdict_json": result.get("verdict"),
-                    "agent_trace": result.get("agent_trace"), # Overwrite with full clean trace
-                    "status": "CORE_COMPLETED",
-                    "completed_at": datetime.datetime.utcnow().isoformat()
-                }
-            }
+        stage_run = run_stages_sync(
+            ["core"],
+            context_data=context_data,
+            run_id=run_id,
+            on_event=save_progress,
+            on_stage=on_stage,
+            checkpoints=checkpoints,
+            on_checkpoint=save_checkpoint,
+            use_cache=use_cache,
+            cancel_token=cancel_token
         )
+        if not stage_run.ok("core"):
+            raise stage_run.errors["core"]
+
+        core_result = stage_run.results["core"]
+        event_bus.publish(run_id, "verdict", json.dumps(core_result.get("verdict", {})))
+        event_bus.publish(run_id, "done", json.dumps({
+            "message": "Pipeline Complete",
+            "run_id": run_id,
+            "feature_id": feature_id
+        }))
+        event_bus.finish(run_id)
             
     except Exception as e:
+        if lease_lost():
+            # The run belongs to the worker that reclaimed it
+            logger.warning(f"Background Task for {run_id} abandoned: {cancel_token.reason}")
+            if trace:
+                trace.discard()
+            raise
         logger.error(f"Background Task Failed: {e}")
+        if trace:
+            trace.close()
+        event_bus.publish(run_id, "error", str(e))
+        event_bus.finish(run_id)
         # Update status to FAILED
         try:
             db = get_database()
             db.compliance_runs.update_one(
                 {"run_id": run_id},
-                {"$set": {"status": "FAILED"}}
+                {"$set": {"status": "FAILED", "error": str(e)}}
             )
         except:
             pass
+        raise
+
+def run_core_job(job_doc: Dict[str, Any], cancel_token: Optional[CancelToken] = None):
+    """
+    Worker handler for a leased /run/core job. Runs retried after a lost
+    lease restart from the checkpoints saved by the previous attempt;
+    `cancel_token` stops this attempt if its lease is lost.
+    """
+    run_id = job_doc["run_id"]
+    payload = (job_doc.get("job") or {}).get("payload") or {}
+    checkpoints = job_doc.get("checkpoints") or None
+    if job_doc["job"].get("attempts", 1) > 1:
+        TraceStore(get_database()).clear(run_id)
+
+    background_core_task(
+        run_id,
+        job_doc.get("feature_id"),
+        job_doc.get("context_data"),
+        checkpoints,
+        payload.get("use_cache", True),
+        cancel_token
+    )
+
+def start_worker_pool(concurrency: int = JOB_WORKER_CONCURRENCY) -> WorkerPool:
+    queue = get_job_queue()
+    queue.ensure_indexes()
+    pool = WorkerPool(queue, run_core_job, concurrency=concurrency)
+    pool.start()
+    return pool
+
+def bootstrap_database():
+    """
+    Ensures the indexes of the run, user and job queries (and audits their
+    plans when DB_QUERY_AUDIT is set).
+    """
+    get_job_queue().ensure_indexes()
+    bootstrap_indexes(get_database())
+
+def attach_event_bus_backend():
+    if EVENT_BUS_BACKEND == "mongo" and event_bus.backend is None:
+        event_bus.use_backend(MongoBusBackend(get_database()))
 
 @app.post("/run/core")
 async def trigger_core_pipeline(
     request: PipelineRequest,
-    background_tasks: BackgroundTasks,
-    db: Database = Depends(get_database),
+    http_request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_async_database),
+    jobs: AsyncJobQueue = Depends(get_async_job_queue),
     # current_user: dict = Depends(get_current_user)
 ):
     """
-    Triggers Pipeline A (Core) asynchronously.
-    Returns run_id immediately.
+    Queues Pipeline A (Core) for the worker pool.
+    Returns run_id immediately; 503 when the queue is full, 429 when the
+    caller is over its rate or pending-job limit.
     """
+    principal = request_principal(http_request)
+    await admit_job(principal, jobs)
+
+    priority = request.priority
+    if priority and principal not in JOB_PRIORITY_PRINCIPALS:
+        logger.info(f"Ignoring priority {priority} from untrusted principal {principal}")
+        priority = 0
+
     run_id = str(uuid.uuid4())
     # Generate feature_id if not provided, or use provided
     feature_id = request.feature_id or f"feat_{run_id[:8]}"
@@ -266,72 +550,145 @@ async def trigger_core_pipeline(
         "feature_id": feature_id,
         "timestamp": datetime.datetime.utcnow().isoformat(),
         "verdict_json": None,
-        "agent_trace": [],
         "risk_json": None,
         "autofix_json": None,
-        "status": "IN_PROGRESS"
+        "context_data": request.context_data,
+        "checkpoints": [],
+        "status": "QUEUED"
     }
     
-    db.compliance_runs.insert_one(initial_doc)
+    await db.compliance_runs.insert_one(initial_doc)
     
-    # 2. Add to Background Tasks
-    background_tasks.add_task(background_core_task, run_id, feature_id, request.context_data)
+    # 2. Hand over to the job queue
+    try:
+        await jobs.enqueue(
+            run_id,
+            priority=priority,
+            payload={"use_cache": not request.bypass_cache},
+            principal=principal
+        )
+    except QueueFull as e:
+        await db.compliance_runs.update_one({"run_id": run_id}, {"$set": {"status": "REJECTED", "error": str(e)}})
+        raise HTTPException(status_code=503, detail=str(e))
     
     return {
         "run_id": run_id,
         "feature_id": feature_id,
-        "status": "IN_PROGRESS",
-        "message": "Pipeline started in background"
+        "status": "QUEUED",
+        "message": "Pipeline queued"
+    }
+
+@app.post("/run/{run_id}/resume")
+async def resume_core_pipeline(
+    run_id: str,
+    http_request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_async_database),
+    jobs: AsyncJobQueue = Depends(get_async_job_queue),
+    # current_user: dict = Depends(get_current_user)
+):
+    """
+    Resumes a failed Pipeline A run from its last checkpointed step.
+    Completed jury/critic/judge steps are replayed, not re-run.
+    """
+    run_record = await db.compliance_runs.find_one({"run_id": run_id})
+
+    if not run_record:
+        raise HTTPException(status_code=404, detail="Run ID not found")
+
+    if run_record.get("status") in ("IN_PROGRESS", "QUEUED"):
+        raise HTTPException(status_code=409, detail="Run is still in progress")
+
+    if run_record.get("verdict_json") is not None and run_record.get("status") != "FAILED":
+        return {
+            "run_id": run_id,
+            "feature_id": run_record.get("feature_id"),
+            "status": run_record.get("status"),
+            "message": "Run already completed"
+        }
+
+    if not run_record.get("context_data"):
+        raise HTTPException(status_code=400, detail="Run has no stored context to resume from")
+
+    principal = request_principal(http_request)
+    await admit_job(principal, jobs)
+
+    checkpoints = run_record.get("checkpoints") or []
+
+    await db[TRACE_COLLECTION].delete_many({"run_id": run_id})
+    await db.compliance_runs.update_one(
+        {"run_id": run_id},
+        {"$unset": {"error": "", "agent_trace": "", "trace_summary": ""}}
+    )
+
+    # The worker replays the run's stored checkpoints
+    try:
+        queued = await jobs.enqueue(run_id, priority=(run_record.get("job") or {}).get("priority", 0), principal=principal)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if not queued:
+        raise HTTPException(status_code=409, detail="Run is still in progress")
+
+    return {
+        "run_id": run_id,
+        "feature_id": run_record.get("feature_id"),
+        "status": "QUEUED",
+        "resumed_steps": [c.get("step") for c in checkpoints],
+        "message": "Pipeline resume queued"
     }
 
 @app.post("/run/risk")
-def trigger_risk_pipeline(
+async def trigger_risk_pipeline(
     request: RiskRequest,
-    db: Database = Depends(get_database),
+    http_request: Request,
+    fused: Optional[bool] = None,
+    db: AsyncIOMotorDatabase = Depends(get_async_database),
     # current_user: dict = Depends(get_current_user)
 ):
     """
     Triggers Pipeline B (Risk). Publicly accessible.
+    ?fused=true also produces the auto-fixes in the same LLM call and stores
+    them, so a later /run/autofix is served from the run document.
+    Runs under admission control (429 with Retry-After when over limits).
     """
     # Verify Run exists
-    run_record = db.compliance_runs.find_one({"run_id": request.run_id})
+    run_record = await db.compliance_runs.find_one({"run_id": request.run_id})
     
     if not run_record:
         raise HTTPException(status_code=404, detail="Run ID not found")
         
-    try:
-        result = run_risk_pipeline(
-            feature_id=request.feature_id, 
-            run_id=request.run_id,
-            verdict_data=run_record.get("verdict_json")
-        )
-        
-        # Update Record
-        db.compliance_runs.update_one(
-            {"run_id": request.run_id},
-            {
-                "$set": {
-                    "risk_json": result.get("risk_assessment"),
-                    "status": "RISK_COMPLETED"
-                }
-            }
-        )
-        
-        return result
-    except Exception as e:
-        logger.error(f"Risk Pipeline failed: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    async with admission.slot(request_principal(http_request)):
+        try:
+            stage_run = await run_stages(
+                ["risk", "governance"],
+                context_data=run_record.get("context_data"),
+                seed={"core": _core_seed(run_record, request.feature_id)},
+                on_stage=stage_persister(request.run_id),
+                fused=fused
+            )
+            if not stage_run.ok("risk"):
+                raise stage_run.errors["risk"]
+            
+            # Same response shape in fused and two-call mode
+            result = stage_run.results["risk"]
+            return {k: v for k, v in result.items() if k not in ("auto_fix", "fused_stats")}
+        except Exception as e:
+            logger.error(f"Risk Pipeline failed: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/run/autofix")
-def trigger_autofix_pipeline(
+async def trigger_autofix_pipeline(
     request: AutofixRequest,
-    db: Database = Depends(get_database),
+    http_request: Request,
+    fused: Optional[bool] = None,
+    db: AsyncIOMotorDatabase = Depends(get_async_database),
     # current_user: dict = Depends(get_current_user)
 ):
     """
     Triggers Pipeline C (Auto-fix). Publicly accessible.
+    With ?fused=true and no stored risk assessment, risk and fixes come
+    from a single LLM call. Cache misses run under admission control.
     """
-    run_record = db.compliance_runs.find_one({"run_id": request.run_id})
+    run_record = await db.compliance_runs.find_one({"run_id": request.run_id})
     
     if not run_record:
         raise HTTPException(status_code=404, detail="Run ID not found")
@@ -341,41 +698,41 @@ def trigger_autofix_pipeline(
         logger.info(f"Autofix Cache Hit for {request.run_id}")
         return {"auto_fix": run_record["autofix_json"]}
         
-    try:
-        result = run_autofix_pipeline(
-            feature_id=request.feature_id,
-            run_id=request.run_id,
-            verdict_data=run_record.get("verdict_json"),
-            risk_data=run_record.get("risk_json")
-        )
-        
-        # Update Record
-        db.compliance_runs.update_one(
-            {"run_id": request.run_id},
-            {
-                "$set": {
-                    "autofix_json": result.get("auto_fix"),
-                    "status": "AUTOFIX_COMPLETED"
-                }
-            }
-        )
+    # Seed whatever is already stored; a missing risk assessment is
+    # computed first by the scheduler and persisted alongside the fixes.
+    seed = {"core": _core_seed(run_record, request.feature_id)}
+    if run_record.get("risk_json"):
+        seed["risk"] = {"risk_assessment": run_record["risk_json"]}
         
-        return result
-    except Exception as e:
-        logger.error(f"Autofix Pipeline failed: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    async with admission.slot(request_principal(http_request)):
+        try:
+            stage_run = await run_stages(
+                ["autofix"],
+                context_data=run_record.get("context_data"),
+                seed=seed,
+                on_stage=stage_persister(request.run_id),
+                fused=fused
+            )
+            if not stage_run.ok("autofix"):
+                raise stage_run.errors["autofix"]
+            
+            return stage_run.results["autofix"]
+        except Exception as e:
+            logger.error(f"Autofix Pipeline failed: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/results/{feature_id}/{run_id}")
-def get_run_results(
+async def get_run_results(
     feature_id: str, 
     run_id: str,
-    db: Database = Depends(get_database),
+    db: AsyncIOMotorDatabase = Depends(get_async_database),
     # current_user: dict = Depends(get_current_user)
 ):
     """
     Fetch full results from DB. Publicly accessible.
+    The agent trace is served separately by /runs/{run_id}/trace.
     """
-    run_record = db.compliance_runs.find_one({"run_id": run_id, "feature_id": feature_id})
+    run_record = await db.compliance_runs.find_one({"run_id": run_id, "feature_id": feature_id}, {"agent_trace": 0})
     
     if not run_record:
         raise HTTPException(status_code=404, detail="Result not found")
@@ -386,187 +743,549 @@ def get_run_results(
         
     return run_record
 
+TRACE_PAGE_MAX = 500
+
+async def _embedded_trace_page(db: AsyncIOMotorDatabase, run_id: str, after: Optional[int], limit: int, logs: bool):
+    """
+    Trace page of a run stored before traces moved to their own collection.
+    None if the run does not exist.
+    """
+    start = after + 1 if after is not None else 0
+    run_record = await db.compliance_runs.find_one(
+        {"run_id": run_id},
+        {"_id": 0, "run_id": 1, "agent_trace": {"$slice": [start, limit + 1]}}
+    )
+    if run_record is None:
+        return None
+    items = []
+    for i, item in enumerate(run_record.get("agent_trace") or []):
+        item = {**item, "seq": start + i}
+        if not logs:
+            item.pop("logs", None)
+        items.append(item)
+    return items
+
+@app.get("/runs/{run_id}/trace")
+async def get_run_trace(
+    run_id: str,
+    cursor: Optional[int] = None,
+    limit: int = 50,
+    logs: bool = True,
+    db: AsyncIOMotorDatabase = Depends(get_async_database),
+):
+    """
+    A run's agent trace, one step per item in order, paginated by seq.
+    logs=false leaves out the streamed log lines of each step.
+    """
+    limit = max(1, min(limit, TRACE_PAGE_MAX))
+    query, projection = page_query(run_id, cursor, logs)
+    items = await db[TRACE_COLLECTION].find(query, projection).sort("seq", 1).limit(limit + 1).to_list(limit + 1)
+    if not items:
+        items = await _embedded_trace_page(db, run_id, cursor, limit, logs)
+        if items is None:
+            raise HTTPException(status_code=404, detail="Run ID not found")
+
+    next_cursor = items[limit - 1]["seq"] if len(items) > limit else None
+    return {"run_id": run_id, "items": items[:limit], "next_cursor": next_cursor}
+
+# Statuses after which a run's status no longer changes on its own
+ACTIVE_RUN_STATUSES = ("QUEUED", "IN_PROGRESS")
+STATUS_LONG_POLL_MAX_SECONDS = float(os.getenv("STATUS_LONG_POLL_MAX_SECONDS", "30"))
+# Long-poll re-reads: at least this often without events, at most this often with them
+STATUS_POLL_SECONDS = float(os.getenv("STATUS_POLL_SECONDS", "2.0"))
+STATUS_MIN_READ_SECONDS = float(os.getenv("STATUS_MIN_READ_SECONDS", "0.5"))
+
+def _run_status_pipeline(run_id: str) -> List[Dict[str, Any]]:
+    """
+    Status, current step and counters of a run, computed server-side so
+    the trace and results never leave the database.
+    """
+    return [
+        {"$match": {"run_id": run_id}},
+        {"$limit": 1},
+        {"$project": {
+            "_id": 0,
+            "run_id": 1,
+            "feature_id": 1,
+            "status": 1,
+            "error": 1,
+            "completed_at": 1,
+            "job_state": "$job.state",
+            "attempts": "$job.attempts",
+            # Runs stored before traces moved out still embed agent_trace
+            "steps": {"$ifNull": ["$trace_summary.steps", {"$size": {"$ifNull": ["$agent_trace", []]}}]},
+            "checkpoints": {"$size": {"$ifNull": ["$checkpoints", []]}},
+            "current_agent": {"$ifNull": ["$trace_summary.agent", {"$arrayElemAt": ["$agent_trace.agent", -1]}]},
+            "current_step": {"$ifNull": ["$trace_summary.step", {"$arrayElemAt": ["$agent_trace.step", -1]}]},
+            "has_verdict": {"$ne": [{"$ifNull": ["$verdict_json", None]}, None]},
+            "has_risk": {"$ne": [{"$ifNull": ["$risk_json", None]}, None]},
+            "has_autofix": {"$ne": [{"$ifNull": ["$autofix_json", None]}, None]},
+        }},
+    ]
+
+async def _read_run_status(db: AsyncIOMotorDatabase, run_id: str) -> Optional[Dict[str, Any]]:
+    docs = await db.compliance_runs.aggregate(_run_status_pipeline(run_id)).to_list(1)
+    metrics.incr("status.reads")
+    return docs[0] if docs else None
+
+def _status_etag(run_status: Dict[str, Any]) -> str:
+    body = json.dumps(run_status, sort_keys=True, default=str).encode("utf-8")
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+@app.get("/runs/{run_id}/status")
+async def get_run_status(
+    run_id: str,
+    request: Request,
+    wait: float = 0,
+    db: AsyncIOMotorDatabase = Depends(get_async_database),
+):
+    """
+    Small progress view of a run for polling. Send the last ETag as
+    If-None-Match to get 304 while nothing changed; with ?wait=<seconds>
+    an unchanged active run is held until its status changes (long-poll).
+    """
+    run_status = await _read_run_status(db, run_id)
+    if not run_status:
+        raise HTTPException(status_code=404, detail="Run ID not found")
+    etag = _status_etag(run_status)
+    # A client only ever holds this endpoint's last ETag
+    known = (request.headers.get("if-none-match") or "").split(",")[0].strip().replace("W/", "", 1) or None
+
+    if wait > 0 and known == etag and run_status.get("status") in ACTIVE_RUN_STATUSES:
+        # Run events wake the poll early; the timed re-read covers runs
+        # executed by another process
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(wait, STATUS_LONG_POLL_MAX_SECONDS)
+        sub = event_bus.subscribe(run_id)
+        try:
+            while etag == known:
+                remaining = deadline - loop.time()
+                if remaining <= 0 or await request.is_disconnected():
+                    break
+                last_read = loop.time()
+                try:
+                    await asyncio.wait_for(sub.get_batch(), timeout=min(remaining, STATUS_POLL_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+                await asyncio.sleep(max(0.0, min(last_read + STATUS_MIN_READ_SECONDS, deadline) - loop.time()))
+                run_status = await _read_run_status(db, run_id) or run_status
+                etag = _status_etag(run_status)
+        finally:
+            event_bus.unsubscribe(sub)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if known == etag:
+        metrics.incr("status.not_modified")
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(run_status, headers=headers)
+
+HISTORY_PAGE_MAX = 500
+
+def _history_params(feature_id: str, cursor: Optional[str], fields: str):
+    if not valid_feature_id(feature_id):
+        raise HTTPException(status_code=404, detail="Feature not found")
+    if fields not in ("meta", "full"):
+        raise HTTPException(status_code=400, detail="fields must be 'meta' or 'full'")
+    try:
+        after = int(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return after, fields == "full"
+
+@app.get("/history/{feature_id}")
+async def get_verdict_history(
+    feature_id: str,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    fields: str = "meta",
+):
+    """
+    One page of a feature's verdict versions, oldest first. fields=meta
+    (version, timestamp) is served from the history index without reading
+    the records; pass next_cursor back as cursor for the following page.
+    """
+    after, full = _history_params(feature_id, cursor, fields)
+    limit = max(1, min(limit, HISTORY_PAGE_MAX))
+    items, next_cursor = await asyncio.to_thread(page_verdict_history, feature_id, after, limit, full)
+    return {"feature_id": feature_id, "items": items, "next_cursor": next_cursor}
+
+@app.get("/history/{feature_id}/export")
+def export_verdict_history(feature_id: str, cursor: Optional[str] = None, fields: str = "full"):
+    """
+    The whole history as NDJSON, one version per line, streamed as it is read.
+    """
+    after, full = _history_params(feature_id, cursor, fields)
+
+    def lines():
+        for record in iter_verdict_history(feature_id, after, full):
+            yield json.dumps(record, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/metrics")
+async def get_metrics(jobs: AsyncJobQueue = Depends(get_async_job_queue)):
+    """
+    Process-local pipeline metrics.
+    """
+    counters = metrics.snapshot()
+    return {
+        "verdict_cache": cache_stats(),
+        "compliance_diff": {
+            "structural": counters.get("compliance_diff.structural", 0),
+            "llm": counters.get("compliance_diff.llm", 0),
+        },
+        "fused_risk_autofix": fused_savings(),
+        "risk_fast_path": fast_path_stats(),
+        "event_bus": event_bus.stats(),
+        "principal_cache": auth.principal_cache.stats(),
+        "admission": admission.stats(),
+        "job_queue": {**(await jobs.stats()), "in_process_workers": _worker_pool.active() if _worker_pool else None},
+        "stage_latency": metrics.observations()
+    }
+
 # --- Streaming Endpoint (Merged from streaming.py) ---
 
+# What a stream does when its last client goes away: "cancel" aborts the
+# pipeline after the grace period, "continue" lets it finish and persist
+SSE_DISCONNECT_POLICIES = ("cancel", "continue")
+SSE_DISCONNECT_POLICY = os.getenv("SSE_DISCONNECT_POLICY", "cancel").lower()
+SSE_DISCONNECT_GRACE_SECONDS = float(os.getenv("SSE_DISCONNECT_GRACE_SECONDS", "10"))
+# Also keep stream events in MongoDB so reconnects survive buffer rollover
+SSE_REPLAY_MONGO = os.getenv("SSE_REPLAY_MONGO", "false").lower() == "true"
+
+# run_id -> {"task", "cancel_token", "on_disconnect", "grace", "cancel_handle"}
+_live_runs: Dict[str, Dict[str, Any]] = {}
+_sse_event_store: Optional[MongoEventStore] = None
+
+def get_sse_event_store() -> Optional[MongoEventStore]:
+    global _sse_event_store
+    if SSE_REPLAY_MONGO and _sse_event_store is None:
+        _sse_event_store = MongoEventStore(get_database().sse_events)
+        _sse_event_store.ensure_indexes()
+    return _sse_event_store
+
+def _on_last_reader_gone(run_id: str):
+    """
+    Applies the disconnect policy once no client follows a live run.
+    Completed stages are already persisted by the stage hook either way.
+    """
+    live = _live_runs.get(run_id)
+    if not live or live["task"].done():
+        return
+    metrics.incr("sse.disconnects")
+
+    if live["on_disconnect"] == "continue":
+        logger.info(f"SSE clients of {run_id} disconnected; pipeline keeps running and will persist its results")
+        return
+
+    def cancel():
+        live["cancel_handle"] = None
+        stream = get_stream(run_id)
+        if not live["task"].done() and not (stream and stream.readers):
+            logger.info(f"SSE clients of {run_id} disconnected; cancelling pipeline")
+            metrics.incr("sse.cancelled_runs")
+            live["cancel_token"].cancel("client disconnected")
+
+    live["cancel_handle"] = asyncio.get_running_loop().call_later(live["grace"], cancel)
+
+async def follow_run_stream(stream: RunStream, after_id: int = 0):
+    """
+    Streams a run's events after `after_id` to one client. A reconnecting
+    client within the grace period keeps the pipeline from being cancelled.
+    """
+    live = _live_runs.get(stream.run_id)
+    if live and live.get("cancel_handle"):
+        live["cancel_handle"].cancel()
+        live["cancel_handle"] = None
+    stream.readers += 1
+    try:
+        # One pre-encoded write per batch of events
+        async for chunk in framed(stream.follow_batches(after_id)):
+            yield chunk
+    finally:
+        stream.readers -= 1
+        if not stream.readers and not stream.finished:
+            _on_last_reader_gone(stream.run_id)
+
+def _sse_response(generator, run_id: str):
+    return EventSourceResponse(
+        generator,
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Run-ID": run_id,
+        }
+    )
+
 @app.post("/pipeline/run")
 async def stream_pipeline(request: Request):
     """
     SSE Endpoint that runs the full pipeline and streams events.
     Receives JSON body with context_data.
+    Stages run through the shared scheduler: core → (risk ‖ diff), and
+    autofix starts as soon as risk is done (disable with ?autofix=false).
+    ?bypass_cache=true forces a fresh verdict instead of a cached one.
+    ?fused=true|false overrides the fused risk+autofix default.
+    ?on_disconnect=cancel|continue and ?grace=<seconds> override what happens
+    when the client disconnects (SSE_DISCONNECT_POLICY / _GRACE_SECONDS).
+    Events carry ids; the run_id (X-Run-ID header and `run` event) lets a
+    dropped client reconnect via GET /pipeline/run/{run_id}/stream.
+    The run holds an admission slot until its last stage finishes; over the
+    caller's limits the request gets 429 with Retry-After instead.
     """
     try:
         body = await request.json()
     except Exception:
         body = {}
 
+    # Validated before anything is started
+    on_disconnect = request.query_params.get("on_disconnect", SSE_DISCONNECT_POLICY).lower()
+    if on_disconnect not in SSE_DISCONNECT_POLICIES:
+        raise HTTPException(status_code=400, detail="on_disconnect must be 'cancel' or 'continue'")
+    try:
+        grace = float(request.query_params.get("grace", SSE_DISCONNECT_GRACE_SECONDS))
+    except ValueError:
+        grace = -1.0
+    if not 0 <= grace < float("inf"):
+        raise HTTPException(status_code=400, detail="grace must be a non-negative number of seconds")
+
+    principal = request_principal(request)
     context_data = body
-    feature_id = context_data.get("feature_id", "unknown_feature")
 
-    queue = asyncio.Queue()
-    
-    # Check for client disconnect
-    async def cleanup():
-        # Logic to cancel tasks if needed
-        pass
+    targets = ["diff", "risk", "governance"]
+    if request.query_params.get("autofix", "true").lower() != "false":
+        targets.append("autofix")
+    use_cache = request.query_params.get("bypass_cache", "false").lower() != "true"
+    fused_param = request.query_params.get("fused")
+    fused = None if fused_param is None else fused_param.lower() == "true"
+
+    run_id = str(uuid.uuid4())
+    cancel_token = CancelToken()
+    stream = open_stream(run_id, store=get_sse_event_store())
 
-    # Capture the main event loop to use inside the thread callback
-    main_loop = asyncio.get_running_loop()
+    # Bridge from Sync (Agent Code) -> Async, drained in coalesced batches
+    bridge = EventBridge(asyncio.get_running_loop())
 
     def on_event_callback(event_type, data):
+        bridge.put({"event": event_type, "data": data})
+
+    persist_stage = stage_persister(run_id)
+
+    def on_stage_callback(name, stage_status, payload):
         """
-        Bridge from Sync (Agent Code) -> Async Queue
+        Persists the stage result, then hands it to the stream.
+        Called from the stage worker thread.
         """
-        # Use call_soon_threadsafe with the captured main loop
-        main_loop.call_soon_threadsafe(queue.put_nowait, {"event": event_type, "data": data})
+        persist_stage(name, stage_status, payload)
+        bridge.put({"stage": name, "status": stage_status, "payload": payload})
 
-    async def event_generator():
-        # Submit the sync task to thread
-        loop = asyncio.get_running_loop()
-        yield {"event": "status", "data": "Pipeline Started"}
-
-        # Define the task wrapper
-        def run_sync_pipeline():
-            try:
-                result = run_core_pipeline(context_data, on_event=on_event_callback)
-                return result
-            except Exception as e:
-                logger.error(f"Pipeline Error: {e}")
-                raise e
+    def stage_events(item):
+        """
+        Maps a stage completion/failure to the SSE events the frontend expects.
+        """
+        name, stage_status, payload = item["stage"], item["status"], item["payload"]
 
-        # Run core pipeline
-        core_future = loop.run_in_executor(None, run_sync_pipeline)
-        
-        core_result = None
-        
-        while not core_future.done():
-            # Wait for queue items OR core completion
-            get_task = asyncio.create_task(queue.get())
-            
-            done, pending = await asyncio.wait(
-                [get_task, core_future],
-                return_when=asyncio.FIRST_COMPLETED
-            )
-            
-            if get_task in done:
-                event = get_task.result()
-                yield {"event": event["event"], "data": json.dumps(event["data"])}
+        if stage_status == STAGE_COMPLETED:
+            if name == "core":
+                yield {"event": "verdict", "data": json.dumps(payload.get("verdict", {}))}
+                yield {"event": "status", "data": "Running Risk & Diff Analysis"}
+            elif name == "risk":
+                yield {"event": "risk", "data": json.dumps(payload.get("risk_assessment", {}))}
+            elif name == "diff":
+                yield {"event": "diff", "data": json.dumps(payload)}
+            elif name == "autofix":
+                yield {"event": "autofix", "data": json.dumps(payload.get("auto_fix", {}))}
+            elif name == "governance":
+                yield {"event": "governance", "data": json.dumps(payload)}
+        elif stage_status == STAGE_FAILED:
+            if name == "core":
+                logger.error(f"Pipeline Error: {payload}")
+                yield {"event": "error", "data": str(payload)}
+            elif name == "risk":
+                logger.error(f"Risk Error: {payload}")
+                yield {"event": "error", "data": f"Risk Failed: {str(payload)}"}
             else:
-                # Core future finished, cancel the get wait
-                get_task.cancel()
-        
-        # Core is done
-        try:
-            core_result = await core_future
-            
-            # --- Persist VERDICT to Storage ---
-            try:
-                db = get_database()
-                run_id = core_result.get("run_id")
-                
-                # Upsert Logic
-                # Use find_one_and_update (upsert=True) or update_one (upsert=True)
-                # We need to ensure we set basic fields if it's new
-                
-                update_doc = {
-                    "$set": {
-                        "run_id": run_id,
-                        "feature_id": core_result.get("feature_id"),
-                        "verdict_json": core_result.get("verdict"),
-                        "agent_trace": core_result.get("agent_trace"),
-                        "status": "CORE_COMPLETED",
-                        "completed_at": datetime.datetime.utcnow().isoformat(),
-                        "timestamp": datetime.datetime.utcnow().isoformat() # Only update timestamp if new? Overwrite is fine.
-                    }
-                }
-                
-                db.compliance_runs.update_one(
-                    {"run_id": run_id},
-                    update_doc,
-                    upsert=True
-                )
+                logger.error(f"{name.capitalize()} Error: {payload}")
 
-            except Exception as e:
-                logger.error(f"Failed to persist verdict: {e}")
+    def to_sse(item):
+        if "stage" in item:
+            return list(stage_events(item))
+        return [{"event": item["event"], "data": json.dumps(item["data"])}]
 
-            # Yield Verdict
-            yield {"event": "verdict", "data": json.dumps(core_result.get("verdict", {}))}
-            
-            # 2. RUN PARALLEL TASKS (Risk + Diff)
-            yield {"event": "status", "data": "Running Risk & Diff Analysis"}
-            
-            # Risk Wrapper
-            def run_risk():
-                return run_risk_pipeline(feature_id, "temp_run_id", verdict_data=core_result.get("verdict", {}))
-                
-            # Diff Wrapper
-            def run_diff():
-                prev = get_previous_verdict(feature_id)
-                # Call generate_compliance_diff. 
-                prev_verdict = prev.get("verdict") if prev else None
-                prev_snap = prev.get("laws_snapshot") if prev else None
-                curr_snap = core_result.get("laws_snapshot") 
-                
-                if core_result.get("compliance_diff"):
-                    return core_result.get("compliance_diff")
-                
-                return generate_compliance_diff(
-                    previous_verdict=prev_verdict,
-                    current_verdict=core_result.get("verdict", {}),
-                    previous_laws_snapshot=prev_snap,
-                    current_laws_snapshot=curr_snap
-                )
+    def publish(events):
+        stream.publish_many(events)
+        for event in events:
+            event_bus.publish(run_id, event["event"], event["data"])
+
+    async def pump():
+        """
+        Runs the stages and publishes their events to the run stream,
+        independently of which clients are connected.
+        """
+        try:
+            stages_task = asyncio.create_task(run_stages(
+                targets,
+                context_data=context_data,
+                run_id=run_id,
+                on_event=on_event_callback,
+                on_stage=on_stage_callback,
+                use_cache=use_cache,
+                fused=fused,
+                cancel_token=cancel_token
+            ))
+            # Every event is put before the scheduler returns
+            stages_task.add_done_callback(lambda _: bridge.close())
+
+            while True:
+                batch = await bridge.get_batch()
+                if not batch:
+                    break
+                publish([event for item in batch for event in to_sse(item)])
 
-            risk_future = loop.run_in_executor(None, run_risk)
-            diff_future = loop.run_in_executor(None, run_diff)
-            
-            # Wait for both
-            results = await asyncio.gather(risk_future, diff_future, return_exceptions=True)
-            risk_res, diff_res = results
-            
-            # --- Persist Results to Storage ---
             try:
-                db = get_database()
-                updates = {}
-                
-                if not isinstance(risk_res, Exception):
-                    updates["risk_json"] = risk_res.get("risk_assessment")
-                    updates["status"] = "RISK_COMPLETED" 
-
-                if updates:
-                    db.compliance_runs.update_one(
-                        {"run_id": core_result.get("run_id")},
-                        {"$set": updates}
-                    )
+                stage_run = stages_task.result()
             except Exception as e:
-                logger.error(f"Failed to persist streaming results: {e}")
+                publish([{"event": "error", "data": str(e)}])
+                return
 
-            if isinstance(risk_res, Exception):
-                logger.error(f"Risk Error: {risk_res}")
-                yield {"event": "error", "data": f"Risk Failed: {str(risk_res)}"}
-            else:
-                yield {"event": "risk", "data": json.dumps(risk_res.get("risk_assessment", {}))}
-                
-            if isinstance(diff_res, Exception):
-                logger.error(f"Diff Error: {diff_res}")
-            else:
-                yield {"event": "diff", "data": json.dumps(diff_res)}
-                 
-            yield {"event": "done", "data": json.dumps({
+            if not stage_run.ok("core"):
+                return
+
+            core_result = stage_run.results["core"]
+            publish([{"event": "done", "data": json.dumps({
                 "message": "Pipeline Complete",
                 "run_id": core_result.get("run_id"),
                 "feature_id": core_result.get("feature_id")
-            })}
+            })}])
+        finally:
+            try:
+                # Marks the end for /runs/{run_id}/events: stages may still
+                # write a *_COMPLETED status mid-run
+                db = await get_async_database()
+                await db.compliance_runs.update_one({"run_id": run_id}, {"$set": {"stream_finished": True}})
+            except Exception as e:
+                logger.error(f"Failed to mark stream {run_id} finished: {e}")
+            finally:
+                close_stream(run_id)
+                event_bus.finish(run_id)
+                _live_runs.pop(run_id, None)
+                admission.release(principal, time.monotonic() - admitted_at)
 
-        except Exception as e:
-            yield {"event": "error", "data": str(e)}
+    try:
+        await admission.acquire(principal)
+    except BaseException:
+        close_stream(run_id)
+        raise
+    admitted_at = time.monotonic()
 
-    return EventSourceResponse(
-    event_generator(),
-    headers={
-        "Cache-Control": "no-cache",
-        "Connection": "keep-alive",
-    }
-)
+    # From here the slot is released by pump(); until it starts, by us
+    try:
+        publish([
+            {"event": "status", "data": "Pipeline Started"},
+            {"event": "run", "data": json.dumps({"run_id": run_id})},
+        ])
+        live = {
+            "cancel_token": cancel_token,
+            "on_disconnect": on_disconnect,
+            "grace": grace,
+            "cancel_handle": None,
+        }
+    except BaseException:
+        admission.release(principal, time.monotonic() - admitted_at)
+        close_stream(run_id)
+        event_bus.finish(run_id)
+        raise
+
+    live["task"] = asyncio.create_task(pump())
+    _live_runs[run_id] = live
+
+    return _sse_response(follow_run_stream(stream), run_id)
+
+@app.get("/pipeline/run/{run_id}/stream")
+async def reconnect_pipeline_stream(run_id: str, request: Request, last_event_id: Optional[int] = None):
+    """
+    Re-attaches to a pipeline stream started by POST /pipeline/run.
+    Replays the events after the Last-Event-ID header (or ?last_event_id=)
+    and keeps following the run if it is still going; no new run is started.
+    """
+    header = request.headers.get("last-event-id")
+    try:
+        after_id = int(header) if header else (last_event_id or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+    stream = get_stream(run_id)
+    if stream:
+        metrics.incr("sse.reconnects")
+        return _sse_response(follow_run_stream(stream, after_id), run_id)
+
+    store = get_sse_event_store()
+    if store:
+        events = await replay_stored(store, run_id, after_id)
+        if events or after_id:
+            metrics.incr("sse.reconnects")
+
+            async def replay():
+                for event in events:
+                    yield event
+
+            return _sse_response(replay(), run_id)
+
+    raise HTTPException(status_code=404, detail="Stream not found or expired")
+
+# Run states after which no more run events will be published
+_TERMINAL_RUN_STATUSES = {"FAILED", "REJECTED"}
+
+def _run_has_ended(run_doc: Dict[str, Any]) -> bool:
+    if run_doc.get("status") in _TERMINAL_RUN_STATUSES:
+        return True
+    job = run_doc.get("job")
+    if job:
+        return job.get("state") in (JOB_DONE, JOB_FAILED)
+    # Stream runs (no job) are marked once their pump is done
+    return bool(run_doc.get("stream_finished"))
+
+@app.get("/runs/{run_id}/events")
+async def watch_run_events(
+    run_id: str,
+    policy: str = EVENT_BUS_DROP_POLICY,
+    db: AsyncIOMotorDatabase = Depends(get_async_database)
+):
+    """
+    Live events of a run (SSE or /run/core) for any number of viewers.
+    Each viewer has its own bounded queue; a viewer that falls behind loses
+    events (?policy=drop_oldest|drop_newest) rather than slowing the run.
+    404 for unknown runs, 410 for runs that have already ended.
+    """
+    if run_id not in _live_runs:
+        run_doc = await db.compliance_runs.find_one({"run_id": run_id}, {"status": 1, "job.state": 1, "stream_finished": 1})
+        if run_doc is None:
+            raise HTTPException(status_code=404, detail="Run ID not found")
+        if _run_has_ended(run_doc):
+            raise HTTPException(status_code=410, detail="Run already finished")
+    # Checked again after the lookup: nothing below awaits before subscribing
+    if event_bus.is_finished(run_id):
+        raise HTTPException(status_code=410, detail="Run already finished")
+    try:
+        sub = event_bus.subscribe(run_id, policy=policy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def relay():
+        try:
+            while True:
+                batch = await sub.get_batch()
+                ended = batch[-1]["event"] == EVENT_END
+                if ended:
+                    batch.pop()
+                if batch:
+                    yield encode_batch(batch)
+                if ended:
+                    return
+        finally:
+            event_bus.unsubscribe(sub)
+
+    return EventSourceResponse(relay(), headers={"Cache-Control": "no-cache", "Connection": "keep-alive"})
 
 # --- Application Entry Point & Port Selection ---
 import uvicorn
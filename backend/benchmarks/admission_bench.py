@@ -0,0 +1,83 @@
+"""
+Benchmark: one principal flooding the pipeline endpoints while others send
+a request now and then, with a plain global semaphore (first come, first
+served) vs. backend.pipeline.admission's per-principal fair queueing.
+
+Each request holds a slot for `--hold-ms` (standing in for the LLM calls).
+Reports the light principals' median / p95 wait and how many of the heavy
+principal's requests were turned away with 429.
+
+    python -m backend.benchmarks.admission_bench --heavy 200 --light 5 --slots 4
+"""
+
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+from backend.pipeline.admission import AdmissionController, AdmissionRejected
+
+
+def summarize(waits: list) -> dict:
+    waits = sorted(waits)
+    return {
+        "p50_ms": round(statistics.median(waits), 1) if waits else None,
+        "p95_ms": round(waits[max(int(len(waits) * 0.95) - 1, 0)], 1) if waits else None,
+    }
+
+
+async def run(mode: str, heavy: int, light: int, rounds: int, slots: int, hold: float) -> dict:
+    semaphore = asyncio.Semaphore(slots)
+    controller = AdmissionController(
+        global_limit=slots, user_limit=slots, user_queue=heavy,
+        rate_per_minute=0, queue_timeout=3600, name=f"bench_{mode}"
+    )
+    light_waits, rejected = [], 0
+
+    async def request(principal: str, waits: list = None):
+        nonlocal rejected
+        t0 = time.perf_counter()
+        try:
+            if mode == "fifo":
+                async with semaphore:
+                    if waits is not None:
+                        waits.append((time.perf_counter() - t0) * 1000)
+                    await asyncio.sleep(hold)
+            else:
+                async with controller.slot(principal):
+                    if waits is not None:
+                        waits.append((time.perf_counter() - t0) * 1000)
+                    await asyncio.sleep(hold)
+        except AdmissionRejected:
+            rejected += 1
+
+    async def light_user(name: str):
+        for _ in range(rounds):
+            await request(name, light_waits)
+            await asyncio.sleep(hold / 2)
+
+    t0 = time.perf_counter()
+    flood = [asyncio.create_task(request("heavy")) for _ in range(heavy)]
+    await asyncio.sleep(0)
+    await asyncio.gather(*(light_user(f"light_{i}") for i in range(light)), *flood)
+    return {
+        "mode": mode,
+        "light_requests": len(light_waits),
+        "light_wait": summarize(light_waits),
+        "heavy_rejected": rejected,
+        "elapsed_s": round(time.perf_counter() - t0, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Admission control fairness benchmark")
+    parser.add_argument("--heavy", type=int, default=200, help="Requests fired at once by the heavy principal")
+    parser.add_argument("--light", type=int, default=5, help="Number of light principals")
+    parser.add_argument("--rounds", type=int, default=5, help="Sequential requests per light principal")
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--hold-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    for mode in ("fifo", "fair"):
+        print(json.dumps(asyncio.run(run(mode, args.heavy, args.light, args.rounds, args.slots, args.hold_ms / 1000))))
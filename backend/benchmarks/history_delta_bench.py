@@ -0,0 +1,120 @@
+"""
+Benchmark: verdict history storage, full pretty-printed JSON per version
+vs. base snapshots plus compressed structural deltas.
+
+Writes `--versions` successive verdicts for each of `--features` features
+with both file stores. Each version changes a few findings, as re-runs of
+the same feature do. Reports bytes on disk and the latency of
+latest / previous / random-version / full-history reads.
+
+    python -m backend.benchmarks.history_delta_bench --features 5 --versions 300
+"""
+
+import os
+import json
+import time
+import copy
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+
+from backend.features.compliance_history import history_manager
+from backend.features.compliance_history.history_manager import FileHistoryStore
+
+WORDS = "data user consent processing retention minor region transfer storage notice audit".split()
+
+
+def sentence(rng: random.Random, n: int = 25) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def initial_verdict(rng: random.Random, feature_id: str) -> dict:
+    return {
+        "feature": feature_id,
+        "verdict": "non_compliant",
+        "confidence": 0.8,
+        "summary": sentence(rng, 60),
+        "findings": [
+            {"law": f"LAW-{i}", "status": rng.choice(["compliant", "non_compliant"]),
+             "reasoning": sentence(rng), "evidence": [sentence(rng, 12) for _ in range(2)]}
+            for i in range(25)
+        ],
+    }
+
+
+def laws_snapshot(rng: random.Random) -> list:
+    return [{"law_id": f"LAW-{i}", "title": sentence(rng, 6), "text": sentence(rng, 80)} for i in range(25)]
+
+
+def mutate(rng: random.Random, verdict: dict) -> dict:
+    verdict = copy.deepcopy(verdict)
+    for _ in range(rng.randint(1, 3)):
+        finding = rng.choice(verdict["findings"])
+        finding["status"] = rng.choice(["compliant", "non_compliant"])
+        finding["reasoning"] = sentence(rng)
+    verdict["confidence"] = round(rng.uniform(0.6, 0.99), 2)
+    if rng.random() < 0.1:
+        verdict["summary"] = sentence(rng, 60)
+    return verdict
+
+
+def disk_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        history_manager._base_cache.clear()
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def run(delta: bool, features: int, versions: int, seed: int, repeat: int) -> dict:
+    root = tempfile.mkdtemp(prefix="history_bench_")
+    store = FileHistoryStore(root, delta=delta)
+    rng = random.Random(seed)
+    try:
+        t0 = time.perf_counter()
+        for f in range(features):
+            feature_id = f"feat_{f}"
+            verdict, laws = initial_verdict(rng, feature_id), laws_snapshot(rng)
+            for _ in range(versions):
+                verdict = mutate(rng, verdict)
+                store.store_verdict(feature_id, verdict, laws)
+        write_s = time.perf_counter() - t0
+
+        pick = random.Random(seed)
+        return {
+            "mode": "delta" if delta else "full_json",
+            "versions": features * versions,
+            "disk_bytes": disk_bytes(root),
+            "bytes_per_version": disk_bytes(root) // (features * versions),
+            "write_ms_per_version": round(write_s * 1000 / (features * versions), 3),
+            "latest_ms": timed(lambda: store.get_latest_verdict("feat_0"), repeat),
+            "previous_ms": timed(lambda: store.get_previous_verdict("feat_0"), repeat),
+            "random_version_ms": timed(lambda: store.get_verdict("feat_0", str(pick.randint(1, versions))), repeat),
+            "full_history_ms": timed(lambda: store.list_verdict_history("feat_0"), max(repeat // 10, 3)),
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verdict history storage benchmark")
+    parser.add_argument("--features", type=int, default=5)
+    parser.add_argument("--versions", type=int, default=300, help="Versions per feature")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed reads per measurement")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    full = run(False, args.features, args.versions, args.seed, args.repeat)
+    compact = run(True, args.features, args.versions, args.seed, args.repeat)
+    print(json.dumps(full))
+    print(json.dumps(compact))
+    print(f"storage: {full['disk_bytes']} -> {compact['disk_bytes']} bytes "
+          f"({round(full['disk_bytes'] / compact['disk_bytes'], 1)}x smaller)")
@@ -0,0 +1,120 @@
+"""
+Benchmark: hot lookups on a large compliance_runs collection, with and
+without the indexes declared in backend.database.indexes.
+
+Seeds a scratch database with `--runs` run documents and `--users` users,
+then times each query shape of the app (by run_id, by run_id + feature_id,
+users by username / email / either) before and after `ensure_indexes`,
+reporting latency percentiles, documents examined and the plan stages.
+
+    python -m backend.benchmarks.index_bench --uri mongodb://localhost:27017 --runs 1000000
+
+Never point this at the application database: the scratch database is
+dropped first.
+"""
+
+import json
+import time
+import random
+import argparse
+import statistics
+
+from pymongo import MongoClient
+
+from backend.database.indexes import INDEXES, ensure_indexes, explain_stages
+
+
+def seed(database, runs: int, users: int, batch: int = 10000):
+    start = time.perf_counter()
+    for offset in range(0, runs, batch):
+        database.compliance_runs.insert_many([
+            {
+                "run_id": f"run-{i:08d}",
+                "feature_id": f"feat-{i % 5000:05d}",
+                "timestamp": "2026-01-01T00:00:00",
+                "status": "CORE_COMPLETED",
+                "verdict_json": {"verdict": "compliant", "confidence": 0.9},
+                "agent_trace": [],
+            }
+            for i in range(offset, min(offset + batch, runs))
+        ], ordered=False)
+    database.users.insert_many([
+        {"username": f"user{i}", "email": f"user{i}@example.com", "provider": "local"}
+        for i in range(users)
+    ], ordered=False)
+    return round(time.perf_counter() - start, 1)
+
+
+def shapes(runs: int, users: int):
+    """
+    Concrete queries per shape, picked at random from the seeded data.
+    """
+    run = random.randrange(runs)
+    user = random.randrange(users)
+    run_id, feature_id = f"run-{run:08d}", f"feat-{run % 5000:05d}"
+    return {
+        "run_id": {"run_id": run_id},
+        "run_id+feature_id": {"run_id": run_id, "feature_id": feature_id},
+        "users.username": {"username": f"user{user}"},
+        "users.email": {"email": f"user{user}@example.com"},
+        "users.$or": {"$or": [{"email": f"user{user}@example.com"}, {"username": f"user{user}"}]},
+    }
+
+
+def measure(database, runs: int, users: int, lookups: int) -> dict:
+    results = {}
+    for name in shapes(runs, users):
+        collection = database.users if name.startswith("users") else database.compliance_runs
+        latencies = []
+        for _ in range(lookups):
+            query = shapes(runs, users)[name]
+            t0 = time.perf_counter()
+            collection.find_one(query)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+        query = shapes(runs, users)[name]
+        stats = collection.find(query).limit(1).explain().get("executionStats", {})
+        latencies.sort()
+        results[name] = {
+            "p50_ms": round(statistics.median(latencies), 3),
+            "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 3),
+            "docs_examined": stats.get("totalDocsExamined"),
+            "stages": explain_stages(collection, query),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index benchmark on a seeded run collection")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="jurai_index_bench", help="Scratch database (dropped first)")
+    parser.add_argument("--runs", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=200, help="Timed lookups per query shape")
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    client.drop_database(args.db)
+    database = client[args.db]
+
+    print(f"Seeding {args.runs} runs and {args.users} users...")
+    print(f"Seeded in {seed(database, args.runs, args.users)}s")
+
+    # Without indexes every shape is a collection scan; keep the timed
+    # sample small so the run finishes in reasonable time
+    before = measure(database, args.runs, args.users, max(args.lookups // 20, 5))
+    print(json.dumps({"indexes": "none", **before}, indent=2))
+
+    t0 = time.perf_counter()
+    created = ensure_indexes(database)
+    print(f"Built {len(created)} indexes in {round(time.perf_counter() - t0, 1)}s: {created}")
+
+    after = measure(database, args.runs, args.users, args.lookups)
+    print(json.dumps({"indexes": [m.document["name"] for models in INDEXES.values() for m in models], **after}, indent=2))
+
+    for name in after:
+        speedup = before[name]["p50_ms"] / after[name]["p50_ms"] if after[name]["p50_ms"] else None
+        print(f"{name:20s} p50 {before[name]['p50_ms']:>10} ms -> {after[name]['p50_ms']:>7} ms"
+              f"  ({round(speedup) if speedup else '-'}x)")
+
+    client.drop_database(args.db)
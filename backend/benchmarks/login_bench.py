@@ -0,0 +1,82 @@
+"""
+Benchmark: login bursts with bcrypt on the shared threadpool vs. on the
+dedicated hashing pool of backend.features.auth.
+
+Runs `--logins` concurrent password verifications at the configured
+BCRYPT_ROUNDS while a probe keeps submitting a trivial job to the shared
+threadpool (standing in for the sync routes and pipeline work that use it)
+every 10 ms. Reports logins/sec and the probe's p50/p99 wait.
+
+    python -m backend.benchmarks.login_bench --logins 200 --threadpool 8
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+# The auth module imports the database layer, which only needs the URI set
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+
+from backend.features import auth
+
+
+async def probe(stop: asyncio.Event, waits: list):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await loop.run_in_executor(None, lambda: None)
+        waits.append((time.perf_counter() - t0) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def run(mode: str, logins: int, threadpool: int, stored_hash: str) -> dict:
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=threadpool))
+    stop, waits = asyncio.Event(), []
+    probe_task = asyncio.create_task(probe(stop, waits))
+
+    async def login():
+        if mode == "shared":
+            return await loop.run_in_executor(None, auth.verify_password, "correct horse", stored_hash)
+        while True:
+            try:
+                valid, _ = await auth.verify_password_async("correct horse", stored_hash)
+                return valid
+            except HTTPException:
+                # 503 from the bounded pool: a client would retry after a moment
+                await asyncio.sleep(0.05)
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await probe_task
+
+    waits.sort()
+    return {
+        "mode": mode,
+        "logins": logins,
+        "valid": sum(1 for r in results if r),
+        "logins_per_s": round(logins / elapsed, 1),
+        "probe_p50_ms": round(statistics.median(waits), 2) if waits else None,
+        "probe_p99_ms": round(waits[max(int(len(waits) * 0.99) - 1, 0)], 2) if waits else None,
+        "probe_samples": len(waits),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Login throughput / threadpool starvation benchmark")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--threadpool", type=int, default=8, help="Size of the shared threadpool")
+    args = parser.parse_args()
+
+    stored_hash = auth.get_password_hash("correct horse")
+    print(f"bcrypt rounds={auth.BCRYPT_ROUNDS} hash workers={auth.PASSWORD_HASH_WORKERS}")
+    for mode in ("shared", "dedicated"):
+        print(json.dumps(asyncio.run(run(mode, args.logins, args.threadpool, stored_hash))))
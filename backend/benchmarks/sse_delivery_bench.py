@@ -0,0 +1,126 @@
+"""
+Benchmark: SSE event delivery, per-event queue bridge vs. batched bridge.
+
+Simulates concurrent pipeline streams whose agent threads emit thinking
+sentences (`is_log` events) plus a few step events, and measures for both
+bridges: events/sec, SSE messages and socket writes produced, and CPU
+seconds per stream (JSON + SSE encoding included).
+
+    python -m backend.benchmarks.sse_delivery_bench --streams 50 --events 2000
+"""
+
+import json
+import time
+import asyncio
+import argparse
+
+from backend.pipeline.event_bridge import EventBridge
+from backend.pipeline.stream_buffer import encode_event, encode_batch
+
+
+def produce(emit, events: int, pace_every: int):
+    """
+    Agent thread: sentences with an occasional step event, yielding the GIL
+    now and then like a real token stream.
+    """
+    for i in range(events):
+        if i % 100 == 99:
+            emit("jury_report", {"report": f"Report {i}"})
+        else:
+            emit("jury_thinking", {"msg": f"Sentence {i} of the jury analysis.", "is_log": True})
+        if pace_every and i % pace_every == 0:
+            time.sleep(0)
+
+
+async def legacy_stream(events: int, pace_every: int) -> dict:
+    """
+    The previous bridge: call_soon_threadsafe per event, one queue.get()
+    task per event, one SSE message and write per event.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    writes = messages = 0
+
+    def emit(event_type, data):
+        loop.call_soon_threadsafe(queue.put_nowait, {"event": event_type, "data": data})
+
+    producer = loop.run_in_executor(None, produce, emit, events, pace_every)
+    while not producer.done():
+        get_task = asyncio.create_task(queue.get())
+        done, _ = await asyncio.wait([get_task, producer], return_when=asyncio.FIRST_COMPLETED)
+        if get_task in done:
+            item = get_task.result()
+            encode_event(item["event"], json.dumps(item["data"]))
+            writes += 1
+            messages += 1
+        else:
+            get_task.cancel()
+    while not queue.empty():
+        item = queue.get_nowait()
+        encode_event(item["event"], json.dumps(item["data"]))
+        writes += 1
+        messages += 1
+    return {"writes": writes, "messages": messages}
+
+
+async def batched_stream(events: int, pace_every: int, window_ms: float) -> dict:
+    """
+    EventBridge: batched hand-over, coalesced logs, one write per batch.
+    """
+    loop = asyncio.get_running_loop()
+    bridge = EventBridge(loop, window_ms=window_ms)
+    writes = messages = 0
+
+    def emit(event_type, data):
+        bridge.put({"event": event_type, "data": data})
+
+    producer = loop.run_in_executor(None, produce, emit, events, pace_every)
+    producer.add_done_callback(lambda _: bridge.close())
+    while True:
+        batch = await bridge.get_batch()
+        if not batch:
+            break
+        encode_batch([{"event": i["event"], "data": json.dumps(i["data"])} for i in batch])
+        writes += 1
+        messages += len(batch)
+    return {"writes": writes, "messages": messages}
+
+
+async def run(mode: str, streams: int, events: int, pace_every: int, window_ms: float) -> dict:
+    loop = asyncio.get_running_loop()
+    # One producer thread per stream, as with real agent threads
+    from concurrent.futures import ThreadPoolExecutor
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=streams + 4))
+
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    if mode == "legacy":
+        results = await asyncio.gather(*(legacy_stream(events, pace_every) for _ in range(streams)))
+    else:
+        results = await asyncio.gather(*(batched_stream(events, pace_every, window_ms) for _ in range(streams)))
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+
+    total_events = streams * events
+    return {
+        "mode": mode,
+        "events": total_events,
+        "events_per_s": round(total_events / wall),
+        "sse_messages": sum(r["messages"] for r in results),
+        "writes": sum(r["writes"] for r in results),
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "cpu_ms_per_stream": round(cpu * 1000 / streams, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SSE delivery benchmark")
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--events", type=int, default=2000, help="Events per stream")
+    parser.add_argument("--pace-every", type=int, default=20, help="Yield the producer thread every N events (0 = never)")
+    parser.add_argument("--window-ms", type=float, default=50, help="Coalescing window of the batched bridge")
+    args = parser.parse_args()
+
+    print(f"{args.streams} streams x {args.events} events")
+    for mode in ("legacy", "batched"):
+        stats = asyncio.run(run(mode, args.streams, args.events, args.pace_every, args.window_ms))
+        print(json.dumps(stats))
@@ -0,0 +1,60 @@
+import os
+import logging
+import certifi
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.server_api import ServerApi
+
+logger = logging.getLogger(__name__)
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DB_NAME = "jurai_db"
+
+# Connection pool bounds for request handlers
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+
+if not MONGODB_URI:
+    raise RuntimeError("MONGODB_URI is not set")
+
+async_client = None
+async_db = None
+
+async def connect_async_database() -> AsyncIOMotorDatabase:
+    """
+    Opens the async client on the running event loop; called from the
+    FastAPI lifespan so the pool lives as long as the app.
+    """
+    global async_client, async_db
+    if async_db is None:
+        try:
+            logger.info("Connecting to MongoDB Atlas (async)...")
+            async_client = AsyncIOMotorClient(
+                MONGODB_URI,
+                server_api=ServerApi('1'),
+                tlsCAFile=certifi.where(),
+                maxPoolSize=MONGODB_MAX_POOL_SIZE,
+                minPoolSize=MONGODB_MIN_POOL_SIZE
+            )
+            async_db = async_client[DB_NAME]
+            await async_client.admin.command("ping")
+            logger.info("Async MongoDB connection successful")
+        except Exception as e:
+            logger.error(f"Async MongoDB connection failed: {e}")
+            raise
+    return async_db
+
+async def get_async_database() -> AsyncIOMotorDatabase:
+    """
+    FastAPI dependency for async route handlers.
+    """
+    if async_db is None:
+        return await connect_async_database()
+    return async_db
+
+def close_async_database():
+    global async_client, async_db
+    if async_client:
+        async_client.close()
+        async_client = None
+        async_db = None
+        logger.info("Async MongoDB connection closed")
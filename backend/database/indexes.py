@@ -0,0 +1,121 @@
+"""
+Indexes the app's queries rely on, and a check that they are used.
+
+`ensure_indexes` is run at startup; creating an index that already exists
+is a no-op. With DB_QUERY_AUDIT=true (dev mode) `audit_query_shapes` also
+runs explain() on every query shape in QUERY_SHAPES and refuses to start if
+any of them would scan the whole collection.
+"""
+
+import os
+import logging
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+DB_QUERY_AUDIT = os.getenv("DB_QUERY_AUDIT", "false").lower() == "true"
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "compliance_runs": [
+        IndexModel([("run_id", ASCENDING)], unique=True, name="run_id_unique"),
+        IndexModel([("run_id", ASCENDING), ("feature_id", ASCENDING)], name="run_feature"),
+    ],
+    "agent_traces": [
+        IndexModel([("run_id", ASCENDING), ("seq", ASCENDING)], unique=True, name="run_seq"),
+    ],
+    "verdict_history": [
+        IndexModel([("feature_id", ASCENDING), ("version", DESCENDING)], unique=True, name="feature_version"),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        # OAuth users may have no username; only real usernames must be unique
+        IndexModel(
+            [("username", ASCENDING)], unique=True, name="username_unique",
+            partialFilterExpression={"username": {"$gt": ""}}
+        ),
+    ],
+}
+
+# (collection, filter, sort) of every lookup issued by the routes
+QUERY_SHAPES = [
+    ("compliance_runs", {"run_id": "audit"}, None),
+    ("compliance_runs", {"run_id": "audit", "feature_id": "audit"}, None),
+    # Queue depth and oldest job on /metrics (indexes owned by JobQueue)
+    ("compliance_runs", {"job.state": "queued"}, [("job.enqueued_at", ASCENDING)]),
+    # Per-principal pending jobs on /run/core
+    ("compliance_runs", {"job.principal": "audit", "job.state": {"$in": ["queued", "leased"]}}, None),
+    ("agent_traces", {"run_id": "audit"}, [("seq", ASCENDING)]),
+    # Latest / previous verdict with HISTORY_BACKEND=mongo
+    ("verdict_history", {"feature_id": "audit"}, [("version", DESCENDING)]),
+    ("users", {"username": "audit"}, None),
+    ("users", {"email": "audit@example.com"}, None),
+    ("users", {"$or": [{"email": "audit@example.com"}, {"username": "audit"}]}, None),
+]
+
+
+class CollectionScan(Exception):
+    pass
+
+
+def ensure_indexes(database) -> List[str]:
+    """
+    Creates the declared indexes. A unique index that cannot be built
+    because of existing duplicates is logged and skipped rather than
+    keeping the app from starting.
+    """
+    created = []
+    for name, models in INDEXES.items():
+        for model in models:
+            try:
+                created.extend(database[name].create_indexes([model]))
+            except Exception as e:
+                logger.error(f"Could not create index {model.document['name']} on {name}: {e}")
+    return created
+
+
+def _plan_stages(plan) -> List[str]:
+    if isinstance(plan, dict):
+        stages = [plan["stage"]] if "stage" in plan else []
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+        return stages
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in _plan_stages(item)]
+    return []
+
+
+def explain_stages(collection, query: Dict, sort: Optional[list] = None) -> List[str]:
+    """
+    Stages of the winning plan for a query shape, e.g. ["FETCH", "IXSCAN"].
+    """
+    cursor = collection.find(query).limit(1)
+    if sort:
+        cursor = cursor.sort(sort)
+    return _plan_stages(cursor.explain()["queryPlanner"]["winningPlan"])
+
+
+def audit_query_shapes(database, shapes=QUERY_SHAPES) -> List[Dict]:
+    """
+    Raises CollectionScan listing every shape whose plan contains a COLLSCAN.
+    """
+    report = []
+    for name, query, sort in shapes:
+        stages = explain_stages(database[name], query, sort)
+        report.append({"collection": name, "query": query, "stages": stages})
+
+    offenders = [r for r in report if "COLLSCAN" in r["stages"]]
+    if offenders:
+        raise CollectionScan(
+            "Query shapes without a usable index: "
+            + "; ".join(f"{r['collection']} {r['query']}" for r in offenders)
+        )
+    logger.info(f"Query audit passed for {len(report)} shapes")
+    return report
+
+
+def bootstrap_indexes(database):
+    ensure_indexes(database)
+    if DB_QUERY_AUDIT:
+        audit_query_shapes(database)
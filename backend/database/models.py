@@ -28,7 +28,12 @@ class ComplianceRunSchema(BaseModel):
     verdict_json: Optional[Dict[str, Any]] = None
     risk_json: Optional[Dict[str, Any]] = None
     autofix_json: Optional[Dict[str, Any]] = None
-    agent_trace: Optional[List[Dict[str, Any]]] = None
+    agent_trace: Optional[List[Dict[str, Any]]] = None  # Legacy; steps now live in agent_traces
+    trace_summary: Optional[Dict[str, Any]] = None  # {"steps", "agent", "step"}
+    
+    # Original request context and completed agent steps, used to resume
+    context_data: Optional[Dict[str, Any]] = None
+    checkpoints: Optional[List[Dict[str, Any]]] = None
     
     status: str = "PENDING"  # PENDING, CORE_COMPLETED, RISK_COMPLETED, etc.
     
@@ -3,11 +3,34 @@
 import json
 from backend.agents.core import LiteLlm
 from .diff_prompt import DIFF_PROMPT
+from .structural_diff import compute_structural_diff
 
 from backend.agents.config import mistral_model
- 
+
 diff_model = mistral_model
 
+
+def _unchanged_diff(summary: str, current_verdict: dict, structural: dict) -> dict:
+    """
+    Diff result in the LLM output schema, produced without an LLM call.
+    """
+    current_risk = current_verdict.get("risk_score") if isinstance(current_verdict, dict) else None
+    return {
+        "compliance_diff": {
+            "summary": summary,
+            "law_changes": [],
+            "feature_changes": [],
+            "risk_shift": {
+                "previous_risk": current_risk,
+                "current_risk": current_risk,
+                "reason": "No meaningful change"
+            },
+            "method": "structural",
+            "structural_changes": structural["sections"]
+        }
+    }
+
+
 def generate_compliance_diff(
     previous_verdict: dict,
     current_verdict: dict,
@@ -17,13 +40,28 @@ def generate_compliance_diff(
     """
     Uses an LLM to explain WHY compliance outcomes changed
     between two verdicts.
+    A structural pre-diff runs first: when there is no previous verdict or
+    nothing meaningful changed, no LLM call is made, and otherwise only the
+    changed subtrees are sent.
     """
 
+    structural = compute_structural_diff(
+        previous_verdict,
+        current_verdict,
+        previous_laws_snapshot,
+        current_laws_snapshot
+    )
+
+    if not previous_verdict:
+        return _unchanged_diff("No previous verdict exists for this feature.", current_verdict, structural)
+
+    if not structural["changed"]:
+        return _unchanged_diff("No meaningful compliance change detected.", current_verdict, structural)
+
     payload = {
-        "previous_verdict": previous_verdict,
-        "current_verdict": current_verdict,
-        "previous_laws_snapshot": previous_laws_snapshot,
-        "current_laws_snapshot": current_laws_snapshot
+        "changes": structural["sections"],
+        "previous_feature": previous_verdict.get("feature"),
+        "current_feature": current_verdict.get("feature")
     }
 
     messages = [
@@ -45,4 +83,8 @@ def generate_compliance_diff(
     except json.JSONDecodeError as e:
         raise ValueError("Compliance Diff LLM did not return valid JSON") from e
 
+    if isinstance(diff_data.get("compliance_diff"), dict):
+        diff_data["compliance_diff"]["method"] = "llm"
+        diff_data["compliance_diff"]["structural_changes"] = structural["sections"]
+
     return diff_data
@@ -11,10 +11,14 @@ Do NOT perform a raw JSON diff.
 Do NOT list unchanged information.
 
 ## Inputs you receive
-- Previous compliance verdict (JSON)
-- Current compliance verdict (JSON)
-- Previous laws snapshot (if available)
-- Current laws snapshot (if available)
+A structural change set (`changes`) holding ONLY the parts of the two
+verdicts that differ. Unchanged parts are omitted. Sections may include:
+- `outcome`: changed top-level results (e.g. needs_geo_specific_logic, risk_score)
+- `regions`: regions added, removed or changed
+- `laws`: cited laws/clauses added or removed
+- `obligations`: issues added, removed or changed in severity/category
+- `laws_snapshot`: law versions or clauses added, removed or changed
+Each section lists `added`, `removed` and `changed` ({previous, current}) entries.
 
 ## Your objectives
 1. Identify meaningful changes in legal interpretation or obligations.
@@ -57,6 +61,6 @@ Do NOT list unchanged information.
 ## Rules
 - If no meaningful change exists, say so explicitly in `summary`
 - Do NOT invent laws, clauses, or versions
-- Base reasoning only on provided verdicts
+- Base reasoning only on the provided change set
 - Output JSON ONLY, no extra text
 """
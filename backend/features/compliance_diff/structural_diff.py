@@ -0,0 +1,158 @@
+# features/compliance_diff/structural_diff.py
+
+"""
+Deterministic structural diff between two verdicts.
+
+Verdicts are normalized (case, whitespace, ordering) and compared region by
+region, law by law, obligation by obligation, plus the laws_snapshot. Free
+text such as `summary` or `reasoning` is ignored because it is reworded on
+every run. Only the changed subtrees are returned, so the LLM diff can be
+skipped entirely when nothing meaningful changed.
+"""
+
+from typing import Dict, List, Optional
+
+# Score movements smaller than this are treated as model noise
+SCORE_TOLERANCE = 5
+
+OUTCOME_FIELDS = ("needs_geo_specific_logic", "risk_score", "compliance_score")
+
+
+def _norm(value) -> str:
+    if value is None:
+        return ""
+    return " ".join(str(value).split()).lower()
+
+
+def _regions(verdict: Dict) -> Dict[str, Dict]:
+    regions = {}
+    for entry in verdict.get("regions_affected") or []:
+        if isinstance(entry, dict) and entry.get("region"):
+            regions[_norm(entry["region"])] = entry
+        elif isinstance(entry, str):
+            regions[_norm(entry)] = {"region": entry}
+    for evidence in verdict.get("evidence_cited") or []:
+        if isinstance(evidence, dict) and evidence.get("jurisdiction"):
+            regions.setdefault(_norm(evidence["jurisdiction"]), {"region": evidence["jurisdiction"]})
+    return regions
+
+
+def _region_signature(entry: Dict) -> Dict:
+    return {
+        "requirement_summary": _norm(entry.get("requirement_summary")),
+        "regulations": sorted(
+            f"{_norm(r.get('name'))}|{_norm(r.get('citation'))}"
+            for r in entry.get("regulations") or [] if isinstance(r, dict)
+        ),
+    }
+
+
+def _laws(verdict: Dict) -> Dict[str, Dict]:
+    laws = {}
+    for region in verdict.get("regions_affected") or []:
+        if not isinstance(region, dict):
+            continue
+        for reg in region.get("regulations") or []:
+            if isinstance(reg, dict):
+                key = f"{_norm(reg.get('name'))}|{_norm(reg.get('citation'))}"
+                laws[key] = {"law": reg.get("name"), "citation": reg.get("citation"), "region": region.get("region")}
+    for evidence in verdict.get("evidence_cited") or []:
+        if isinstance(evidence, dict):
+            key = f"{_norm(evidence.get('source'))}|{_norm(evidence.get('citation'))}"
+            laws.setdefault(key, {
+                "law": evidence.get("source"),
+                "citation": evidence.get("citation"),
+                "region": evidence.get("jurisdiction"),
+            })
+    return laws
+
+
+def _obligations(verdict: Dict) -> Dict[str, Dict]:
+    return {
+        _norm(issue.get("title")): issue
+        for issue in verdict.get("issues") or []
+        if isinstance(issue, dict) and issue.get("title")
+    }
+
+
+def _obligation_signature(issue: Dict) -> Dict:
+    return {
+        "severity": _norm(issue.get("severity")),
+        "category": _norm(issue.get("category")),
+    }
+
+
+def _snapshot(laws_snapshot: Optional[List]) -> Dict[str, Dict]:
+    return {
+        _norm(entry.get("law")): entry
+        for entry in laws_snapshot or []
+        if isinstance(entry, dict) and entry.get("law")
+    }
+
+
+def _snapshot_signature(entry: Dict) -> Dict:
+    return {
+        "version": _norm(entry.get("version")),
+        "clauses": sorted(_norm(c) for c in entry.get("clauses") or []),
+    }
+
+
+def _compare(previous: Dict, current: Dict, signature=None) -> Dict:
+    """
+    Keyed comparison returning only added, removed and changed entries.
+    """
+    added = [current[k] for k in current if k not in previous]
+    removed = [previous[k] for k in previous if k not in current]
+    changed = []
+    if signature:
+        for k in current:
+            if k in previous and signature(previous[k]) != signature(current[k]):
+                changed.append({"previous": previous[k], "current": current[k]})
+
+    section = {}
+    if added:
+        section["added"] = added
+    if removed:
+        section["removed"] = removed
+    if changed:
+        section["changed"] = changed
+    return section
+
+
+def _outcome_changes(previous: Dict, current: Dict) -> Dict:
+    changes = {}
+    for field in OUTCOME_FIELDS:
+        old, new = previous.get(field), current.get(field)
+        if isinstance(old, (int, float)) and isinstance(new, (int, float)) \
+                and not isinstance(old, bool) and not isinstance(new, bool):
+            if abs(new - old) >= SCORE_TOLERANCE:
+                changes[field] = {"previous": old, "current": new}
+        elif old != new:
+            changes[field] = {"previous": old, "current": new}
+    return changes
+
+
+def compute_structural_diff(
+    previous_verdict: Optional[Dict],
+    current_verdict: Optional[Dict],
+    previous_laws_snapshot: Optional[List] = None,
+    current_laws_snapshot: Optional[List] = None
+) -> Dict:
+    """
+    Returns {"changed": bool, "sections": {...}} where sections only holds
+    the regions, laws, obligations, laws_snapshot entries and outcome fields
+    that differ.
+    """
+    previous_verdict = previous_verdict if isinstance(previous_verdict, dict) else {}
+    current_verdict = current_verdict if isinstance(current_verdict, dict) else {}
+
+    sections = {
+        "outcome": _outcome_changes(previous_verdict, current_verdict),
+        "regions": _compare(_regions(previous_verdict), _regions(current_verdict), _region_signature),
+        "laws": _compare(_laws(previous_verdict), _laws(current_verdict)),
+        "obligations": _compare(_obligations(previous_verdict), _obligations(current_verdict), _obligation_signature),
+        "laws_snapshot": _compare(_snapshot(previous_laws_snapshot), _snapshot(current_laws_snapshot), _snapshot_signature),
+    }
+    sections = {name: section for name, section in sections.items() if section}
+
+    return {"changed": bool(sections), "sections": sections}
@@ -0,0 +1,72 @@
+# features/compliance_history/history_delta.py
+"""
+Structural deltas between JSON documents.
+
+A delta is a list of operations applied in order:
+
+    ["set", path, value]   # path: list of dict keys / list indexes
+    ["del", path]
+
+Dicts are compared key by key and lists item by item (with appended or
+trailing removed items); anything else that changed is replaced whole.
+"""
+
+import copy
+import json
+import zlib
+from typing import Any, List
+
+
+def diff(old: Any, new: Any, path: list = None) -> List[list]:
+    path = path or []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = [["del", path + [key]] for key in old if key not in new]
+        for key, value in new.items():
+            if key in old:
+                ops.extend(diff(old[key], value, path + [key]))
+            else:
+                ops.append(["set", path + [key], value])
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        ops = []
+        for index, (a, b) in enumerate(zip(old, new)):
+            ops.extend(diff(a, b, path + [index]))
+        # Appended items, or trailing items removed (last first)
+        ops.extend(["set", path + [index], new[index]] for index in range(len(old), len(new)))
+        ops.extend(["del", path + [index]] for index in range(len(old) - 1, len(new) - 1, -1))
+        return ops
+    if old == new and type(old) is type(new):
+        return []
+    return [["set", path, new]]
+
+
+def apply(base: Any, ops: List[list], in_place: bool = False) -> Any:
+    """
+    Returns the patched document; `base` is left untouched unless in_place.
+    """
+    doc = base if in_place else copy.deepcopy(base)
+    for op in ops:
+        kind, path = op[0], op[1]
+        if not path:
+            doc = copy.deepcopy(op[2]) if kind == "set" else None
+            continue
+        parent = doc
+        for key in path[:-1]:
+            parent = parent[key]
+        if kind == "set":
+            value = copy.deepcopy(op[2])
+            if isinstance(parent, list) and path[-1] == len(parent):
+                parent.append(value)
+            else:
+                parent[path[-1]] = value
+        else:
+            del parent[path[-1]]
+    return doc
+
+
+def encode(obj: Any) -> bytes:
+    return zlib.compress(json.dumps(obj, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def decode(data: bytes) -> Any:
+    return json.loads(zlib.decompress(data).decode("utf-8"))
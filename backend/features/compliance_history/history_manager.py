@@ -1,40 +1,384 @@
 # features/compliance_history/history_manager.py
+"""
+Versioned verdict history. The module functions delegate to the store
+selected by HISTORY_BACKEND: "file" (files under BASE_STORAGE_PATH, the
+default) or "mongo" (the `verdict_history` collection, shared by every
+instance).
+
+The file store keeps a base snapshot of a feature's record and writes the
+following versions as compressed structural deltas against it
+(`verdict_NNN.z`). A new base is written every HISTORY_REBASE_EVERY
+versions, or sooner once a delta stops being much smaller than a snapshot,
+so any version is rebuilt from one base plus one delta. Plain
+`verdict_NNN.json` files from before (or with HISTORY_DELTA=false) are
+read as full snapshots.
+"""
 
 import os
 import json
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Optional, Dict, List
+from itertools import islice
+from typing import Optional, Dict, Iterator, List, Tuple
+
+from . import history_delta
 
 BASE_STORAGE_PATH = "storage/compliance_history"
 
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "file").lower()
+HISTORY_DELTA = os.getenv("HISTORY_DELTA", "true").lower() == "true"
+HISTORY_REBASE_EVERY = int(os.getenv("HISTORY_REBASE_EVERY", "50"))
+# Rebase early once a compressed delta exceeds this share of a snapshot
+HISTORY_REBASE_RATIO = float(os.getenv("HISTORY_REBASE_RATIO", "0.5"))
 
-def _ensure_feature_dir(feature_id: str) -> str:
-    """
-    Ensures the storage directory for a feature exists.
-    """
-    feature_dir = os.path.join(BASE_STORAGE_PATH, feature_id)
-    os.makedirs(feature_dir, exist_ok=True)
-    return feature_dir
+# Append-only manifest in each feature directory: one JSON line per stored
+# version, {"version", "file", "kind", "base", "base_file", "sha256",
+# "size", "timestamp"}
+INDEX_FILE = "index.log"
+
+KIND_FULL = "full"
+KIND_DELTA = "delta"
 
+# Bytes read from the end of the manifest for latest/previous lookups
+_TAIL_BYTES = 8192
 
-def _get_next_version(feature_dir: str) -> str:
+# Base snapshots (immutable once written) as JSON text, by path
+_BASE_CACHE_SIZE = 64
+_base_cache: "OrderedDict[str, str]" = OrderedDict()
+_base_cache_lock = threading.Lock()
+
+
+def valid_feature_id(feature_id: str) -> bool:
     """
-    Determines the next verdict version number.
+    Whether the id names exactly one directory under the history root: no
+    path separators, NUL or dot-only names that would escape it.
     """
-    existing = [
-        f for f in os.listdir(feature_dir)
-        if f.startswith("verdict_") and f.endswith(".json")
-    ]
+    return (
+        bool(feature_id)
+        and feature_id.strip(".") != ""
+        and not any(c in feature_id for c in ("/", "\\", "\0"))
+    )
 
-    if not existing:
-        return "001"
 
-    versions = [
-        int(f.replace("verdict_", "").replace(".json", ""))
-        for f in existing
-    ]
+def _verdict_file(version: int, ext: str = ".json") -> str:
+    return f"verdict_{version:03d}{ext}"
+
+
+def _file_version(name: str) -> Optional[int]:
+    if not name.startswith("verdict_"):
+        return None
+    stem, ext = os.path.splitext(name)
+    if ext not in (".json", ".z"):
+        return None
+    try:
+        return int(stem[len("verdict_"):])
+    except ValueError:
+        return None
+
+
+def _parse_entries(lines: List[str]) -> List[Dict]:
+    entries = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entries.append(json.loads(line))
+        except json.JSONDecodeError:
+            # A torn line from an interrupted write
+            continue
+    return entries
+
+
+def _read_index(feature_dir: str, tail: bool = False) -> List[Dict]:
+    """
+    Manifest entries ordered by version. With tail=True only the end of
+    the manifest is read, which always holds the most recent versions.
+    """
+    index_path = os.path.join(feature_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        _rebuild_index(feature_dir)
+
+    with open(index_path, "rb") as f:
+        if tail:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(size - _TAIL_BYTES, 0))
+            data = f.read().decode("utf-8", errors="ignore")
+            lines = data.split("\n")
+            if size > _TAIL_BYTES:
+                # The first line is probably cut off
+                lines = lines[1:]
+        else:
+            lines = f.read().decode("utf-8").split("\n")
+
+    # Concurrent writers may append slightly out of order
+    by_version = {int(e["version"]): e for e in _parse_entries(lines)}
+    return [by_version[v] for v in sorted(by_version)]
+
+
+def _rebuild_index(feature_dir: str):
+    """
+    One-time manifest for a feature directory written before manifests
+    existed. Duplicate lines from a concurrent rebuild are harmless.
+    """
+    index_path = os.path.join(feature_dir, INDEX_FILE)
+    files = sorted(
+        (version, name) for name in os.listdir(feature_dir)
+        for version in [_file_version(name)] if version is not None
+    )
+    lines = []
+    for version, name in files:
+        with open(os.path.join(feature_dir, name), "rb") as f:
+            data = f.read()
+        try:
+            if name.endswith(".json"):
+                payload = {"kind": KIND_FULL, "record": json.loads(data)}
+            else:
+                payload = history_delta.decode(data)
+        except Exception:
+            # Incomplete file of an interrupted write
+            continue
+        record = payload.get("record") or {}
+        lines.append(_index_line(version, name, data, record.get("timestamp"), payload))
+    with open(index_path, "a", encoding="utf-8") as f:
+        f.write("".join(lines))
+
+
+def _index_line(version: int, name: str, data: bytes, timestamp: Optional[str], payload: Dict) -> str:
+    return json.dumps({
+        "version": f"{version:03d}",
+        "file": name,
+        "kind": payload["kind"],
+        "base": payload.get("base"),
+        "base_file": payload.get("base_file"),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "size": len(data),
+        "timestamp": timestamp,
+    }) + "\n"
+
+
+def _append_index(feature_dir: str, line: str):
+    # O_APPEND writes of a single short line do not interleave
+    fd = os.open(os.path.join(feature_dir, INDEX_FILE), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line.encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+def _allocate_version(feature_dir: str, entries: List[Dict], ext: str):
+    """
+    Claims the next version by exclusively creating its file, so two
+    writers can never get the same number. Returns (version, name, fd).
+    """
+    version = int(entries[-1]["version"]) + 1 if entries else 1
+    other = ".json" if ext == ".z" else ".z"
+    while True:
+        name = _verdict_file(version, ext)
+        try:
+            fd = os.open(os.path.join(feature_dir, name), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            version += 1
+            continue
+        if os.path.exists(os.path.join(feature_dir, _verdict_file(version, other))):
+            # Taken by a writer using the other format
+            os.close(fd)
+            os.remove(os.path.join(feature_dir, name))
+            version += 1
+            continue
+        return version, name, fd
+
+
+def _read_full(path: str) -> Dict:
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(".json"):
+        return json.loads(data)
+    return history_delta.decode(data)["record"]
+
+
+def _load_base(feature_dir: str, name: str) -> Dict:
+    """
+    A fresh copy of a base snapshot; the cache keeps its JSON text, which
+    parses faster than a deep copy.
+    """
+    path = os.path.join(feature_dir, name)
+    with _base_cache_lock:
+        text = _base_cache.get(path)
+        if text is not None:
+            _base_cache.move_to_end(path)
+    if text is None:
+        text = json.dumps(_read_full(path))
+        with _base_cache_lock:
+            _base_cache[path] = text
+            while len(_base_cache) > _BASE_CACHE_SIZE:
+                _base_cache.popitem(last=False)
+    return json.loads(text)
+
+
+def _load(feature_dir: str, entry: Dict) -> Dict:
+    if entry.get("kind", KIND_FULL) == KIND_FULL:
+        return _read_full(os.path.join(feature_dir, entry["file"]))
+    with open(os.path.join(feature_dir, entry["file"]), "rb") as f:
+        payload = history_delta.decode(f.read())
+    return history_delta.apply(_load_base(feature_dir, payload["base_file"]), payload["ops"], in_place=True)
+
+
+def _metadata(feature_id: str, entry: Dict) -> Dict:
+    return {"feature_id": feature_id, "version": entry["version"], "timestamp": entry.get("timestamp")}
+
+
+class FileHistoryStore:
+    def __init__(
+        self,
+        base_path: str = BASE_STORAGE_PATH,
+        delta: bool = HISTORY_DELTA,
+        rebase_every: int = HISTORY_REBASE_EVERY,
+        rebase_ratio: float = HISTORY_REBASE_RATIO
+    ):
+        self.base_path = base_path
+        self.delta = delta
+        self.rebase_every = rebase_every
+        self.rebase_ratio = rebase_ratio
+
+    def _feature_dir(self, feature_id: str, create: bool = False) -> Optional[str]:
+        if not valid_feature_id(feature_id):
+            if create:
+                raise ValueError(f"Invalid feature_id: {feature_id!r}")
+            return None
+        feature_dir = os.path.join(self.base_path, feature_id)
+        if create:
+            os.makedirs(feature_dir, exist_ok=True)
+        elif not os.path.exists(feature_dir):
+            return None
+        return feature_dir
+
+    def feature_ids(self) -> List[str]:
+        if not os.path.exists(self.base_path):
+            return []
+        return sorted(
+            d for d in os.listdir(self.base_path)
+            if os.path.isdir(os.path.join(self.base_path, d))
+        )
+
+    def _encode(self, feature_dir: str, version: int, record: Dict, latest: Optional[Dict]):
+        """
+        Payload for a new version: a delta against the current base, or a
+        new base snapshot when one is due.
+        """
+        snapshot = {"kind": KIND_FULL, "record": record}
+        if latest is None:
+            return snapshot, history_delta.encode(snapshot)
+
+        if latest.get("kind", KIND_FULL) == KIND_FULL:
+            base_version, base_file = int(latest["version"]), latest["file"]
+        else:
+            base_version, base_file = int(latest["base"]), latest["base_file"]
+        if version - base_version >= self.rebase_every:
+            return snapshot, history_delta.encode(snapshot)
+
+        ops = history_delta.diff(_load_base(feature_dir, base_file), record)
+        payload = {"kind": KIND_DELTA, "base": base_version, "base_file": base_file, "ops": ops}
+        data = history_delta.encode(payload)
+        full = history_delta.encode(snapshot)
+        if len(data) > self.rebase_ratio * len(full):
+            return snapshot, full
+        return payload, data
+
+    def store_verdict(self, feature_id: str, verdict: Dict, laws_snapshot: Optional[List[Dict]] = None) -> Dict:
+        feature_dir = self._feature_dir(feature_id, create=True)
+        entries = _read_index(feature_dir, tail=True)
+        version, name, fd = _allocate_version(feature_dir, entries, ".z" if self.delta else ".json")
+
+        record = {
+            "feature_id": feature_id,
+            "version": f"{version:03d}",
+            "timestamp": datetime.utcnow().isoformat(),
+            "verdict": verdict,
+            "laws_snapshot": laws_snapshot or []
+        }
+
+        try:
+            if self.delta:
+                payload, data = self._encode(feature_dir, version, record, entries[-1] if entries else None)
+            else:
+                payload, data = {"kind": KIND_FULL}, json.dumps(record, indent=2).encode("utf-8")
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+        # Listed only once the file is complete
+        _append_index(feature_dir, _index_line(version, name, data, record["timestamp"], payload))
+
+        return record
+
+    def get_latest_verdict(self, feature_id: str) -> Optional[Dict]:
+        feature_dir = self._feature_dir(feature_id)
+        if not feature_dir:
+            return None
+        entries = _read_index(feature_dir, tail=True)
+        if not entries:
+            return None
+        return _load(feature_dir, entries[-1])
+
+    def get_previous_verdict(self, feature_id: str) -> Optional[Dict]:
+        feature_dir = self._feature_dir(feature_id)
+        if not feature_dir:
+            return None
+        entries = _read_index(feature_dir, tail=True)
+        if len(entries) < 2:
+            return None
+        return _load(feature_dir, entries[-2])
+
+    def get_verdict(self, feature_id: str, version: str) -> Optional[Dict]:
+        feature_dir = self._feature_dir(feature_id)
+        if not feature_dir:
+            return None
+        for entry in _read_index(feature_dir):
+            if int(entry["version"]) == int(version):
+                return _load(feature_dir, entry)
+        return None
 
-    return f"{max(versions) + 1:03d}"
+    def list_verdict_history(self, feature_id: str) -> List[Dict]:
+        feature_dir = self._feature_dir(feature_id)
+        if not feature_dir:
+            return []
+        return [_load(feature_dir, entry) for entry in _read_index(feature_dir)]
+
+    def iter_history(self, feature_id: str, after: Optional[int] = None, full: bool = False) -> Iterator[Dict]:
+        """
+        Versions after `after` in order. Metadata comes from the manifest
+        alone; record bodies are only read with full=True.
+        """
+        feature_dir = self._feature_dir(feature_id)
+        if not feature_dir:
+            return
+        for entry in _read_index(feature_dir):
+            if after is not None and int(entry["version"]) <= after:
+                continue
+            yield _load(feature_dir, entry) if full else _metadata(feature_id, entry)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_history_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if HISTORY_BACKEND == "mongo":
+                    # Imported lazily: the database module needs MONGODB_URI
+                    from backend.database.database import get_database
+                    from .mongo_history import MongoHistoryStore
+                    _store = MongoHistoryStore(get_database())
+                else:
+                    _store = FileHistoryStore()
+    return _store
 
 
 def store_verdict(
@@ -45,87 +389,43 @@ def store_verdict(
     """
     Stores a verdict as an immutable, versioned record.
     """
-
-    feature_dir = _ensure_feature_dir(feature_id)
-    version = _get_next_version(feature_dir)
-
-    record = {
-        "feature_id": feature_id,
-        "version": version,
-        "timestamp": datetime.utcnow().isoformat(),
-        "verdict": verdict,
-        "laws_snapshot": laws_snapshot or []
-    }
-
-    file_path = os.path.join(feature_dir, f"verdict_{version}.json")
-
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(record, f, indent=2)
-
-    return record
+    return get_history_store().store_verdict(feature_id, verdict, laws_snapshot)
 
 
 def get_latest_verdict(feature_id: str) -> Optional[Dict]:
     """
     Retrieves the most recent verdict for a feature.
     """
-    feature_dir = os.path.join(BASE_STORAGE_PATH, feature_id)
-
-    if not os.path.exists(feature_dir):
-        return None
-
-    verdict_files = sorted(
-        f for f in os.listdir(feature_dir)
-        if f.startswith("verdict_") and f.endswith(".json")
-    )
-
-    if not verdict_files:
-        return None
-
-    latest_file = verdict_files[-1]
-    with open(os.path.join(feature_dir, latest_file), "r", encoding="utf-8") as f:
-        return json.load(f)
+    return get_history_store().get_latest_verdict(feature_id)
 
 
 def get_previous_verdict(feature_id: str) -> Optional[Dict]:
     """
     Retrieves the verdict immediately before the latest one.
     """
-    feature_dir = os.path.join(BASE_STORAGE_PATH, feature_id)
-
-    if not os.path.exists(feature_dir):
-        return None
-
-    verdict_files = sorted(
-        f for f in os.listdir(feature_dir)
-        if f.startswith("verdict_") and f.endswith(".json")
-    )
-
-    if len(verdict_files) < 2:
-        return None
-
-    previous_file = verdict_files[-2]
-    with open(os.path.join(feature_dir, previous_file), "r", encoding="utf-8") as f:
-        return json.load(f)
+    return get_history_store().get_previous_verdict(feature_id)
 
 
 def list_verdict_history(feature_id: str) -> List[Dict]:
     """
     Returns the full verdict history for a feature.
     """
-    feature_dir = os.path.join(BASE_STORAGE_PATH, feature_id)
+    return get_history_store().list_verdict_history(feature_id)
 
-    if not os.path.exists(feature_dir):
-        return []
 
-    history = []
-    verdict_files = sorted(
-        f for f in os.listdir(feature_dir)
-        if f.startswith("verdict_") and f.endswith(".json")
-    )
+def iter_verdict_history(feature_id: str, after: Optional[int] = None, full: bool = False) -> Iterator[Dict]:
+    """
+    Lazily yields a feature's versions after `after`: metadata only
+    (feature_id, version, timestamp) or, with full=True, whole records.
+    """
+    return get_history_store().iter_history(feature_id, after, full)
 
-    for vf in verdict_files:
-        with open(os.path.join(feature_dir, vf), "r", encoding="utf-8") as f:
-            history.append(json.load(f))
 
-    return history
+def page_verdict_history(feature_id: str, after: Optional[int] = None, limit: int = 50, full: bool = False) -> Tuple[List[Dict], Optional[str]]:
+    """
+    One page of history and the cursor of the next page (None at the end).
+    """
+    items = list(islice(iter_verdict_history(feature_id, after, full), limit + 1))
+    if len(items) > limit:
+        return items[:limit], items[limit - 1]["version"]
+    return items, None
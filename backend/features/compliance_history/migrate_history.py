@@ -0,0 +1,69 @@
+"""
+Copies file-based verdict history into the MongoDB history store.
+
+Records keep their feature_id and version; existing documents are replaced,
+so the migration can be re-run. Each feature's version counter is raised to
+its highest migrated version so new verdicts continue the sequence. Run it
+before switching HISTORY_BACKEND to "mongo".
+
+    python -m backend.features.compliance_history.migrate_history [--path storage/compliance_history] [--dry-run]
+"""
+
+import argparse
+import logging
+
+from pymongo import ReplaceOne
+
+from .history_manager import BASE_STORAGE_PATH, FileHistoryStore
+
+logger = logging.getLogger(__name__)
+
+
+def migrate(database, base_path: str = BASE_STORAGE_PATH, batch_size: int = 500, dry_run: bool = False) -> dict:
+    from .mongo_history import MongoHistoryStore
+
+    source = FileHistoryStore(base_path)
+    target = MongoHistoryStore(database)
+    summary = {"features": 0, "records": 0}
+
+    for feature_id in source.feature_ids():
+        records = source.list_verdict_history(feature_id)
+        if not records:
+            continue
+        summary["features"] += 1
+        summary["records"] += len(records)
+        if dry_run:
+            continue
+
+        ops = []
+        for record in records:
+            doc = {**record, "feature_id": feature_id, "version": int(record["version"])}
+            ops.append(ReplaceOne({"feature_id": feature_id, "version": doc["version"]}, doc, upsert=True))
+            if len(ops) >= batch_size:
+                target.collection.bulk_write(ops, ordered=False)
+                ops = []
+        if ops:
+            target.collection.bulk_write(ops, ordered=False)
+
+        highest = max(int(r["version"]) for r in records)
+        target.counters.update_one({"_id": feature_id}, {"$max": {"seq": highest}}, upsert=True)
+        logger.info(f"Migrated {len(records)} versions of {feature_id}")
+
+    return summary
+
+
+if __name__ == "__main__":
+    from backend.database.database import get_database
+    from backend.database.indexes import ensure_indexes
+
+    parser = argparse.ArgumentParser(description="Migrate file verdict history to MongoDB")
+    parser.add_argument("--path", default=BASE_STORAGE_PATH, help="File history root")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would be migrated")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = get_database()
+    if not args.dry_run:
+        ensure_indexes(db)
+    print(migrate(db, args.path, args.batch_size, args.dry_run))
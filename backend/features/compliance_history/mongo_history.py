@@ -0,0 +1,84 @@
+# features/compliance_history/mongo_history.py
+"""
+Verdict history in MongoDB, so every instance sees the same versions.
+
+Records live in `verdict_history` ({"feature_id", "version": int, ...},
+unique on (feature_id, version)). Versions are allocated with an atomic
+`$inc` on a per-feature counter in `history_counters`, so concurrent
+writers on different instances never share a number.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from pymongo import DESCENDING, ASCENDING, ReturnDocument
+
+HISTORY_COLLECTION = "verdict_history"
+COUNTER_COLLECTION = "history_counters"
+
+
+def _to_record(doc: Optional[Dict]) -> Optional[Dict]:
+    """
+    Same shape as the file store's records ("version" as "001").
+    """
+    if doc is None:
+        return None
+    doc.pop("_id", None)
+    doc["version"] = f"{doc['version']:03d}"
+    return doc
+
+
+class MongoHistoryStore:
+    def __init__(self, database):
+        self.collection = database[HISTORY_COLLECTION]
+        self.counters = database[COUNTER_COLLECTION]
+
+    def allocate_version(self, feature_id: str) -> int:
+        counter = self.counters.find_one_and_update(
+            {"_id": feature_id},
+            {"$inc": {"seq": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return counter["seq"]
+
+    def store_verdict(self, feature_id: str, verdict: Dict, laws_snapshot: Optional[List[Dict]] = None) -> Dict:
+        version = self.allocate_version(feature_id)
+        doc = {
+            "feature_id": feature_id,
+            "version": version,
+            "timestamp": datetime.utcnow().isoformat(),
+            "verdict": verdict,
+            "laws_snapshot": laws_snapshot or []
+        }
+        self.collection.insert_one(dict(doc))
+        return _to_record(doc)
+
+    def get_latest_verdict(self, feature_id: str) -> Optional[Dict]:
+        return _to_record(self.collection.find_one({"feature_id": feature_id}, sort=[("version", DESCENDING)]))
+
+    def get_previous_verdict(self, feature_id: str) -> Optional[Dict]:
+        docs = list(
+            self.collection.find({"feature_id": feature_id})
+            .sort("version", DESCENDING)
+            .skip(1)
+            .limit(1)
+        )
+        return _to_record(docs[0]) if docs else None
+
+    def get_verdict(self, feature_id: str, version: str) -> Optional[Dict]:
+        return _to_record(self.collection.find_one({"feature_id": feature_id, "version": int(version)}))
+
+    def list_verdict_history(self, feature_id: str) -> List[Dict]:
+        return [
+            _to_record(doc)
+            for doc in self.collection.find({"feature_id": feature_id}).sort("version", ASCENDING)
+        ]
+
+    def iter_history(self, feature_id: str, after: Optional[int] = None, full: bool = False) -> Iterator[Dict]:
+        query = {"feature_id": feature_id}
+        if after is not None:
+            query["version"] = {"$gt": after}
+        projection = None if full else {"_id": 0, "feature_id": 1, "version": 1, "timestamp": 1}
+        for doc in self.collection.find(query, projection).sort("version", ASCENDING):
+            yield _to_record(doc)
@@ -0,0 +1,101 @@
+# features/risk_autofix/fused_engine.py
+
+import json
+import re
+import time
+import logging
+from .fused_prompt import FUSED_PROMPT
+from backend.features.risk_reasoning.risk_prompt import RISK_PROMPT
+from backend.features.auto_fix.fix_prompt import FIX_PROMPT
+from backend.features.risk_reasoning.risk_engine import risk_model
+from backend.features.auto_fix.fix_engine import fix_model
+
+# Same model as the risk/fix engines, with room for both outputs
+from backend.agents.config import fused_model
+
+logger = logging.getLogger(__name__)
+
+
+def _two_call_prompt_tokens(verdict_json: dict, feature_context: dict, risk_assessment: dict) -> int:
+    """
+    Prompt tokens the separate risk + autofix calls would have sent for the
+    same inputs (the fix call also carries the risk assessment).
+    """
+    risk_messages = [
+        {"role": "system", "content": RISK_PROMPT},
+        {"role": "user", "content": json.dumps({
+            "verdict": verdict_json,
+            "feature_context": feature_context
+        }, indent=2)}
+    ]
+    fix_messages = [
+        {"role": "system", "content": FIX_PROMPT},
+        {"role": "user", "content": json.dumps({
+            "verdict": verdict_json,
+            "risk_assessment": risk_assessment,
+            "feature_context": feature_context
+        }, indent=2)}
+    ]
+    return risk_model.count_tokens(risk_messages) + fix_model.count_tokens(fix_messages)
+
+
+def generate_risk_and_fixes(
+    verdict_json: dict,
+    feature_context: dict
+) -> dict:
+    """
+    Produces the risk assessment and the auto-fixes from one LLM call.
+    Returns {"risk": {"risk_assessment": ...}, "fix": {"auto_fix": ...}, "stats": ...}
+    so each half keeps the shape of its standalone engine.
+    """
+
+    messages = [
+        {
+            "role": "system",
+            "content": FUSED_PROMPT
+        },
+        {
+            "role": "user",
+            "content": json.dumps({
+                "verdict": verdict_json,
+                "feature_context": feature_context
+            }, indent=2)
+        }
+    ]
+
+    started = time.perf_counter()
+    response = fused_model.complete(messages)
+    latency = time.perf_counter() - started
+
+    raw_output = response.choices[0].message.content
+
+    try:
+        raw_output = raw_output.strip()
+        if "```" in raw_output:
+            match = re.search(r"```(?:json)?(.*?)```", raw_output, re.DOTALL)
+            if match:
+                raw_output = match.group(1).strip()
+
+        fused_data = json.loads(raw_output)
+    except json.JSONDecodeError as e:
+        logger.error(f"Fused risk/fix JSON parse failed ({len(raw_output)} chars). Raw output:\n{raw_output}")
+        raise ValueError("Fused risk/autofix LLM did not return valid JSON") from e
+
+    if "risk_assessment" not in fused_data or "auto_fix" not in fused_data:
+        raise ValueError("Fused risk/autofix output is missing risk_assessment or auto_fix")
+
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or fused_model.count_tokens(messages)
+    two_call_tokens = _two_call_prompt_tokens(verdict_json, feature_context, fused_data["risk_assessment"])
+
+    return {
+        "risk": {"risk_assessment": fused_data["risk_assessment"]},
+        "fix": {"auto_fix": fused_data["auto_fix"]},
+        "stats": {
+            "latency_s": round(latency, 3),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "two_call_prompt_tokens": two_call_tokens,
+            "prompt_tokens_saved": two_call_tokens - prompt_tokens
+        }
+    }
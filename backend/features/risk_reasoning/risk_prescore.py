@@ -0,0 +1,123 @@
+# features/risk_reasoning/risk_prescore.py
+
+"""
+Deterministic risk pre-score over a structured verdict.
+
+Counts the signals that drive legal risk (affected regions, cited laws,
+issue severities, severity keywords, open questions) and only claims the
+obvious Low-risk cases: a verdict that says no geo-specific logic is needed
+and carries no region, law, issue or open question. Everything else is
+escalated to the LLM risk engine.
+"""
+
+import json
+from typing import Dict
+
+SEVERITY_WEIGHTS = {"critical": 40, "high": 25, "medium": 10, "moderate": 10, "low": 3}
+
+SEVERITY_KEYWORDS = (
+    "penalt", "fine", "ban", "prohibit", "criminal", "sanction",
+    "minor", "child", "biometric", "enforcement"
+)
+
+# Upper bounds of the Low / Moderate / High tiers; above is Critical
+TIER_BOUNDS = ((25, "Low"), (50, "Moderate"), (75, "High"))
+
+
+def _regions(verdict: Dict) -> set:
+    regions = set()
+    for entry in verdict.get("regions_affected") or []:
+        if isinstance(entry, dict) and entry.get("region"):
+            regions.add(str(entry["region"]).lower())
+        elif isinstance(entry, str):
+            regions.add(entry.lower())
+    for evidence in verdict.get("evidence_cited") or []:
+        if isinstance(evidence, dict) and evidence.get("jurisdiction"):
+            regions.add(str(evidence["jurisdiction"]).lower())
+    return regions
+
+
+def _laws(verdict: Dict) -> set:
+    laws = set()
+    for entry in verdict.get("regions_affected") or []:
+        if isinstance(entry, dict):
+            for reg in entry.get("regulations") or []:
+                if isinstance(reg, dict):
+                    laws.add(f"{reg.get('name')}|{reg.get('citation')}".lower())
+    for evidence in verdict.get("evidence_cited") or []:
+        if isinstance(evidence, dict):
+            laws.add(f"{evidence.get('source')}|{evidence.get('citation')}".lower())
+    return laws
+
+
+def _tier(score: int) -> str:
+    for bound, tier in TIER_BOUNDS:
+        if score < bound:
+            return tier
+    return "Critical"
+
+
+def score_verdict(verdict: Dict) -> Dict:
+    """
+    Returns {"score", "tier", "fast_path", "signals"}. `fast_path` is True
+    only when the verdict is confidently Low risk.
+    """
+    if not isinstance(verdict, dict):
+        return {"score": None, "tier": None, "fast_path": False, "signals": {}}
+
+    issues = [i for i in verdict.get("issues") or [] if isinstance(i, dict)]
+    severities = [str(i.get("severity", "")).lower() for i in issues]
+    text = json.dumps({
+        "issues": issues,
+        "regions_affected": verdict.get("regions_affected") or []
+    }).lower()
+
+    signals = {
+        "regions": len(_regions(verdict)),
+        "laws": len(_laws(verdict)),
+        "issues": len(issues),
+        "high_severity_issues": sum(1 for s in severities if s in ("high", "critical")),
+        "keyword_hits": sum(text.count(k) for k in SEVERITY_KEYWORDS),
+        "open_questions": len(verdict.get("open_questions") or []),
+        "needs_geo_specific_logic": verdict.get("needs_geo_specific_logic"),
+    }
+
+    score = (
+        signals["regions"] * 10
+        + signals["laws"] * 5
+        + sum(SEVERITY_WEIGHTS.get(s, 0) for s in severities)
+        + signals["keyword_hits"] * 5
+        + signals["open_questions"] * 5
+        + (20 if signals["needs_geo_specific_logic"] else 0)
+    )
+    score = min(score, 100)
+
+    fast_path = (
+        signals["needs_geo_specific_logic"] is False
+        and signals["regions"] == 0
+        and signals["laws"] == 0
+        and signals["issues"] == 0
+        and signals["keyword_hits"] == 0
+        and signals["open_questions"] == 0
+    )
+
+    return {"score": score, "tier": _tier(score), "fast_path": fast_path, "signals": signals}
+
+
+def fast_path_assessment(prescore: Dict) -> Dict:
+    """
+    Risk assessment in the LLM engine's output schema for a fast-path verdict.
+    """
+    return {
+        "risk_assessment": {
+            "overall_risk": "Low",
+            "risk_score": prescore["score"],
+            "confidence": 0.9,
+            "summary": (
+                "The verdict requires no geo-specific compliance logic and cites no "
+                "affected regions, laws, issues or open questions."
+            ),
+            "drivers": [],
+            "method": "fast_path"
+        }
+    }
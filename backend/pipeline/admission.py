@@ -0,0 +1,274 @@
+# pipeline/admission.py
+"""
+Per-principal admission control for the pipeline endpoints.
+
+Every request first takes a token from its principal's bucket
+(ADMISSION_RATE_PER_MINUTE, bursts up to ADMISSION_BURST). It then needs a
+slot: at most ADMISSION_USER_CONCURRENCY per principal and
+ADMISSION_GLOBAL_CONCURRENCY in total. Requests that can't start right away
+wait in their principal's queue (ADMISSION_USER_QUEUE deep); freed slots go
+to the backlogged principal with the smallest virtual time, which advances
+by 1/weight per admitted request (start-time fair queueing), so a principal
+with many queued requests can't starve the others. A full queue, an empty
+bucket or a wait longer than ADMISSION_QUEUE_TIMEOUT_SECONDS raise
+`AdmissionRejected` with a retry_after for the 429 response.
+
+State is per process and lives on the event loop; acquire and release
+must be called from it.
+"""
+
+import os
+import json
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_GLOBAL_CONCURRENCY = int(os.getenv("ADMISSION_GLOBAL_CONCURRENCY", "8"))
+ADMISSION_USER_CONCURRENCY = int(os.getenv("ADMISSION_USER_CONCURRENCY", "2"))
+ADMISSION_USER_QUEUE = int(os.getenv("ADMISSION_USER_QUEUE", "4"))
+ADMISSION_RATE_PER_MINUTE = float(os.getenv("ADMISSION_RATE_PER_MINUTE", "30"))
+ADMISSION_BURST = int(os.getenv("ADMISSION_BURST", "10"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "60"))
+# Fair-share weights by principal, e.g. '{"user:ops@example.com": 3}' (default 1)
+ADMISSION_WEIGHTS: Dict[str, float] = json.loads(os.getenv("ADMISSION_WEIGHTS", "{}"))
+# Queued-or-running /run/core jobs allowed per principal (0 = unbounded)
+JOB_USER_MAX_PENDING = int(os.getenv("JOB_USER_MAX_PENDING", "10"))
+
+# Retry-After estimate until a request has been timed
+_DEFAULT_HOLD_SECONDS = 30.0
+# How often idle principals with a refilled bucket are dropped
+_SWEEP_SECONDS = 10.0
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class _Principal:
+    __slots__ = ("tokens", "refilled_at", "active", "waiters", "vtime", "weight")
+
+    def __init__(self, burst: int, weight: float):
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.vtime = 0.0
+        self.weight = weight
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        global_limit: int = ADMISSION_GLOBAL_CONCURRENCY,
+        user_limit: int = ADMISSION_USER_CONCURRENCY,
+        user_queue: int = ADMISSION_USER_QUEUE,
+        rate_per_minute: float = ADMISSION_RATE_PER_MINUTE,
+        burst: int = ADMISSION_BURST,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        weights: Optional[Dict[str, float]] = None,
+        name: str = "admission",
+    ):
+        self.global_limit = global_limit
+        self.user_limit = user_limit
+        self.user_queue = user_queue
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.queue_timeout = queue_timeout
+        self.weights = ADMISSION_WEIGHTS if weights is None else weights
+        self.name = name
+        self.active = 0
+        self._vclock = 0.0
+        self._principals: Dict[str, _Principal] = {}
+        self._waiting: Dict[str, _Principal] = {}  # principals with queued requests
+        self._swept_at = time.monotonic()
+
+    def _state(self, principal: str) -> _Principal:
+        state = self._principals.get(principal)
+        if state is None:
+            self._sweep()
+            state = _Principal(self.burst, float(self.weights.get(principal, 1)))
+            self._principals[principal] = state
+        return state
+
+    def _sweep(self):
+        """
+        Drops every idle principal whose bucket has refilled, at most once
+        per _SWEEP_SECONDS, so callers seen once (e.g. by IP) don't pile up.
+        """
+        now = time.monotonic()
+        if now - self._swept_at < _SWEEP_SECONDS:
+            return
+        self._swept_at = now
+        for principal, state in list(self._principals.items()):
+            self._forget_if_idle(principal, state)
+
+    def _refill(self, state: _Principal):
+        now = time.monotonic()
+        state.tokens = min(self.burst, state.tokens + (now - state.refilled_at) * self.rate)
+        state.refilled_at = now
+
+    def _forget_if_idle(self, principal: str, state: _Principal):
+        """
+        Drops principals with nothing running or queued and a full bucket,
+        which is indistinguishable from a fresh one.
+        """
+        if state.active or state.waiters:
+            return
+        self._refill(state)
+        if state.tokens >= self.burst:
+            self._principals.pop(principal, None)
+
+    def take_token(self, principal: str):
+        """
+        Rate limit only; raises AdmissionRejected when the bucket is empty.
+        """
+        if self.rate <= 0:
+            return
+        state = self._state(principal)
+        self._refill(state)
+        if state.tokens < 1:
+            metrics.incr(f"{self.name}.rejected_rate")
+            raise AdmissionRejected("Rate limit exceeded", (1 - state.tokens) / self.rate)
+        state.tokens -= 1
+
+    def _retry_estimate(self, state: _Principal) -> float:
+        hold = metrics.average(f"{self.name}.hold_s") or _DEFAULT_HOLD_SECONDS
+        return hold * (len(state.waiters) + state.active) / max(self.user_limit, 1)
+
+    def _grant(self, state: _Principal):
+        start = max(state.vtime, self._vclock)
+        state.vtime = start + 1.0 / max(state.weight, 1e-6)
+        self._vclock = start
+        state.active += 1
+        self.active += 1
+
+    def _dispatch(self):
+        """
+        Hands free slots to the waiting principal with the lowest virtual time.
+        """
+        while self.active < self.global_limit:
+            best = None
+            for principal, state in list(self._waiting.items()):
+                while state.waiters and state.waiters[0].done():
+                    state.waiters.popleft()
+                if not state.waiters:
+                    del self._waiting[principal]
+                    continue
+                if state.active >= self.user_limit:
+                    continue
+                if best is None or max(state.vtime, self._vclock) < max(best[1].vtime, self._vclock):
+                    best = (principal, state)
+            if best is None:
+                return
+            principal, state = best
+            self._grant(state)
+            state.waiters.popleft().set_result(True)
+            if not state.waiters:
+                del self._waiting[principal]
+
+    def position(self, principal: str) -> Optional[int]:
+        state = self._principals.get(principal)
+        return len(state.waiters) if state else None
+
+    async def acquire(self, principal: str):
+        state = self._state(principal)
+        if len(state.waiters) >= self.user_queue:
+            metrics.incr(f"{self.name}.rejected_queue_full")
+            raise AdmissionRejected("Too many queued requests", self._retry_estimate(state))
+        self.take_token(principal)
+
+        future = asyncio.get_running_loop().create_future()
+        state.waiters.append(future)
+        self._waiting[principal] = state
+        position = len(state.waiters)
+        self._dispatch()
+        if future.done():
+            metrics.incr(f"{self.name}.admitted")
+            metrics.observe(f"{self.name}.wait_s", 0.0)
+            return
+
+        metrics.observe(f"{self.name}.queue_position", position)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done():
+                # Granted just as the caller gave up
+                self.release(principal)
+            else:
+                future.cancel()
+                if future in state.waiters:
+                    state.waiters.remove(future)
+                if not state.waiters:
+                    self._waiting.pop(principal, None)
+                self._forget_if_idle(principal, state)
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.incr(f"{self.name}.rejected_timeout")
+                raise AdmissionRejected("Timed out waiting for a pipeline slot", self._retry_estimate(state))
+            raise
+        metrics.incr(f"{self.name}.admitted")
+        metrics.observe(f"{self.name}.wait_s", time.monotonic() - started)
+
+    def release(self, principal: str, held_for: Optional[float] = None):
+        state = self._principals.get(principal)
+        if state is None or state.active == 0:
+            logger.warning(f"Admission release without a slot for {principal}")
+            return
+        state.active -= 1
+        self.active -= 1
+        if held_for is not None:
+            metrics.observe(f"{self.name}.hold_s", held_for)
+        self._dispatch()
+        self._forget_if_idle(principal, state)
+
+    @asynccontextmanager
+    async def slot(self, principal: str):
+        await self.acquire(principal)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(principal, time.monotonic() - started)
+
+    def stats(self, top: int = 10) -> Dict:
+        busiest = sorted(
+            self._principals.items(),
+            key=lambda item: (len(item[1].waiters), item[1].active),
+            reverse=True
+        )[:top]
+        counters = metrics.snapshot()
+        prefix = f"{self.name}."
+        return {
+            "active": self.active,
+            "queued": sum(len(s.waiters) for s in self._waiting.values()),
+            "principals": len(self._principals),
+            "limits": {
+                "global": self.global_limit,
+                "per_user": self.user_limit,
+                "user_queue": self.user_queue,
+                "rate_per_minute": round(self.rate * 60, 2),
+                "burst": self.burst,
+            },
+            "busiest": [
+                {"principal": p, "active": s.active, "queued": len(s.waiters), "tokens": round(s.tokens, 2)}
+                for p, s in busiest if s.active or s.waiters
+            ],
+            "avg_wait_s": metrics.average(f"{prefix}wait_s"),
+            "avg_queue_position": metrics.average(f"{prefix}queue_position"),
+            "avg_hold_s": metrics.average(f"{prefix}hold_s"),
+            **{name[len(prefix):]: count for name, count in counters.items() if name.startswith(prefix)},
+        }
+
+
+admission = AdmissionController()
@@ -0,0 +1,172 @@
+# pipeline/batch_runner.py
+"""
+Concurrent batch runner for screening many feature contexts.
+Results are streamed to an NDJSON file so interrupted batches can resume.
+"""
+
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .stages import run_stages_sync
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def load_contexts(file_path: str) -> List[Dict]:
+    """
+    Loads feature contexts from a JSON file (object or list) or NDJSON.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        raw = f.read()
+
+    try:
+        data = json.loads(raw)
+        return data if isinstance(data, list) else [data]
+    except json.JSONDecodeError:
+        # NDJSON: one context per non-empty line
+        return [json.loads(line) for line in raw.splitlines() if line.strip()]
+
+
+def _batch_key(context: Dict, index: int) -> str:
+    # Position-qualified so duplicate feature_ids in one input are kept apart.
+    return f"{index:05d}:{context.get('feature_id') or 'item'}"
+
+
+def _load_completed_keys(output_path: str) -> set:
+    """
+    Reads keys of successfully processed items from a previous (possibly
+    interrupted) run. Failed items are retried.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Partial last line from an interrupted write
+                continue
+            if record.get("status") == "ok":
+                completed.add(record.get("batch_key"))
+    return completed
+
+
+def _run_one(context: Dict, run_risk: bool, run_autofix: bool, use_cache: bool) -> Dict:
+    targets = ["core"]
+    if run_risk:
+        targets.append("risk")
+    if run_autofix:
+        targets.append("autofix")
+
+    stage_run = run_stages_sync(targets, context_data=context, use_cache=use_cache)
+    for name in targets:
+        if name in stage_run.errors:
+            raise RuntimeError(f"{name} stage failed: {stage_run.errors[name]}")
+
+    return {name: stage_run.results[name] for name in stage_run.results}
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def run_batch(
+    contexts: List[Dict],
+    output_path: str,
+    concurrency: int = 4,
+    run_risk: bool = False,
+    run_autofix: bool = False,
+    resume: bool = True,
+    use_cache: bool = True
+) -> Dict:
+    """
+    Runs the core pipeline (and optionally risk/autofix) over many feature
+    contexts with bounded concurrency, appending one NDJSON record per item.
+    Returns a throughput/latency summary.
+    """
+    completed = _load_completed_keys(output_path) if resume else set()
+
+    pending = []
+    for index, context in enumerate(contexts):
+        key = _batch_key(context, index)
+        if key not in completed:
+            pending.append((key, context))
+
+    skipped = len(contexts) - len(pending)
+    logger.info(f"Batch: {len(pending)} pending, {skipped} already completed")
+
+    latencies = []
+    failed = 0
+
+    def process(key: str, context: Dict) -> Dict:
+        started = time.perf_counter()
+        try:
+            result = _run_one(context, run_risk, run_autofix, use_cache)
+            record = {"batch_key": key, "status": "ok", "result": result}
+        except Exception as e:
+            logger.error(f"Batch item {key} failed: {e}")
+            record = {"batch_key": key, "status": "error", "error": str(e)}
+        record["latency_s"] = round(time.perf_counter() - started, 3)
+        record["finished_at"] = datetime.utcnow().isoformat()
+        return record
+
+    mode = "a" if resume else "w"
+    wall_start = time.perf_counter()
+
+    with open(output_path, mode, encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [executor.submit(process, key, ctx) for key, ctx in pending]
+
+        for future in as_completed(futures):
+            # Written from the submitting thread only, one line per item
+            record = future.result()
+            out.write(json.dumps(record, default=str) + "\n")
+            out.flush()
+            latencies.append(record["latency_s"])
+            if record["status"] != "ok":
+                failed += 1
+
+    wall_time = time.perf_counter() - wall_start
+    processed = len(latencies)
+
+    return {
+        "total": len(contexts),
+        "processed": processed,
+        "succeeded": processed - failed,
+        "failed": failed,
+        "skipped": skipped,
+        "concurrency": concurrency,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_per_min": round(processed / wall_time * 60, 2) if wall_time > 0 else 0.0,
+        "latency_s": {
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "max": max(latencies) if latencies else 0.0,
+        },
+    }
+
+
+def print_summary(summary: Dict, output_path: Optional[str] = None):
+    print("\n================ BATCH SUMMARY ================\n")
+    print(f"Items:       {summary['total']} total, {summary['processed']} processed, "
+          f"{summary['skipped']} skipped (resumed)")
+    print(f"Results:     {summary['succeeded']} ok, {summary['failed']} failed")
+    print(f"Wall time:   {summary['wall_time_s']}s at concurrency {summary['concurrency']}")
+    print(f"Throughput:  {summary['throughput_per_min']} features/min")
+    lat = summary["latency_s"]
+    print(f"Latency:     p50 {lat['p50']}s, p95 {lat['p95']}s, max {lat['max']}s")
+    if output_path:
+        print(f"Output:      {output_path}")
+    print("\n===============================================\n")
@@ -1,20 +1,24 @@
 import json
 import uuid
+import hashlib
 import logging
 from datetime import datetime
 from typing import Dict, Optional
 
 # Core dependencies (existing)
-from backend.agents.jury_system import run_pipeline as run_agents_pipeline
+from backend.agents.jury_system import run_pipeline as run_agents_pipeline, EVENT_JUDGE_VERDICT
 from backend.features.compliance_history.history_manager import (
     store_verdict,
-    get_previous_verdict
+    get_latest_verdict
 )
 from backend.features.compliance_diff.diff_engine import generate_compliance_diff
 from backend.agents import config as agents_config
 from backend.features.risk_reasoning import risk_engine as risk_module
 from backend.features.compliance_diff import diff_engine as diff_module
 from backend.features.auto_fix import fix_engine as fix_module
+from backend.agents.prompts import jury_prompt, jury_report_critic_prompt, jury_final_response_prompt
+from .verdict_cache import cache_key, get_cached_result, store_cached_result, record_bypass
+from . import metrics
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -73,6 +77,31 @@ def _build_models_used() -> Dict[str, str]:
             models[k] = getattr(v, "model", str(v))
     return models
 
+def record_diff_metrics(diff: Optional[Dict]):
+    """Counts structural (no LLM) vs LLM compliance diffs."""
+    body = diff.get("compliance_diff") if isinstance(diff, dict) else None
+    method = body.get("method", "llm") if isinstance(body, dict) else "llm"
+    metrics.incr(f"compliance_diff.{method}")
+
+def _build_model_config() -> Dict:
+    """
+    Agent models, sampling settings and prompt versions: everything besides
+    the feature context and law corpus that determines a verdict.
+    """
+    agents = {
+        "jury": agents_config.llama_model,
+        "critic": agents_config.mistral_model,
+        "judge": agents_config.mistral_model,
+    }
+    config = {
+        role: {"model": getattr(m, "model", str(m)), **getattr(m, "config", {})}
+        for role, m in agents.items()
+    }
+    prompts = jury_prompt.PROMPT + jury_report_critic_prompt.PROMPT + jury_final_response_prompt.PROMPT
+    config["prompt_version"] = hashlib.sha256(prompts.encode("utf-8")).hexdigest()[:16]
+    config["history_max_tokens"] = agents_config.AGENT_HISTORY_MAX_TOKENS
+    return config
+
 def _extract_jurisdictions_from_verdict(verdict: Dict) -> list:
     regions = []
     try:
@@ -87,35 +116,76 @@ def _extract_jurisdictions_from_verdict(verdict: Dict) -> list:
         pass
     return list(dict.fromkeys(regions))
 
-def run_core_pipeline(context_data: Dict, on_event=None) -> Dict:
+def run_core_pipeline(context_data: Dict, on_event=None, checkpoints=None, on_checkpoint=None, run_id: Optional[str] = None, use_cache: bool = True, cancel_token=None) -> Dict:
     """
     Executes Pipeline A: Core Compliance Pipeline (Judge).
     Returns verdict, compliance_diff, and metadata immediately.
+    Agent steps in `checkpoints` are replayed rather than re-run.
+    For an identical context, law corpus and model config the agents are
+    skipped and the cached verdict reused unless use_cache is False; it is
+    still stored as a new version and diffed against the current latest.
+    A cancelled `cancel_token` aborts the agents with Cancelled.
     """
     logger.info("Starting Core Pipeline")
-    
-    # 1. Run agents
-    agent_output = run_agents_pipeline(context_data, on_event=on_event)
-    
-    # Handle new dict return with trace
-    if isinstance(agent_output, dict) and "verdict_json" in agent_output:
-        raw_verdict = agent_output["verdict_json"]
-        execution_trace = agent_output.get("execution_trace", [])
+
+    run_id = run_id or f"run_{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}_{uuid.uuid4().hex[:6]}"
+    memo_key = cache_key(context_data, _build_model_config())
+
+    # 0. Verdict cache
+    cached = None
+    if use_cache:
+        cached = get_cached_result(memo_key)
     else:
-        # Fallback
-        raw_verdict = agent_output
-        execution_trace = []
-    
-    # 2. Parse verdict
-    verdict_obj = _parse_verdict(raw_verdict)
+        record_bypass()
+
+    if cached:
+        # Only the agents' work is reused; history and diff are per run
+        logger.info(f"Verdict cache hit {memo_key[:12]} (source run {cached.get('run_id')})")
+        if on_event:
+            on_event(EVENT_JUDGE_VERDICT, {"verdict": cached.get("verdict"), "cached": True})
+        verdict_obj = cached.get("verdict") or {}
+        execution_trace = cached.get("agent_trace", [])
+        session_stats = None
+        degraded = False
+    else:
+        # 1. Run agents
+        agent_output = run_agents_pipeline(
+            context_data,
+            on_event=on_event,
+            checkpoints=checkpoints,
+            on_checkpoint=on_checkpoint,
+            cancel_token=cancel_token
+        )
+
+        # Handle new dict return with trace
+        if isinstance(agent_output, dict) and "verdict_json" in agent_output:
+            raw_verdict = agent_output["verdict_json"]
+            execution_trace = agent_output.get("execution_trace", [])
+            session_stats = agent_output.get("session_stats")
+            degraded = agent_output.get("degraded", False)
+        else:
+            # Fallback
+            raw_verdict = agent_output
+            execution_trace = []
+            session_stats = None
+            degraded = False
+
+        if session_stats:
+            logger.info(
+                f"Agent sessions: {session_stats['prompt_tokens']} prompt tokens, "
+                f"{session_stats['prompt_tokens_saved']} reusable via prefix cache"
+            )
+
+        # 2. Parse verdict
+        verdict_obj = _parse_verdict(raw_verdict)
     
     # 3. Identify ID
     feature_id = context_data.get("feature_id") or verdict_obj.get("feature") or verdict_obj.get("feature_id")
     if not feature_id:
         raise ValueError("feature_id missing in context and verdict")
         
-    # 4. Fetch previous
-    previous_record = get_previous_verdict(feature_id)
+    # 4. Fetch previous (the latest stored version, before this one is added)
+    previous_record = get_latest_verdict(feature_id)
     
     # 5. Store current
     laws_snapshot = verdict_obj.get("laws_snapshot") if isinstance(verdict_obj.get("laws_snapshot"), list) else None
@@ -128,7 +198,11 @@ def run_core_pipeline(context_data: Dict, on_event=None) -> Dict:
     
     # 6. Compliance Diff
     compliance_diff = None
-    if previous_record:
+    diff_ok = True
+    # The verdict is already stored; a cancelled run just skips the diff call
+    if previous_record and cancel_token is not None and cancel_token.cancelled:
+        diff_ok = False
+    elif previous_record:
         try:
             compliance_diff = generate_compliance_diff(
                 previous_verdict=previous_record.get("verdict"),
@@ -136,8 +210,10 @@ def run_core_pipeline(context_data: Dict, on_event=None) -> Dict:
                 previous_laws_snapshot=previous_record.get("laws_snapshot"),
                 current_laws_snapshot=stored_record.get("laws_snapshot")
             )
+            record_diff_metrics(compliance_diff)
         except Exception as e:
             logger.error(f"Diff generation failed: {e}")
+            diff_ok = False
             compliance_diff = {
                 "compliance_diff": {
                     "summary": "Diff generation failed",
@@ -150,12 +226,15 @@ def run_core_pipeline(context_data: Dict, on_event=None) -> Dict:
         "verdict_version": stored_record.get("version"),
         "previous_verdict_exists": bool(previous_record),
         "jurisdictions_evaluated": _extract_jurisdictions_from_verdict(verdict_obj),
-        "models_used": _build_models_used()
+        "models_used": _build_models_used(),
+        "session_stats": session_stats,
+        "cache": (
+            {"hit": True, "key": memo_key, "source_run_id": cached.get("run_id")}
+            if cached else {"hit": False, "key": memo_key}
+        )
     }
     
-    run_id = f"run_{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}_{uuid.uuid4().hex[:6]}"
-    
-    return {
+    result = {
         "feature_id": feature_id,
         "run_id": run_id,
         "timestamp": stored_record.get("timestamp"),
@@ -164,3 +243,20 @@ def run_core_pipeline(context_data: Dict, on_event=None) -> Dict:
         "metadata": metadata,
         "agent_trace": execution_trace
     }
+
+    if cached:
+        return result
+
+    # Only complete results are reused: not a verdict built on an agent's
+    # fallback text, nor one whose diff failed or was skipped
+    if degraded or not diff_ok:
+        logger.info(f"Not caching verdict for {run_id} (degraded={degraded}, diff_ok={diff_ok})")
+        metrics.incr("verdict_cache.skipped_degraded")
+        return result
+
+    try:
+        store_cached_result(memo_key, result)
+    except Exception as e:
+        logger.error(f"Failed to store verdict cache entry: {e}")
+
+    return result
@@ -0,0 +1,94 @@
+# pipeline/event_bridge.py
+"""
+Thread-to-async bridge for pipeline events, delivered in batches.
+
+Agent threads call `put()`, which only appends under a lock and schedules
+at most one loop wake-up until the consumer drains. The consumer takes
+everything pending in one `get_batch()` call. Streaming `is_log` thinking
+events arrive one sentence at a time, so a batch holding them waits up to
+the coalescing window for more and merges consecutive log events of the
+same type into one event. Other events are never merged or reordered.
+"""
+
+import os
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, List
+
+SSE_COALESCE_WINDOW_MS = float(os.getenv("SSE_COALESCE_WINDOW_MS", "50"))
+
+
+def _is_log(item: Dict) -> bool:
+    data = item.get("data")
+    return "event" in item and isinstance(data, dict) and data.get("is_log", False)
+
+
+def coalesce(items: List[Dict]) -> List[Dict]:
+    """
+    Merges runs of consecutive is_log events with the same event type.
+    """
+    merged = []
+    for item in items:
+        last = merged[-1] if merged else None
+        if last is not None and _is_log(item) and _is_log(last) and last["event"] == item["event"]:
+            merged[-1] = {
+                "event": last["event"],
+                "data": {**last["data"], "msg": f"{last['data'].get('msg', '')} {item['data'].get('msg', '')}".strip()},
+            }
+        else:
+            merged.append(item)
+    return merged
+
+
+class EventBridge:
+    def __init__(self, loop: asyncio.AbstractEventLoop, window_ms: float = SSE_COALESCE_WINDOW_MS):
+        self._loop = loop
+        self._window = window_ms / 1000.0
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._wake_scheduled = False
+        self._closed = False
+        self._ready = asyncio.Event()
+
+    def put(self, item: Dict):
+        """
+        Thread-safe; called from agent and stage threads.
+        """
+        with self._lock:
+            self._items.append(item)
+            if self._wake_scheduled:
+                return
+            self._wake_scheduled = True
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    def close(self):
+        """
+        Called on the loop once no more events will be put.
+        """
+        self._closed = True
+        self._ready.set()
+
+    def _drain(self) -> List[Dict]:
+        with self._lock:
+            items = list(self._items)
+            self._items.clear()
+            self._wake_scheduled = False
+        return items
+
+    async def get_batch(self) -> List[Dict]:
+        """
+        Waits for events and returns them coalesced. Returns an empty list
+        once the bridge is closed and drained.
+        """
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            items = self._drain()
+            if items and self._window and not self._closed and any(_is_log(i) for i in items):
+                await asyncio.sleep(self._window)
+                items.extend(self._drain())
+            if items:
+                return coalesce(items)
+            if self._closed:
+                return []
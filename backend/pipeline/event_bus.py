@@ -0,0 +1,267 @@
+# pipeline/event_bus.py
+"""
+Run event bus: pipeline events are published once and fanned out to any
+number of subscribers watching that run.
+
+Publishing is thread-safe and never blocks: each subscriber owns a bounded
+asyncio queue, and a subscriber that cannot keep up loses events according
+to its drop policy ("drop_oldest" or "drop_newest") instead of slowing the
+pipeline. It is told how many events it missed with an `events_dropped` event.
+
+The bus fans out within the process. A backend (e.g. MongoBusBackend) can
+carry events between processes, so a viewer attached to one API instance
+sees runs executed by a separate worker.
+"""
+
+import os
+import json
+import uuid
+import queue
+import datetime
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Set
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+EVENT_BUS_QUEUE_SIZE = int(os.getenv("EVENT_BUS_QUEUE_SIZE", "256"))
+EVENT_BUS_DROP_POLICY = os.getenv("EVENT_BUS_DROP_POLICY", "drop_oldest")
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+
+# Control event marking the end of a run; not forwarded to clients
+EVENT_END = "end"
+
+# Finished run_ids remembered so late subscribers end immediately
+_FINISHED_MEMORY = 1000
+
+# How far back a reconnecting tail re-reads the bus; covers clock skew
+# between the machines generating ObjectIds (duplicates are dropped by seq)
+EVENT_BUS_RESUME_WINDOW_SECONDS = float(os.getenv("EVENT_BUS_RESUME_WINDOW_SECONDS", "30"))
+# Runs whose last sequence number is remembered, by publisher and by tail
+_SEQ_MEMORY = 10000
+
+
+class Subscription:
+    def __init__(self, run_id: str, maxsize: int, policy: str):
+        if policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown drop policy '{policy}'")
+        self.id = uuid.uuid4().hex
+        self.run_id = run_id
+        self.policy = policy
+        self.dropped = 0
+        self._reported = 0
+        self._queue = asyncio.Queue(maxsize)
+        self._loop = asyncio.get_running_loop()
+
+    def offer(self, item: Dict):
+        """
+        Called on the subscriber's loop; applies the drop policy when full.
+        """
+        if self._queue.full():
+            if item["event"] != EVENT_END and self.policy == DROP_NEWEST:
+                self._drop()
+                return
+            self._queue.get_nowait()
+            self._drop()
+        self._queue.put_nowait(item)
+
+    def _drop(self):
+        self.dropped += 1
+        metrics.incr("event_bus.dropped")
+
+    async def get(self) -> Dict:
+        if self.dropped > self._reported:
+            missed = self.dropped - self._reported
+            self._reported = self.dropped
+            return {"event": "events_dropped", "data": json.dumps({"count": missed})}
+        return await self._queue.get()
+
+    async def get_batch(self) -> List[Dict]:
+        """
+        Waits for one event, then takes everything else already queued.
+        """
+        batch = [await self.get()]
+        while not self._queue.empty() and batch[-1]["event"] != EVENT_END:
+            batch.append(self._queue.get_nowait())
+        return batch
+
+
+class EventBus:
+    def __init__(self):
+        self.backend = None
+        self.origin = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._finished: "OrderedDict[str, bool]" = OrderedDict()
+
+    def use_backend(self, backend):
+        """
+        Attaches a cross-process backend; events it receives from other
+        processes are delivered to local subscribers.
+        """
+        self.backend = backend
+        backend.start(self.origin, self._deliver)
+
+    def publish(self, run_id: str, event: str, data: str):
+        """
+        Thread-safe, non-blocking. `data` is the already-encoded SSE payload.
+        """
+        item = {"event": event, "data": data}
+        self._deliver(run_id, item)
+        if self.backend:
+            try:
+                self.backend.publish(self.origin, run_id, item)
+            except Exception as e:
+                logger.error(f"Event bus backend publish failed: {e}")
+
+    def finish(self, run_id: str):
+        self.publish(run_id, EVENT_END, "")
+
+    def is_finished(self, run_id: str) -> bool:
+        with self._lock:
+            return run_id in self._finished
+
+    def _deliver(self, run_id: str, item: Dict):
+        with self._lock:
+            if item["event"] == EVENT_END:
+                self._finished[run_id] = True
+                while len(self._finished) > _FINISHED_MEMORY:
+                    self._finished.popitem(last=False)
+            subscribers = list(self._subscribers.get(run_id, ()))
+        metrics.incr("event_bus.published")
+        for sub in subscribers:
+            try:
+                sub._loop.call_soon_threadsafe(sub.offer, item)
+            except RuntimeError:
+                # Subscriber loop already closed
+                self.unsubscribe(sub)
+
+    def subscribe(self, run_id: str, maxsize: int = EVENT_BUS_QUEUE_SIZE, policy: str = EVENT_BUS_DROP_POLICY) -> Subscription:
+        """
+        Must be called from the event loop that will consume the events.
+        """
+        sub = Subscription(run_id, maxsize, policy)
+        with self._lock:
+            self._subscribers.setdefault(run_id, set()).add(sub)
+        metrics.incr("event_bus.subscriptions")
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subscribers.get(sub.run_id)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.run_id]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            subscribers = sum(len(s) for s in self._subscribers.values())
+            runs = len(self._subscribers)
+        counters = metrics.snapshot()
+        return {
+            "backend": type(self.backend).__name__ if self.backend else "in_process",
+            "watched_runs": runs,
+            "subscribers": subscribers,
+            "published": counters.get("event_bus.published", 0),
+            "dropped": counters.get("event_bus.dropped", 0),
+        }
+
+
+class MongoBusBackend:
+    """
+    Cross-process transport over a capped collection. Every process tails
+    the collection and delivers events published by other processes.
+
+    ObjectIds are not monotonic across machines, so they only bound where a
+    reconnecting tail resumes. Each event carries a sequence number per
+    publisher and run, and the tail delivers a run's events in that order,
+    dropping any it has already delivered.
+    """
+
+    def __init__(self, database, collection_name: str = "event_bus", size_bytes: int = 64 * 1024 * 1024):
+        if collection_name not in database.list_collection_names():
+            try:
+                database.create_collection(collection_name, capped=True, size=size_bytes)
+            except Exception as e:
+                # Another process created it first
+                logger.info(f"Event bus collection not created: {e}")
+        self.collection = database[collection_name]
+        self._stop = threading.Event()
+        self._outbox = queue.Queue()
+        self._seq_lock = threading.Lock()
+        # Kept past a run's end: a resumed run continues its sequence
+        self._last_seq: "OrderedDict[str, int]" = OrderedDict()
+
+    def publish(self, origin: str, run_id: str, item: Dict):
+        with self._seq_lock:
+            seq = self._last_seq.get(run_id, 0) + 1
+            self._last_seq[run_id] = seq
+            self._last_seq.move_to_end(run_id)
+            while len(self._last_seq) > _SEQ_MEMORY:
+                self._last_seq.popitem(last=False)
+        # Called on the event loop too: hand over to the writer thread
+        self._outbox.put({"origin": origin, "run_id": run_id, "seq": seq, **item})
+
+    def start(self, origin: str, deliver):
+        threading.Thread(target=self._tail, args=(origin, deliver), daemon=True).start()
+        threading.Thread(target=self._write, daemon=True).start()
+
+    def _write(self):
+        while not self._stop.is_set():
+            docs = [self._outbox.get()]
+            while not self._outbox.empty():
+                docs.append(self._outbox.get_nowait())
+            try:
+                self.collection.insert_many(docs, ordered=True)
+            except Exception as e:
+                logger.error(f"Event bus write failed ({len(docs)} events): {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def _tail(self, origin: str, deliver):
+        from bson import ObjectId
+        from pymongo import CursorType
+
+        # Last delivered seq by (origin, run_id)
+        delivered: "OrderedDict[tuple, int]" = OrderedDict()
+        last = self.collection.find_one(sort=[("$natural", -1)])
+        resume_at = last["_id"].generation_time if last else None
+        while not self._stop.is_set():
+            query = {}
+            if resume_at is not None:
+                since = resume_at - datetime.timedelta(seconds=EVENT_BUS_RESUME_WINDOW_SECONDS)
+                query = {"_id": {"$gte": ObjectId.from_datetime(since)}}
+            try:
+                # A tailable cursor returns documents in insertion order
+                cursor = self.collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive and not self._stop.is_set():
+                    for doc in cursor:
+                        written_at = doc["_id"].generation_time
+                        if resume_at is None or written_at > resume_at:
+                            resume_at = written_at
+                        if doc.get("origin") == origin:
+                            continue
+                        key = (doc.get("origin"), doc["run_id"])
+                        seq = doc.get("seq")
+                        if seq is not None:
+                            if seq <= delivered.get(key, 0):
+                                continue
+                            delivered[key] = seq
+                            delivered.move_to_end(key)
+                            while len(delivered) > _SEQ_MEMORY:
+                                delivered.popitem(last=False)
+                        deliver(doc["run_id"], {"event": doc["event"], "data": doc["data"]})
+            except Exception as e:
+                logger.error(f"Event bus tail failed: {e}")
+            self._stop.wait(1.0)
+
+
+event_bus = EventBus()
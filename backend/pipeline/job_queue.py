@@ -0,0 +1,395 @@
+# pipeline/job_queue.py
+"""
+Durable job queue on top of the `compliance_runs` collection.
+
+A queued run carries a `job` sub-document:
+
+    {"state": "queued" | "leased" | "done" | "failed",
+     "priority": int, "enqueued_at": datetime, "attempts": int,
+     "lease_owner": str, "lease_expires_at": datetime, "payload": {...},
+     "principal": str}
+
+Workers claim the highest-priority, oldest job atomically with
+`find_one_and_update` and hold it under a lease that a heartbeat keeps
+extending. If a worker dies its lease expires and the job is claimed again,
+up to JOB_MAX_ATTEMPTS times. A worker whose heartbeat finds the lease gone
+cancels its job, and its complete/fail no longer touch the document, so a
+reclaimed run is never worked on twice. `WorkerPool` drains the queue with
+a fixed number of threads, either inside the API process or in
+`backend.worker`.
+
+The depth check in `enqueue` is a count followed by a write, so concurrent
+producers can overshoot max_depth by a few jobs; the write itself only
+queues runs that are not already queued or leased.
+"""
+
+import os
+import time
+import socket
+import logging
+import datetime
+import threading
+import uuid
+from typing import Callable, Dict, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+from . import metrics
+from backend.agents.cancellation import CancelToken
+
+logger = logging.getLogger(__name__)
+
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+# Queued jobs beyond this are refused (0 = unbounded)
+JOB_QUEUE_MAX_DEPTH = int(os.getenv("JOB_QUEUE_MAX_DEPTH", "500"))
+
+JOB_QUEUED = "queued"
+JOB_LEASED = "leased"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class QueueFull(Exception):
+    pass
+
+
+# Runs that can be (re-)queued: anything not waiting for or held by a worker
+_ENQUEUEABLE = {"job.state": {"$nin": [JOB_QUEUED, JOB_LEASED]}}
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+def _enqueue_update(priority: int, payload: Optional[Dict], principal: Optional[str] = None) -> Dict:
+    return {"$set": {
+        "status": "QUEUED",
+        "job": {
+            "state": JOB_QUEUED,
+            "priority": priority,
+            "enqueued_at": _now(),
+            "attempts": 0,
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "payload": payload or {},
+            "principal": principal,
+        }
+    }}
+
+
+_DEPTH_PIPELINE = [
+    {"$match": {"job.state": {"$in": [JOB_QUEUED, JOB_LEASED]}}},
+    {"$group": {"_id": {"state": "$job.state", "priority": "$job.priority"}, "count": {"$sum": 1}}},
+]
+_OLDEST_QUERY = ({"job.state": JOB_QUEUED}, {"job.enqueued_at": 1})
+
+
+def _summarize(rows, oldest: Optional[Dict]) -> Dict:
+    depth = {JOB_QUEUED: 0, JOB_LEASED: 0}
+    by_priority = {}
+    for row in rows:
+        state, priority = row["_id"]["state"], row["_id"]["priority"]
+        depth[state] += row["count"]
+        if state == JOB_QUEUED:
+            by_priority[str(priority)] = row["count"]
+
+    counters = metrics.snapshot()
+    return {
+        "queued": depth[JOB_QUEUED],
+        "leased": depth[JOB_LEASED],
+        "queued_by_priority": by_priority,
+        "oldest_queued_age_s": (
+            round((_now() - oldest["job"]["enqueued_at"]).total_seconds(), 3) if oldest else None
+        ),
+        "max_depth": JOB_QUEUE_MAX_DEPTH,
+        "avg_queue_wait_s": metrics.average("jobs.queue_wait_s"),
+        **{name.split(".", 1)[1]: count for name, count in counters.items() if name.startswith("jobs.")},
+    }
+
+
+class JobQueue:
+    def __init__(self, collection, lease_seconds: int = JOB_LEASE_SECONDS, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def ensure_indexes(self):
+        self.collection.create_index(
+            [("job.state", ASCENDING), ("job.priority", DESCENDING), ("job.enqueued_at", ASCENDING)],
+            name="job_claim"
+        )
+        self.collection.create_index(
+            [("job.state", ASCENDING), ("job.lease_expires_at", ASCENDING)],
+            name="job_lease"
+        )
+        self.collection.create_index(
+            [("job.principal", ASCENDING), ("job.state", ASCENDING)],
+            name="job_principal",
+            partialFilterExpression={"job.state": {"$in": [JOB_QUEUED, JOB_LEASED]}}
+        )
+
+    def enqueue(self, run_id: str, priority: int = 0, payload: Optional[Dict] = None, max_depth: int = JOB_QUEUE_MAX_DEPTH):
+        """
+        Marks an existing run document as queued. Raises QueueFull when the
+        number of queued jobs has reached max_depth. Returns False (and
+        changes nothing) if the run is already queued or leased.
+        """
+        if max_depth and self.collection.count_documents({"job.state": JOB_QUEUED}) >= max_depth:
+            metrics.incr("jobs.rejected")
+            raise QueueFull(f"Job queue is full ({max_depth} queued)")
+
+        result = self.collection.update_one({"run_id": run_id, **_ENQUEUEABLE}, _enqueue_update(priority, payload))
+        if result.modified_count:
+            metrics.incr("jobs.enqueued")
+        return result.modified_count == 1
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """
+        Atomically leases the next job: queued jobs first by priority then
+        age, plus jobs whose lease expired and still have attempts left.
+        """
+        now = _now()
+        doc = self.collection.find_one_and_update(
+            {"$or": [
+                {"job.state": JOB_QUEUED},
+                {"job.state": JOB_LEASED,
+                 "job.lease_expires_at": {"$lt": now},
+                 "job.attempts": {"$lt": self.max_attempts}},
+            ]},
+            {
+                "$set": {
+                    "status": "IN_PROGRESS",
+                    "job.state": JOB_LEASED,
+                    "job.lease_owner": worker_id,
+                    "job.lease_expires_at": now + datetime.timedelta(seconds=self.lease_seconds),
+                    "job.started_at": now,
+                },
+                "$inc": {"job.attempts": 1},
+            },
+            sort=[("job.priority", DESCENDING), ("job.enqueued_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+        if doc:
+            metrics.incr("jobs.claimed")
+            if doc["job"]["attempts"] > 1:
+                metrics.incr("jobs.reclaimed")
+            else:
+                waited = (now - doc["job"]["enqueued_at"]).total_seconds()
+                metrics.observe("jobs.queue_wait_s", waited)
+        return doc
+
+    def heartbeat(self, run_id: str, worker_id: str) -> bool:
+        """
+        Extends the lease. Returns False if the lease was lost to another worker.
+        """
+        result = self.collection.update_one(
+            {"run_id": run_id, "job.state": JOB_LEASED, "job.lease_owner": worker_id},
+            {"$set": {"job.lease_expires_at": _now() + datetime.timedelta(seconds=self.lease_seconds)}}
+        )
+        return result.modified_count == 1
+
+    def complete(self, run_id: str, worker_id: str) -> bool:
+        """
+        Marks the job done; a no-op (returning False) unless worker_id still
+        holds the lease.
+        """
+        result = self.collection.update_one(
+            {"run_id": run_id, "job.state": JOB_LEASED, "job.lease_owner": worker_id},
+            {"$set": {"job.state": JOB_DONE, "job.finished_at": _now(), "job.lease_expires_at": None}}
+        )
+        if result.modified_count:
+            metrics.incr("jobs.completed")
+        return result.modified_count == 1
+
+    def fail(self, run_id: str, worker_id: str, error: str) -> bool:
+        result = self.collection.update_one(
+            {"run_id": run_id, "job.state": JOB_LEASED, "job.lease_owner": worker_id},
+            {"$set": {
+                "job.state": JOB_FAILED,
+                "job.finished_at": _now(),
+                "job.lease_expires_at": None,
+                "job.error": error,
+            }}
+        )
+        if result.modified_count:
+            metrics.incr("jobs.failed")
+        return result.modified_count == 1
+
+    def reap(self) -> int:
+        """
+        Fails jobs whose lease expired after their last allowed attempt.
+        """
+        result = self.collection.update_many(
+            {"job.state": JOB_LEASED,
+             "job.lease_expires_at": {"$lt": _now()},
+             "job.attempts": {"$gte": self.max_attempts}},
+            {"$set": {
+                "status": "FAILED",
+                "error": "Job lease expired after the maximum number of attempts",
+                "job.state": JOB_FAILED,
+                "job.finished_at": _now(),
+            }}
+        )
+        if result.modified_count:
+            metrics.incr("jobs.failed", result.modified_count)
+        return result.modified_count
+
+    def stats(self) -> Dict:
+        """
+        Queue depth per state and priority, and the age of the oldest queued job.
+        """
+        rows = list(self.collection.aggregate(_DEPTH_PIPELINE))
+        oldest = self.collection.find_one(*_OLDEST_QUERY, sort=[("job.enqueued_at", ASCENDING)])
+        return _summarize(rows, oldest)
+
+
+class AsyncJobQueue:
+    """
+    The producer side of JobQueue for async request handlers, over a motor
+    collection. Claiming and leasing stay with the worker threads.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def enqueue(
+        self,
+        run_id: str,
+        priority: int = 0,
+        payload: Optional[Dict] = None,
+        max_depth: int = JOB_QUEUE_MAX_DEPTH,
+        principal: Optional[str] = None
+    ):
+        if max_depth and await self.collection.count_documents({"job.state": JOB_QUEUED}) >= max_depth:
+            metrics.incr("jobs.rejected")
+            raise QueueFull(f"Job queue is full ({max_depth} queued)")
+
+        result = await self.collection.update_one(
+            {"run_id": run_id, **_ENQUEUEABLE},
+            _enqueue_update(priority, payload, principal)
+        )
+        if result.modified_count:
+            metrics.incr("jobs.enqueued")
+        return result.modified_count == 1
+
+    async def pending_for(self, principal: str) -> int:
+        """
+        Queued or running jobs submitted by one principal.
+        """
+        return await self.collection.count_documents(
+            {"job.principal": principal, "job.state": {"$in": [JOB_QUEUED, JOB_LEASED]}}
+        )
+
+    async def stats(self) -> Dict:
+        rows = await self.collection.aggregate(_DEPTH_PIPELINE).to_list(None)
+        oldest = await self.collection.find_one(*_OLDEST_QUERY, sort=[("job.enqueued_at", ASCENDING)])
+        return _summarize(rows, oldest)
+
+
+class WorkerPool:
+    """
+    Fixed number of worker threads draining a JobQueue.
+    `handler(doc, cancel_token)` runs one leased job; returning completes
+    it, raising fails it. The token is cancelled if the lease is lost.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: Callable[[Dict], None],
+        concurrency: int = 2,
+        poll_interval: float = JOB_POLL_SECONDS,
+        heartbeat_interval: float = JOB_HEARTBEAT_SECONDS,
+        name: Optional[str] = None
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._stop = threading.Event()
+        self._threads = []
+        self._active: Dict[str, Tuple[str, CancelToken]] = {}  # run_id -> (worker_id, token)
+        self._active_lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._work, args=(f"{self.name}-w{i}",), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        beat = threading.Thread(target=self._heartbeat, daemon=True)
+        beat.start()
+        self._threads.append(beat)
+        logger.info(f"Worker pool {self.name} started with {self.concurrency} workers")
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stops claiming new jobs; running jobs keep their lease until they end
+        (or expire and are retried elsewhere if the process exits first).
+        """
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def active(self) -> int:
+        with self._active_lock:
+            return len(self._active)
+
+    def _work(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                doc = self.queue.claim(worker_id)
+            except Exception as e:
+                logger.error(f"Job claim failed: {e}")
+                doc = None
+            if not doc:
+                self._stop.wait(self.poll_interval)
+                continue
+
+            run_id = doc["run_id"]
+            cancel_token = CancelToken()
+            with self._active_lock:
+                self._active[run_id] = (worker_id, cancel_token)
+            try:
+                self.handler(doc, cancel_token)
+                if not self.queue.complete(run_id, worker_id):
+                    logger.warning(f"Job {run_id} finished after its lease was lost; result not recorded")
+            except Exception as e:
+                if cancel_token.cancelled:
+                    # Another worker owns the run now; leave the document to it
+                    logger.warning(f"Job {run_id} stopped: {cancel_token.reason}")
+                else:
+                    logger.error(f"Job {run_id} failed: {e}")
+                    try:
+                        self.queue.fail(run_id, worker_id, str(e))
+                    except Exception as fail_error:
+                        logger.error(f"Could not mark job {run_id} failed: {fail_error}")
+            finally:
+                with self._active_lock:
+                    self._active.pop(run_id, None)
+
+    def _heartbeat(self):
+        # Keeps beating after stop() until the running jobs have finished
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._active_lock:
+                active = list(self._active.items())
+            if self._stop.is_set() and not active:
+                return
+            for run_id, (worker_id, cancel_token) in active:
+                try:
+                    if not cancel_token.cancelled and not self.queue.heartbeat(run_id, worker_id):
+                        logger.warning(f"Lost lease on job {run_id}; cancelling it")
+                        metrics.incr("jobs.lease_lost")
+                        cancel_token.cancel("job lease lost")
+                except Exception as e:
+                    logger.error(f"Heartbeat for job {run_id} failed: {e}")
+            try:
+                self.queue.reap()
+            except Exception as e:
+                logger.error(f"Job reaper failed: {e}")
@@ -0,0 +1,56 @@
+# pipeline/metrics.py
+"""
+In-process counters for pipeline metrics, exposed by the /metrics endpoint.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_observations: Dict[str, List[float]] = {}  # name -> [count, total]
+
+
+def incr(name: str, amount: int = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def observe(name: str, value: float):
+    """
+    Records one sample (e.g. a latency) for averaging.
+    """
+    with _lock:
+        entry = _observations.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += value
+
+
+def average(name: str) -> Optional[float]:
+    with _lock:
+        count, total = _observations.get(name, (0, 0.0))
+    if not count:
+        return None
+    return round(total / count, 4)
+
+
+def observations() -> Dict[str, Dict]:
+    with _lock:
+        return {
+            name: {"count": int(count), "avg": round(total / count, 4) if count else None}
+            for name, (count, total) in _observations.items()
+        }
+
+
+def snapshot() -> Dict[str, int]:
+    with _lock:
+        return dict(_counters)
+
+
+def ratio(numerator: str, *denominators: str) -> float:
+    """
+    Returns numerator / sum(denominators) from the current counters.
+    """
+    counters = snapshot()
+    total = sum(counters.get(d, 0) for d in denominators)
+    return round(counters.get(numerator, 0) / total, 4) if total else 0.0
@@ -6,7 +6,7 @@ Relocated to pipeline/ package.
 
 from typing import Dict, Optional
 import json
-from .core_pipeline import run_core_pipeline
+from .stages import run_stages_sync
 
 def run_full_pipeline(
     context_data: Dict,
@@ -21,7 +21,10 @@ def run_full_pipeline(
     """
     
     # 1. Run Core Pipeline
-    core_result = run_core_pipeline(context_data)
+    stage_run = run_stages_sync(["core"], context_data=context_data)
+    if not stage_run.ok("core"):
+        raise stage_run.errors["core"]
+    core_result = stage_run.results["core"]
     
     # 2. Construct Full Response (Aggregator)
     final_response = {
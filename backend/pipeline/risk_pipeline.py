@@ -1,12 +1,110 @@
+import os
+import random
 import logging
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, Optional
 
 from backend.features.risk_reasoning.risk_engine import generate_risk_assessment
+from backend.features.risk_reasoning.risk_prescore import score_verdict, fast_path_assessment
 from backend.features.compliance_history.history_manager import get_latest_verdict
+from . import metrics
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Skip the LLM for verdicts the deterministic pre-score marks as obvious Low risk
+RISK_FAST_PATH = os.getenv("RISK_FAST_PATH", "true").lower() == "true"
+# Fraction of fast-path hits also sent to the LLM (in the background) to measure agreement
+RISK_FAST_PATH_SHADOW_RATE = float(os.getenv("RISK_FAST_PATH_SHADOW_RATE", "0.05"))
+
+def compute_governance(risk_assessment: Dict) -> Dict:
+    """
+    Governance flags derived from the risk level: High/Critical needs human review.
+    """
+    overall_risk = ""
+    try:
+        overall_risk = risk_assessment.get("risk_assessment", {}).get("overall_risk", "")
+    except Exception:
+        pass
+
+    human_review_required = overall_risk in {"High", "Critical"}
+    
+    return {
+        "human_review_required": human_review_required,
+        "review_status": "Pending" if human_review_required else "Approved",
+        "reviewed_by": None,
+        "review_reason": None,
+        "audit_id": None
+    }
+
+def _llm_level(risk_assessment: Dict) -> Optional[str]:
+    try:
+        return risk_assessment.get("risk_assessment", {}).get("overall_risk")
+    except Exception:
+        return None
+
+
+def _shadow_check(verdict_data: Dict, context_data: Dict):
+    """
+    Runs the LLM on a fast-path verdict and records whether it agreed on Low.
+    """
+    try:
+        level = _llm_level(generate_risk_assessment(verdict_json=verdict_data, feature_context=context_data))
+    except Exception as e:
+        logger.warning(f"Risk fast-path shadow check failed: {e}")
+        return
+    metrics.incr("risk_fast_path.shadow_checks")
+    if level == "Low":
+        metrics.incr("risk_fast_path.shadow_agreements")
+    else:
+        logger.warning(f"Risk fast path said Low, LLM said {level}")
+
+
+def fast_path_risk(verdict_data: Dict, context_data: Dict) -> tuple:
+    """
+    Tier 1 of risk reasoning. Returns (risk_assessment or None, prescore);
+    a risk_assessment is only returned for confidently Low-risk verdicts.
+    """
+    prescore = score_verdict(verdict_data)
+    if not (RISK_FAST_PATH and prescore["fast_path"]):
+        metrics.incr("risk_fast_path.escalations")
+        return None, prescore
+
+    metrics.incr("risk_fast_path.hits")
+    if random.random() < RISK_FAST_PATH_SHADOW_RATE:
+        threading.Thread(target=_shadow_check, args=(verdict_data, context_data), daemon=True).start()
+    return fast_path_assessment(prescore), prescore
+
+
+def record_prescore_agreement(prescore: Dict, risk_assessment: Dict):
+    """
+    Compares the pre-score tier with the LLM level for escalated verdicts.
+    """
+    level = _llm_level(risk_assessment)
+    if not prescore.get("tier") or not level:
+        return
+    metrics.incr("risk_prescore.compared")
+    if prescore["tier"] == level:
+        metrics.incr("risk_prescore.agreements")
+
+
+def fast_path_stats() -> Dict:
+    counters = metrics.snapshot()
+    shadow_checks = counters.get("risk_fast_path.shadow_checks", 0)
+    return {
+        "enabled": RISK_FAST_PATH,
+        "hits": counters.get("risk_fast_path.hits", 0),
+        "escalations": counters.get("risk_fast_path.escalations", 0),
+        "hit_rate": metrics.ratio("risk_fast_path.hits", "risk_fast_path.hits", "risk_fast_path.escalations"),
+        "shadow_rate": RISK_FAST_PATH_SHADOW_RATE,
+        "shadow_checks": shadow_checks,
+        "shadow_agreement_rate": metrics.ratio("risk_fast_path.shadow_agreements", "risk_fast_path.shadow_checks")
+        if shadow_checks else None,
+        "escalated_tier_agreement_rate": metrics.ratio("risk_prescore.agreements", "risk_prescore.compared")
+        if counters.get("risk_prescore.compared") else None,
+    }
+
+
 def run_risk_pipeline(feature_id: str, run_id: str, verdict_data: Dict = None, context_data: Dict = None) -> Dict:
     """
     Executes Pipeline B: Risk Reasoning Pipeline.
@@ -34,31 +132,22 @@ def run_risk_pipeline(feature_id: str, run_id: str, verdict_data: Dict = None, c
          # Ideally, context should be stored in DB. Since we are adding DB later, we might assume context is passed or embedded.
          context_data = {"feature_id": feature_id} # Minimal fallback
 
-    # 2. Run Risk Reasoning (LLM)
-    try:
-        risk_assessment = generate_risk_assessment(
-            verdict_json=verdict_data,
-            feature_context=context_data
-        )
-    except Exception as e:
-        raise RuntimeError(f"Risk reasoning failed: {str(e)}") from e
+    # 2. Deterministic fast path, then Risk Reasoning (LLM) for everything else
+    risk_assessment, prescore = fast_path_risk(verdict_data, context_data)
+    if risk_assessment is not None:
+        logger.info(f"Risk fast path: feature {feature_id} scored Low ({prescore['score']}), LLM skipped")
+    else:
+        try:
+            risk_assessment = generate_risk_assessment(
+                verdict_json=verdict_data,
+                feature_context=context_data
+            )
+        except Exception as e:
+            raise RuntimeError(f"Risk reasoning failed: {str(e)}") from e
+        record_prescore_agreement(prescore, risk_assessment)
 
     # 3. Compute Governance Flags
-    overall_risk = ""
-    try:
-        overall_risk = risk_assessment.get("risk_assessment", {}).get("overall_risk", "")
-    except Exception:
-        pass
-
-    human_review_required = overall_risk in {"High", "Critical"}
-    
-    governance = {
-        "human_review_required": human_review_required,
-        "review_status": "Pending" if human_review_required else "Approved",
-        "reviewed_by": None,
-        "review_reason": None,
-        "audit_id": None
-    }
+    governance = compute_governance(risk_assessment)
 
     return {
         "feature_id": feature_id,
@@ -0,0 +1,245 @@
+# pipeline/scheduler.py
+"""
+Small DAG executor for pipeline stages.
+
+Stages are synchronous callables with declared dependencies. Independent
+stages run concurrently in the graph's own thread pool, sized to the sum of
+the stage limits; each stage has its own timeout and a process-wide
+concurrency limit shared by every run. A stage waits for its slot before its
+timeout starts, so queueing behind other runs never counts as stage time.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+STAGE_COMPLETED = "completed"
+STAGE_FAILED = "failed"
+STAGE_SKIPPED = "skipped"
+STAGE_CANCELLED = "cancelled"
+
+# How often a stage waiting for a concurrency slot retries. The slots are
+# shared with runs on other event loops (run_stages_sync), so they are
+# threading semaphores polled from the loop rather than asyncio ones.
+SLOT_POLL_SECONDS = 0.02
+# Threads reserved for a stage without a concurrency limit
+UNBOUNDED_STAGE_WORKERS = 4
+
+
+class StageTimeout(TimeoutError):
+    pass
+
+
+class StageSkipped(RuntimeError):
+    pass
+
+
+class StageCancelled(RuntimeError):
+    pass
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Dict, Dict], object],
+        deps: Iterable[str] = (),
+        timeout: Optional[float] = None,
+        max_concurrency: Optional[int] = None
+    ):
+        """
+        func(state, results) receives the shared run state and the results
+        of all completed stages (keyed by stage name).
+        """
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+
+    async def acquire(self):
+        """
+        Waits on the event loop for a concurrency slot; cancelling the wait
+        holds nothing.
+        """
+        if self._slots is None:
+            return
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(SLOT_POLL_SECONDS)
+
+    def release(self):
+        if self._slots is not None:
+            self._slots.release()
+
+
+class _Call:
+    """
+    Hand-off between a timed stage call and its executor thread: whichever
+    side gets there first decides who releases the stage slot.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = False
+        self.abandoned = False
+
+
+class StageRun:
+    def __init__(self, results: Dict, errors: Dict[str, Exception]):
+        self.results = results
+        self.errors = errors
+
+    def ok(self, name: str) -> bool:
+        return name in self.results and name not in self.errors
+
+
+class StageGraph:
+    def __init__(self, stages: List[Stage], max_workers: Optional[int] = None):
+        self.stages = {s.name: s for s in stages}
+        # Enough threads for every slot, so a stage that holds a slot never
+        # waits in the executor queue on its timeout
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or sum(s.max_concurrency or UNBOUNDED_STAGE_WORKERS for s in stages),
+            thread_name_prefix="stage"
+        )
+        for s in stages:
+            for dep in s.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{s.name}' depends on unknown stage '{dep}'")
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage dependency cycle through '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def plan(self, targets: Iterable[str], seeded: Iterable[str] = ()) -> List[str]:
+        """
+        Returns the stages needed to produce `targets`, in dependency order,
+        excluding stages whose results are already seeded.
+        """
+        seeded = set(seeded)
+        order = []
+
+        def visit(name):
+            if name in seeded or name in order:
+                return
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage '{name}'")
+            for dep in self.stages[name].deps:
+                visit(dep)
+            order.append(name)
+
+        for t in targets:
+            visit(t)
+        return order
+
+    async def run(
+        self,
+        targets: Iterable[str],
+        state: Dict,
+        seed: Optional[Dict] = None,
+        on_stage: Optional[Callable[[str, str, object], None]] = None,
+        cancel_token=None
+    ) -> StageRun:
+        """
+        Runs every stage needed for `targets`, starting each one as soon as
+        its dependencies have completed. A failed stage skips its dependents.
+        Once `cancel_token` is cancelled no further stage is started; running
+        stages are expected to check the token themselves.
+        on_stage(name, status, payload) is always invoked off the event loop
+        (in a worker thread), so it may do blocking I/O.
+        """
+        loop = asyncio.get_running_loop()
+        results = dict(seed or {})
+        errors: Dict[str, Exception] = {}
+        pending = self.plan(targets, seeded=results.keys())
+        running: Dict[asyncio.Future, str] = {}
+
+        def notify_in_thread(name, status, payload):
+            if on_stage:
+                try:
+                    on_stage(name, status, payload)
+                except Exception as e:
+                    logger.error(f"on_stage hook failed for {name}: {e}")
+
+        def execute(stage: Stage, snapshot: Dict, call: _Call):
+            with call.lock:
+                # Timed out or cancelled before a thread picked it up: the
+                # waiting side has released the slot; don't run it at all
+                if call.abandoned:
+                    return None
+                call.started = True
+            try:
+                result = stage.func(state, snapshot)
+            finally:
+                stage.release()
+            # A timed-out stage's thread cannot be killed; drop its late result
+            if not call.abandoned:
+                notify_in_thread(stage.name, STAGE_COMPLETED, result)
+            return result
+
+        async def start(stage: Stage):
+            await stage.acquire()
+            call = _Call()
+            # Once started, the thread releases the slot when the stage returns
+            fut = loop.run_in_executor(self.executor, execute, stage, dict(results), call)
+            try:
+                return await asyncio.wait_for(fut, stage.timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                with call.lock:
+                    call.abandoned = True
+                    if not call.started:
+                        stage.release()
+                if isinstance(e, asyncio.TimeoutError):
+                    raise StageTimeout(f"Stage '{stage.name}' timed out after {stage.timeout}s")
+                raise
+
+        while pending or running:
+            for name in list(pending):
+                deps = self.stages[name].deps
+                failed = [d for d in deps if d in errors]
+                if cancel_token is not None and cancel_token.cancelled:
+                    pending.remove(name)
+                    errors[name] = StageCancelled(f"Stage '{name}' cancelled before it started")
+                    await loop.run_in_executor(None, notify_in_thread, name, STAGE_CANCELLED, errors[name])
+                elif failed:
+                    pending.remove(name)
+                    errors[name] = StageSkipped(f"Upstream stage '{failed[0]}' failed")
+                    await loop.run_in_executor(None, notify_in_thread, name, STAGE_SKIPPED, errors[name])
+                elif all(d in results for d in deps):
+                    pending.remove(name)
+                    running[asyncio.ensure_future(start(self.stages[name]))] = name
+
+            if not running:
+                break
+
+            done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                try:
+                    results[name] = task.result()
+                except Exception as e:
+                    logger.error(f"Stage {name} failed: {e}")
+                    errors[name] = e
+                    await loop.run_in_executor(None, notify_in_thread, name, STAGE_FAILED, e)
+
+        return StageRun(results, errors)
@@ -0,0 +1,204 @@
+# pipeline/stages.py
+"""
+JurAI stage graph: core → (diff ‖ risk) → autofix, risk → governance.
+
+`run_stages` is the single entry point used by the REST endpoints, the SSE
+stream, the batch runner and `run_full_pipeline`. Callers name the stages
+they need; dependencies are scheduled automatically, and results already
+known (e.g. a stored verdict) can be seeded to skip their stages.
+"""
+
+import os
+import time
+import asyncio
+from typing import Callable, Dict, Iterable, Optional
+
+from .scheduler import Stage, StageGraph, StageRun
+from .core_pipeline import run_core_pipeline, record_diff_metrics
+from .risk_pipeline import run_risk_pipeline
+from .autofix_pipeline import run_autofix_pipeline
+from .fused_pipeline import run_risk_autofix_pipeline
+from . import metrics
+from backend.agents.cancellation import check
+from backend.features.compliance_diff.diff_engine import generate_compliance_diff
+from backend.features.compliance_history.history_manager import get_previous_verdict
+
+
+# Produce risk and autofix from one LLM call unless a caller overrides it
+FUSED_RISK_AUTOFIX = os.getenv("FUSED_RISK_AUTOFIX", "false").lower() == "true"
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _core_stage(state: Dict, results: Dict) -> Dict:
+    return run_core_pipeline(
+        state["context_data"],
+        on_event=state.get("on_event"),
+        checkpoints=state.get("checkpoints"),
+        on_checkpoint=state.get("on_checkpoint"),
+        run_id=state.get("run_id"),
+        use_cache=state.get("use_cache", True),
+        cancel_token=state.get("cancel_token")
+    )
+
+
+def _diff_stage(state: Dict, results: Dict) -> Optional[Dict]:
+    # Reuse the diff the core stage already computed (and persisted)
+    core = results["core"]
+    if core.get("compliance_diff"):
+        return core["compliance_diff"]
+
+    # No diff yet: either there is no previous version (resolved by the
+    # structural pre-diff without an LLM call) or core was seeded from storage
+    prev = get_previous_verdict(core["feature_id"])
+    check(state.get("cancel_token"))
+    diff = generate_compliance_diff(
+        previous_verdict=prev.get("verdict") if prev else None,
+        current_verdict=core.get("verdict", {}),
+        previous_laws_snapshot=prev.get("laws_snapshot") if prev else None,
+        current_laws_snapshot=(core.get("verdict") or {}).get("laws_snapshot")
+    )
+    record_diff_metrics(diff)
+    return diff
+
+
+def _risk_stage(state: Dict, results: Dict) -> Dict:
+    core = results["core"]
+    check(state.get("cancel_token"))
+    started = time.perf_counter()
+
+    if state.get("fused"):
+        # One call yields the autofix too; the autofix stage unpacks it
+        result = run_risk_autofix_pipeline(
+            feature_id=core["feature_id"],
+            run_id=core.get("run_id"),
+            verdict_data=core.get("verdict"),
+            context_data=state.get("context_data")
+        )
+        if "fused_stats" in result:
+            metrics.observe("latency.risk_autofix", time.perf_counter() - started)
+            metrics.observe("tokens.fused_prompt_saved", result["fused_stats"]["prompt_tokens_saved"])
+        return result
+
+    result = run_risk_pipeline(
+        feature_id=core["feature_id"],
+        run_id=core.get("run_id"),
+        verdict_data=core.get("verdict"),
+        context_data=state.get("context_data")
+    )
+    metrics.observe("latency.risk", time.perf_counter() - started)
+    return result
+
+
+def _autofix_stage(state: Dict, results: Dict) -> Dict:
+    core = results["core"]
+    risk = results["risk"]
+    if risk.get("auto_fix") is not None:
+        return {
+            "feature_id": core["feature_id"],
+            "run_id": core.get("run_id"),
+            "auto_fix": risk["auto_fix"]
+        }
+
+    check(state.get("cancel_token"))
+    started = time.perf_counter()
+    result = run_autofix_pipeline(
+        feature_id=core["feature_id"],
+        run_id=core.get("run_id"),
+        verdict_data=core.get("verdict"),
+        risk_data=risk.get("risk_assessment"),
+        context_data=state.get("context_data")
+    )
+    metrics.observe("latency.autofix", time.perf_counter() - started)
+    return result
+
+
+def _governance_stage(state: Dict, results: Dict) -> Dict:
+    return results["risk"].get("governance")
+
+
+STAGE_GRAPH = StageGraph([
+    Stage("core", _core_stage,
+          timeout=_env_int("STAGE_CORE_TIMEOUT", 900),
+          max_concurrency=_env_int("STAGE_CORE_CONCURRENCY", 4)),
+    Stage("diff", _diff_stage, deps=["core"],
+          timeout=_env_int("STAGE_DIFF_TIMEOUT", 180),
+          max_concurrency=_env_int("STAGE_DIFF_CONCURRENCY", 8)),
+    Stage("risk", _risk_stage, deps=["core"],
+          timeout=_env_int("STAGE_RISK_TIMEOUT", 180),
+          max_concurrency=_env_int("STAGE_RISK_CONCURRENCY", 8)),
+    Stage("autofix", _autofix_stage, deps=["core", "risk"],
+          timeout=_env_int("STAGE_AUTOFIX_TIMEOUT", 240),
+          max_concurrency=_env_int("STAGE_AUTOFIX_CONCURRENCY", 8)),
+    Stage("governance", _governance_stage, deps=["risk"],
+          timeout=_env_int("STAGE_GOVERNANCE_TIMEOUT", 30)),
+])
+
+
+async def run_stages(
+    targets: Iterable[str],
+    context_data: Optional[Dict] = None,
+    run_id: Optional[str] = None,
+    seed: Optional[Dict] = None,
+    on_event: Optional[Callable] = None,
+    on_stage: Optional[Callable] = None,
+    checkpoints: Optional[list] = None,
+    on_checkpoint: Optional[Callable] = None,
+    use_cache: bool = True,
+    fused: Optional[bool] = None,
+    cancel_token=None
+) -> StageRun:
+    """
+    Runs the requested stages (and whatever they depend on).
+    seed: results of stages that are already done, e.g.
+          {"core": {"feature_id": ..., "run_id": ..., "verdict": {...}}}
+    use_cache=False bypasses the verdict cache for the core stage.
+    fused: produce risk + autofix in one call (defaults to FUSED_RISK_AUTOFIX).
+    cancel_token: a CancelToken; once cancelled, pending stages are not
+    started and running agents stop at their next check.
+    """
+    state = {
+        "context_data": context_data,
+        "run_id": run_id,
+        "on_event": on_event,
+        "checkpoints": checkpoints,
+        "on_checkpoint": on_checkpoint,
+        "use_cache": use_cache,
+        "fused": FUSED_RISK_AUTOFIX if fused is None else fused,
+        "cancel_token": cancel_token,
+    }
+    return await STAGE_GRAPH.run(targets, state, seed=seed, on_stage=on_stage, cancel_token=cancel_token)
+
+
+def run_stages_sync(targets: Iterable[str], **kwargs) -> StageRun:
+    """
+    Blocking wrapper for callers without an event loop (background tasks,
+    CLI). Must not be called from a running event loop.
+    """
+    return asyncio.run(run_stages(targets, **kwargs))
+
+
+def fused_savings() -> Dict:
+    """
+    Observed fused risk+autofix cost vs. the two-call path in this process.
+    """
+    fused_latency = metrics.average("latency.risk_autofix")
+    risk_latency = metrics.average("latency.risk")
+    autofix_latency = metrics.average("latency.autofix")
+    two_call_latency = (
+        round(risk_latency + autofix_latency, 4)
+        if risk_latency is not None and autofix_latency is not None else None
+    )
+    return {
+        "enabled_by_default": FUSED_RISK_AUTOFIX,
+        "fused_calls": metrics.observations().get("latency.risk_autofix", {}).get("count", 0),
+        "avg_fused_latency_s": fused_latency,
+        "avg_two_call_latency_s": two_call_latency,
+        "avg_latency_saved_s": (
+            round(two_call_latency - fused_latency, 4)
+            if fused_latency is not None and two_call_latency is not None else None
+        ),
+        "avg_prompt_tokens_saved": metrics.average("tokens.fused_prompt_saved"),
+    }
@@ -0,0 +1,228 @@
+# pipeline/stream_buffer.py
+"""
+Numbered, replayable SSE event streams.
+
+Every event a pipeline stream emits gets an increasing id and is kept in a
+bounded per-run buffer. The producer does not depend on any one client
+connection, so a client that dropped can reconnect with Last-Event-ID,
+receive what it missed and keep following the live run. Optionally events
+are also written to MongoDB, which covers reconnects after the in-memory
+buffer rolled over or after a finished run was evicted.
+"""
+
+import os
+import json
+import queue
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SSE_REPLAY_BUFFER_SIZE = int(os.getenv("SSE_REPLAY_BUFFER_SIZE", "1000"))
+# How long a finished run stays available for reconnects
+SSE_REPLAY_RETENTION_SECONDS = float(os.getenv("SSE_REPLAY_RETENTION_SECONDS", "300"))
+
+
+class MongoEventStore:
+    """
+    Durable copy of stream events: {"run_id", "id", "event", "data"}.
+    Events are handed to a writer thread and stored with one insert_many
+    per backlog, like MongoBusBackend.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._outbox = queue.Queue()
+        self._stop = threading.Event()
+        threading.Thread(target=self._write, daemon=True).start()
+
+    def ensure_indexes(self):
+        self.collection.create_index([("run_id", 1), ("id", 1)], unique=True, name="run_event")
+
+    def save(self, run_id: str, item: Dict):
+        # Called on the event loop: never blocks
+        self._outbox.put({"run_id": run_id, **item})
+
+    def _write(self):
+        while not self._stop.is_set():
+            docs = [self._outbox.get()]
+            while not self._outbox.empty():
+                docs.append(self._outbox.get_nowait())
+            try:
+                # Unordered: one duplicate id doesn't hold back the rest
+                self.collection.insert_many(docs, ordered=False)
+            except Exception as e:
+                logger.error(f"Failed to persist {len(docs)} stream events: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def load(self, run_id: str, after_id: int, before_id: Optional[int] = None) -> List[Dict]:
+        query = {"run_id": run_id, "id": {"$gt": after_id}}
+        if before_id is not None:
+            query["id"]["$lt"] = before_id
+        return list(self.collection.find(query, {"_id": 0, "run_id": 0}).sort("id", 1))
+
+
+def to_sse(item: Dict) -> Dict:
+    return {"id": str(item["id"]), "event": item["event"], "data": item["data"]}
+
+
+def encode_event(event: str, data: str, event_id: Optional[int] = None) -> bytes:
+    """
+    One framed SSE message, as sse_starlette would write it.
+    """
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in str(data).splitlines() or [""])
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+
+
+def encode_batch(items: List[Dict]) -> bytes:
+    """
+    Frames several buffered items into a single write.
+    """
+    return b"".join(item.get("raw") or encode_event(item["event"], item["data"], item.get("id")) for item in items)
+
+
+class RunStream:
+    """
+    Events of one run. Must be created and published to on the event loop.
+    """
+
+    def __init__(self, run_id: str, maxlen: int = SSE_REPLAY_BUFFER_SIZE, store: Optional[MongoEventStore] = None):
+        self.run_id = run_id
+        self.events = deque(maxlen=maxlen)
+        self.last_id = 0
+        self.finished = False
+        self.readers = 0
+        self.store = store
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+
+    def publish(self, event: str, data: str) -> int:
+        event_id = self._append(event, data)
+        self._wake()
+        return event_id
+
+    def publish_many(self, events: List[Dict]):
+        """
+        Publishes a batch with a single reader wake-up.
+        """
+        for event in events:
+            self._append(event["event"], event["data"])
+        if events:
+            self._wake()
+
+    def _append(self, event: str, data: str) -> int:
+        self.last_id += 1
+        item = {"id": self.last_id, "event": event, "data": data}
+        if self.store:
+            self.store.save(self.run_id, dict(item))
+        # Encoded once, shared by every reader and replay
+        item["raw"] = encode_event(event, data, self.last_id)
+        self.events.append(item)
+        return self.last_id
+
+    def finish(self):
+        self.finished = True
+        self._wake()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _first_buffered(self) -> int:
+        return self.events[0]["id"] if self.events else self.last_id + 1
+
+    async def follow_batches(self, after_id: int = 0) -> AsyncIterator[List[Dict]]:
+        """
+        Yields lists of buffered items with id > after_id (everything
+        available at once), then live batches until the run finishes.
+        Items that fell out of the buffer are read back from the store, or
+        reported with a `replay_gap` item.
+        """
+        cursor = after_id
+        while True:
+            first = self._first_buffered()
+            if cursor + 1 < first:
+                if self.store:
+                    missed = await self._loop.run_in_executor(None, self.store.load, self.run_id, cursor, first)
+                    if missed:
+                        yield missed
+                        cursor = missed[-1]["id"]
+                first = self._first_buffered()
+                if cursor + 1 < first:
+                    yield [{"event": "replay_gap", "data": json.dumps({"from": cursor + 1, "to": first - 1})}]
+                    cursor = first - 1
+
+            changed = self._changed
+            # ids are contiguous, so the unseen items are the buffer's tail
+            unseen = self.last_id - cursor
+            if unseen > 0:
+                batch = list(self.events)[-unseen:]
+                cursor = batch[-1]["id"]
+                yield batch
+
+            if cursor >= self.last_id:
+                if self.finished:
+                    return
+                await changed.wait()
+
+    async def follow(self, after_id: int = 0) -> AsyncIterator[Dict]:
+        """
+        Event-at-a-time view of follow_batches, as sse_starlette dicts.
+        """
+        async for batch in self.follow_batches(after_id):
+            for item in batch:
+                yield to_sse(item) if "id" in item else {"event": item["event"], "data": item["data"]}
+
+
+_streams: Dict[str, RunStream] = {}
+
+
+def open_stream(run_id: str, store: Optional[MongoEventStore] = None) -> RunStream:
+    stream = RunStream(run_id, store=store)
+    _streams[run_id] = stream
+    return stream
+
+
+def get_stream(run_id: str) -> Optional[RunStream]:
+    return _streams.get(run_id)
+
+
+def close_stream(run_id: str):
+    """
+    Marks the run finished; it stays replayable for the retention period.
+    """
+    stream = _streams.get(run_id)
+    if not stream:
+        return
+    stream.finish()
+    stream._loop.call_later(SSE_REPLAY_RETENTION_SECONDS, _evict, run_id, stream)
+
+
+def _evict(run_id: str, stream: RunStream):
+    if _streams.get(run_id) is stream:
+        del _streams[run_id]
+
+
+async def replay_stored(store: MongoEventStore, run_id: str, after_id: int = 0) -> List[Dict]:
+    """
+    Stored events of a run that is no longer in memory.
+    """
+    loop = asyncio.get_running_loop()
+    items = await loop.run_in_executor(None, store.load, run_id, after_id)
+    return [to_sse(item) for item in items]
+
+
+async def framed(batches: AsyncIterator[List[Dict]]) -> AsyncIterator[bytes]:
+    """
+    Turns item batches into pre-encoded chunks; sse_starlette writes bytes
+    through unchanged, so each batch is a single write.
+    """
+    async for batch in batches:
+        yield encode_batch(batch)
@@ -0,0 +1,194 @@
+# pipeline/trace_buffer.py
+"""
+Write-behind buffer for a run's realtime agent trace.
+
+Trace items and the streamed log lines of each step are collected in memory
+and written with one bulk round trip once `max_items` entries are pending
+or the oldest has waited `max_delay` seconds, plus an explicit flush when
+the run completes or fails. Items are stored one document per step in the
+trace collection (see trace_store); log lines are attached to the `logs` of
+the step they belong to, whether that item is still pending or already
+stored. The run document's `trace_summary` follows the latest step.
+
+A batch whose write fails is kept and written again ahead of everything
+newer, with exponential backoff, up to TRACE_FLUSH_RETRIES times; its step
+numbers are already assigned, so later log lines still land on them. Step
+inserts are upserts, so a retried batch never hits the (run_id, seq) key;
+a log line may be repeated if a write failed after it was applied.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from . import metrics
+from .trace_store import trace_summary
+
+logger = logging.getLogger(__name__)
+
+TRACE_FLUSH_ITEMS = int(os.getenv("TRACE_FLUSH_ITEMS", "50"))
+TRACE_FLUSH_SECONDS = float(os.getenv("TRACE_FLUSH_SECONDS", "2.0"))
+TRACE_FLUSH_RETRIES = int(os.getenv("TRACE_FLUSH_RETRIES", "5"))
+TRACE_RETRY_BACKOFF_SECONDS = float(os.getenv("TRACE_RETRY_BACKOFF_SECONDS", "0.5"))
+
+
+class TraceBuffer:
+    def __init__(self, collection, run_id: str, runs=None, max_items: int = TRACE_FLUSH_ITEMS, max_delay: float = TRACE_FLUSH_SECONDS):
+        """
+        collection: the trace collection; runs: compliance_runs, for the
+        summary. Assumes the run has no trace yet when the buffer starts,
+        so items are numbered from 0.
+        """
+        self.collection = collection
+        self.runs = runs
+        self.run_id = run_id
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._items: List[Dict] = []        # new trace items
+        self._logs: Dict[int, List[str]] = {}  # stored item index -> new log lines
+        self._pending = 0
+        self._oldest: Optional[float] = None
+        self._stored = 0                    # items handed to a write (seq numbers taken)
+        self._retry: List = []              # ops of a failed write, rewritten first
+        self._retry_summary: Optional[Dict] = None
+        self._failures = 0
+        self._retry_at: Optional[float] = None
+        self._last: Optional[Dict] = None   # {"agent", "index", "item"} of the latest step
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._tick, daemon=True)
+        self._timer.start()
+
+    def add_item(self, item: Dict):
+        with self._lock:
+            item.setdefault("logs", [])
+            self._items.append(item)
+            self._last = {"agent": item.get("agent"), "index": self._stored + len(self._items) - 1, "item": item}
+            due = self._mark()
+        if due:
+            self.flush()
+
+    def add_log(self, agent: str, step: str, line: str, timestamp: str):
+        """
+        Appends a log line to the agent's current step, or starts a new
+        trace item if the latest step belongs to another agent.
+        """
+        with self._lock:
+            last = self._last
+            if last is None or last["agent"] != agent:
+                item = {"agent": agent, "step": step, "content": "", "timestamp": timestamp, "logs": [], "is_realtime": True}
+                self._items.append(item)
+                last = self._last = {"agent": agent, "index": self._stored + len(self._items) - 1, "item": item}
+            if last["index"] >= self._stored:
+                last["item"]["logs"].append(line)
+            else:
+                self._logs.setdefault(last["index"], []).append(line)
+            due = self._mark()
+        if due:
+            self.flush()
+
+    def _mark(self) -> bool:
+        self._pending += 1
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        return self._pending >= self.max_items
+
+    def flush(self) -> bool:
+        """
+        Writes everything pending (after any failed batch) in one round
+        trip. Safe to call from any thread. Returns False if the write
+        failed and was kept for a retry.
+        """
+        with self._flush_lock:
+            if self._retry and time.monotonic() < self._retry_at and not self._closed.is_set():
+                return False  # backing off; the timer retries
+            with self._lock:
+                if not self._pending and not self._retry:
+                    return True
+                items, logs, count = self._items, self._logs, self._pending
+                self._items, self._logs, self._pending, self._oldest = [], {}, 0, None
+                first = self._stored
+                self._stored += len(items)
+
+            ops = list(self._retry)
+            ops.extend(
+                UpdateOne({"run_id": self.run_id, "seq": index}, {"$push": {"logs": {"$each": lines}}})
+                for index, lines in sorted(logs.items())
+            )
+            ops.extend(
+                UpdateOne(
+                    {"run_id": self.run_id, "seq": first + i},
+                    {"$setOnInsert": {**item, "run_id": self.run_id, "seq": first + i}},
+                    upsert=True
+                )
+                for i, item in enumerate(items)
+            )
+            summary = self._retry_summary
+            if items:
+                summary = trace_summary(items)
+                summary["steps"] = first + len(items)
+
+            try:
+                self.collection.bulk_write(ops, ordered=True)
+            except Exception as e:
+                # An ordered bulk stops at the first error; what came before it is stored
+                done = 0
+                if isinstance(e, BulkWriteError) and e.details.get("writeErrors"):
+                    done = e.details["writeErrors"][0]["index"]
+                self._failures += 1
+                metrics.incr("trace.flush_errors")
+                if self._failures > TRACE_FLUSH_RETRIES:
+                    logger.error(f"Dropping {len(ops) - done} trace writes for {self.run_id} after {self._failures} failures: {e}")
+                    metrics.incr("trace.dropped_writes", len(ops) - done)
+                    self._retry, self._retry_summary, self._failures, self._retry_at = [], None, 0, None
+                    return False
+                delay = TRACE_RETRY_BACKOFF_SECONDS * 2 ** (self._failures - 1)
+                logger.warning(f"Error saving trace for {self.run_id} (retrying in {delay:.1f}s): {e}")
+                self._retry_at = time.monotonic() + delay
+                self._retry, self._retry_summary = ops[done:], summary
+                return False
+
+            self._retry, self._retry_summary, self._failures, self._retry_at = [], None, 0, None
+            if summary and self.runs is not None:
+                try:
+                    self.runs.update_one({"run_id": self.run_id}, {"$set": {"trace_summary": summary}})
+                except Exception as e:
+                    logger.error(f"Error saving trace summary for {self.run_id}: {e}")
+            metrics.incr("trace.flushes")
+            metrics.incr("trace.entries", count)
+            return True
+
+    def close(self):
+        """
+        Final flush, retried with backoff; call on completion and on failure.
+        """
+        self._closed.set()
+        while not self.flush() and self._retry:
+            time.sleep(max(self._retry_at - time.monotonic(), 0))
+
+    def discard(self):
+        """
+        Stops the buffer and drops whatever is pending, for a run that is no
+        longer ours to write.
+        """
+        self._closed.set()
+        with self._flush_lock, self._lock:
+            self._items, self._logs, self._pending, self._oldest = [], {}, 0, None
+            self._retry, self._retry_summary = [], None
+
+    def _tick(self):
+        interval = max(self.max_delay / 2, 0.05)
+        while not self._closed.wait(interval):
+            now = time.monotonic()
+            with self._lock:
+                due = self._oldest is not None and now - self._oldest >= self.max_delay
+            if self._retry:
+                due = now >= self._retry_at
+            if due:
+                self.flush()
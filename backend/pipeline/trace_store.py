@@ -0,0 +1,64 @@
+# pipeline/trace_store.py
+"""
+Agent traces in their own collection, one document per step:
+
+    {"run_id", "seq", "agent", "step", "content", "timestamp", "logs", ...}
+
+indexed by (run_id, seq). The run document only keeps a small
+`trace_summary` ({"steps", "agent", "step"}) for status polling, so it no
+longer grows with every report and log line.
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING
+
+logger = logging.getLogger(__name__)
+
+TRACE_COLLECTION = "agent_traces"
+
+
+def trace_summary(items: List[Dict]) -> Dict:
+    last = items[-1] if items else {}
+    return {"steps": len(items), "agent": last.get("agent"), "step": last.get("step")}
+
+
+def page_query(run_id: str, after: Optional[int] = None, logs: bool = True) -> Tuple[Dict, Dict]:
+    """
+    (filter, projection) of a trace page; sort by seq ascending.
+    """
+    query = {"run_id": run_id}
+    if after is not None:
+        query["seq"] = {"$gt": after}
+    projection = {"_id": 0, "run_id": 0}
+    if not logs:
+        projection["logs"] = 0
+    return query, projection
+
+
+class TraceStore:
+    def __init__(self, database):
+        self.collection = database[TRACE_COLLECTION]
+        self.runs = database["compliance_runs"]
+
+    def replace(self, run_id: str, items: Optional[List[Dict]]):
+        """
+        Swaps the realtime trace of a run for its final, complete trace.
+        """
+        items = items or []
+        self.collection.delete_many({"run_id": run_id})
+        if items:
+            self.collection.insert_many(
+                [{**item, "run_id": run_id, "seq": seq} for seq, item in enumerate(items)],
+                ordered=False
+            )
+        self.runs.update_one({"run_id": run_id}, {"$set": {"trace_summary": trace_summary(items)}})
+
+    def clear(self, run_id: str):
+        self.collection.delete_many({"run_id": run_id})
+        self.runs.update_one({"run_id": run_id}, {"$unset": {"trace_summary": "", "agent_trace": ""}})
+
+    def page(self, run_id: str, after: Optional[int] = None, limit: int = 50, logs: bool = True) -> List[Dict]:
+        query, projection = page_query(run_id, after, logs)
+        return list(self.collection.find(query, projection).sort("seq", ASCENDING).limit(limit))
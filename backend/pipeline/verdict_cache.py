@@ -0,0 +1,192 @@
+# pipeline/verdict_cache.py
+"""
+Content-addressed memoization of core pipeline results.
+
+The key is a canonical hash of the feature context, the law corpus version
+and the model configuration, so identical submissions reuse a completed
+verdict while any change to inputs, laws or models produces a new key.
+
+Entries expire after VERDICT_CACHE_TTL_SECONDS, and the store is trimmed to
+the VERDICT_CACHE_MAX_ENTRIES most recently used entries (0 disables
+either bound).
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_STORAGE_PATH = "storage/verdict_cache"
+LAW_CORPUS_DIR = os.path.join(os.path.dirname(__file__), "..", "rag", "input_files")
+VERDICT_CACHE_TTL_SECONDS = float(os.getenv("VERDICT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+VERDICT_CACHE_MAX_ENTRIES = int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "5000"))
+
+# Stores between two size checks, so a write doesn't walk the store each time
+_PRUNE_EVERY = 50
+_prune_lock = threading.Lock()
+_stores_since_prune = 0
+
+
+def _canonical_json(data) -> str:
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+@lru_cache(maxsize=1)
+def corpus_version() -> str:
+    """
+    Hash of the ingested law corpus. LAW_CORPUS_VERSION overrides it for
+    deployments where the corpus directory is not shipped.
+    """
+    override = os.getenv("LAW_CORPUS_VERSION")
+    if override:
+        return override
+
+    digest = hashlib.sha256()
+    if os.path.isdir(LAW_CORPUS_DIR):
+        for name in sorted(os.listdir(LAW_CORPUS_DIR)):
+            digest.update(name.encode("utf-8"))
+            with open(os.path.join(LAW_CORPUS_DIR, name), "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()[:16]
+
+
+def cache_key(context_data: Dict, model_config: Dict) -> str:
+    payload = {
+        "context": context_data,
+        "corpus_version": corpus_version(),
+        "models": model_config,
+    }
+    return hashlib.sha256(_canonical_json(payload).encode("utf-8")).hexdigest()
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(CACHE_STORAGE_PATH, key[:2], f"{key}.json")
+
+
+def _expired(mtime: float, now: float) -> bool:
+    return VERDICT_CACHE_TTL_SECONDS > 0 and now - mtime > VERDICT_CACHE_TTL_SECONDS
+
+
+def get_cached_result(key: str) -> Optional[Dict]:
+    path = _cache_path(key)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        metrics.incr("verdict_cache.misses")
+        return None
+
+    now = time.time()
+    if _expired(mtime, now):
+        _remove(path)
+        metrics.incr("verdict_cache.expired")
+        metrics.incr("verdict_cache.misses")
+        return None
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        metrics.incr("verdict_cache.misses")
+        return None
+
+    # Recency for the size bound; the TTL still runs from the original write
+    try:
+        os.utime(path, (now, mtime))
+    except OSError:
+        pass
+
+    metrics.incr("verdict_cache.hits")
+    return cached
+
+
+def store_cached_result(key: str, result: Dict):
+    """
+    Writes atomically so concurrent readers never see a partial entry.
+    """
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, default=str)
+    os.replace(tmp_path, path)
+
+    global _stores_since_prune
+    with _prune_lock:
+        _stores_since_prune += 1
+        due = _stores_since_prune >= _PRUNE_EVERY
+        if due:
+            _stores_since_prune = 0
+    if due:
+        prune()
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def prune() -> int:
+    """
+    Drops expired entries, then the least recently used ones beyond
+    VERDICT_CACHE_MAX_ENTRIES. Returns how many were removed.
+    """
+    now = time.time()
+    entries = []
+    removed = 0
+    if not os.path.isdir(CACHE_STORAGE_PATH):
+        return 0
+    for shard in os.listdir(CACHE_STORAGE_PATH):
+        shard_dir = os.path.join(CACHE_STORAGE_PATH, shard)
+        if not os.path.isdir(shard_dir):
+            continue
+        for name in os.listdir(shard_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(shard_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if _expired(st.st_mtime, now):
+                _remove(path)
+                removed += 1
+            else:
+                entries.append((st.st_atime, path))
+
+    if VERDICT_CACHE_MAX_ENTRIES > 0 and len(entries) > VERDICT_CACHE_MAX_ENTRIES:
+        entries.sort()
+        for _, path in entries[:len(entries) - VERDICT_CACHE_MAX_ENTRIES]:
+            _remove(path)
+            removed += 1
+
+    if removed:
+        metrics.incr("verdict_cache.evicted", removed)
+        logger.info(f"Verdict cache pruned {removed} entries")
+    return removed
+
+
+def record_bypass():
+    metrics.incr("verdict_cache.bypassed")
+
+
+def cache_stats() -> Dict:
+    counters = metrics.snapshot()
+    return {
+        "hits": counters.get("verdict_cache.hits", 0),
+        "misses": counters.get("verdict_cache.misses", 0),
+        "bypassed": counters.get("verdict_cache.bypassed", 0),
+        "skipped_degraded": counters.get("verdict_cache.skipped_degraded", 0),
+        "expired": counters.get("verdict_cache.expired", 0),
+        "evicted": counters.get("verdict_cache.evicted", 0),
+        "hit_rate": metrics.ratio("verdict_cache.hits", "verdict_cache.hits", "verdict_cache.misses"),
+    }
@@ -3,7 +3,13 @@ import sys
 import json
 import argparse
 from dotenv import load_dotenv
-from agents.jury_system import run_pipeline
+
+# Runnable as `python backend/run_agents.py` or from inside backend/: the
+# agents and pipeline import each other as `backend.*`, so the repo root
+# must be importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.agents.jury_system import run_pipeline
 
 # Load environment variables (OPENROUTER_API_KEY, GEMINI_API_KEY)
 load_dotenv()
@@ -26,8 +32,37 @@ def load_input_file(file_path):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run JurAI Agents Pipeline with Rich Context")
     parser.add_argument("input_file", type=str, help="Path to the JSON input file containing product/feature context")
+    parser.add_argument("--batch", action="store_true", help="Run every context in a JSON list or NDJSON file")
+    parser.add_argument("--output", type=str, default="batch_results.ndjson", help="NDJSON file results are streamed to (batch mode)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum features processed in parallel (batch mode)")
+    parser.add_argument("--risk", action="store_true", help="Also run the risk pipeline for each feature (batch mode)")
+    parser.add_argument("--autofix", action="store_true", help="Also run risk and autofix for each feature (batch mode)")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output file instead of skipping completed items")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the verdict cache and re-run every feature (batch mode)")
     
     args = parser.parse_args()
+
+    if args.batch:
+        from backend.pipeline.batch_runner import load_contexts, run_batch, print_summary
+
+        try:
+            contexts = load_contexts(args.input_file)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"Error: Failed to load contexts from '{args.input_file}'.\n{e}")
+            sys.exit(1)
+
+        print(f"Starting JurAI batch run: {len(contexts)} features, concurrency {args.concurrency}...")
+        summary = run_batch(
+            contexts,
+            output_path=args.output,
+            concurrency=args.concurrency,
+            run_risk=args.risk,
+            run_autofix=args.autofix,
+            resume=not args.no_resume,
+            use_cache=not args.no_cache
+        )
+        print_summary(summary, args.output)
+        sys.exit(1 if summary["failed"] else 0)
     
     context_data = load_input_file(args.input_file)
     
@@ -35,7 +70,7 @@ if __name__ == "__main__":
     if isinstance(context_data, list):
         if len(context_data) > 0:
             context = context_data[0]
-            print(f"[Info] Input is a list, using first item as context.")
+            print(f"[Info] Input is a list, using first item as context. Use --batch to run all items.")
         else:
             print("Error: Input list is empty.")
             sys.exit(1)
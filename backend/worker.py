@@ -0,0 +1,37 @@
+"""
+Standalone job worker: drains the /run/core job queue outside the API
+process. Run the API with JOB_WORKERS_IN_PROCESS=false and start as many
+of these as the provider quota allows:
+
+    python -m backend.worker --concurrency 4
+"""
+
+import time
+import signal
+import logging
+import argparse
+
+from backend.app import start_worker_pool, attach_event_bus_backend, JOB_WORKER_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JurAI core pipeline worker")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY, help="Jobs run in parallel by this process")
+    args = parser.parse_args()
+
+    # Publishes run events to viewers attached to the API processes
+    attach_event_bus_backend()
+    pool = start_worker_pool(args.concurrency)
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+
+    try:
+        while not stopping:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+    logger.info("Worker shutting down; waiting for running jobs")
+    pool.stop()
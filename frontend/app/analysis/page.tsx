@@ -308,9 +308,10 @@ export default function AnalysisPage() {
                             setCurrentReport("Analysis complete. Verdict available.");
 
                             // Load existing traces if available
-                            if (result.agent_trace && Array.isArray(result.agent_trace)) {
+                            const agentTrace = await api.pipeline.getTrace(runId).catch(() => []);
+                            if (agentTrace.length > 0 && isMounted) {
                                 const thoughts: any = { "REG-001": [], "CRT-009": [], "JDG-100": [] };
-                                result.agent_trace.forEach((traceItem: any) => {
+                                agentTrace.forEach((traceItem: any) => {
                                     const agentId = getAgentIdFromName(traceItem.agent);
                                     if (traceItem.logs) {
                                         thoughts[agentId].push(...traceItem.logs);
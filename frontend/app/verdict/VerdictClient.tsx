@@ -94,7 +94,7 @@ export default function VerdictClient() {
                     }
                 }
 
-                const trace = result.agent_trace || [];
+                const trace = await api.pipeline.getTrace(runId).catch(() => []);
 
                 // 4. Calculate Analysis Time
                 let durationStr = "0:00";
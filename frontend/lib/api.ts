@@ -76,6 +76,22 @@ export const api = {
             }
             return response.json();
         },
+        getTrace: async (runId: string): Promise<any[]> => {
+            // The agent trace is paginated separately from the run results
+            const items: any[] = [];
+            let cursor: number | null = null;
+            do {
+                const query: string = cursor === null ? "" : `&cursor=${cursor}`;
+                const response = await fetch(`${API_BASE_URL}/runs/${runId}/trace?limit=500${query}`);
+                if (!response.ok) {
+                    throw new Error("Failed to fetch trace");
+                }
+                const page = await response.json();
+                items.push(...page.items);
+                cursor = page.next_cursor;
+            } while (cursor !== null);
+            return items;
+        },
         runAutofix: async (featureId: string, runId: string): Promise<PipelineResult> => {
             const response = await fetch(`${API_BASE_URL}/run/autofix`, {
                 method: "POST",